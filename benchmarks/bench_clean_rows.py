@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+bench_clean_rows.py
+
+Micro-benchmark for finalize_translated_csv's cleaning engine.
+
+The bundled recorder export (input_csv/*.csv, 1,273 rows) is scaled up N times (default
+100x, order ids suffixed per copy so every copy forms its own orders) and cleaned twice:
+once with the reference implementation below -- the per-row dict/regex version that
+clean_rows() used before the compiled engine -- and once with the current engine. Both
+outputs are serialized to CSV and must be byte-identical.
+
+Usage:
+  python benchmarks/bench_clean_rows.py
+  python benchmarks/bench_clean_rows.py --scale 20 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import re
+import sys
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import groupby
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from finalize_translated_csv import (CANONICAL_HEADERS, MEANINGFUL_RE, clean_rows, item_total_of,  # noqa: E402
+                                     iter_csv_rows, map_headers, paid_of, parse_price, parse_quantity)
+
+
+def reference_clean_rows(input_header: List[str], input_rows: List[List[str]]) -> List[List[str]]:
+    """clean_rows() as it was before the compiled engine (collapse + zero-shipping enabled)."""
+    mapped_header = map_headers(input_header)
+    h_lower = [h.lower() for h in mapped_header]
+    title_idx = h_lower.index('title') if 'title' in h_lower else None
+    price_candidates = ['unit_price', 'item_total', 'paid', '单价', '单项总价', '实付款']
+    price_idxs = [i for i, hn in enumerate(h_lower) if hn in price_candidates]
+
+    out_rows = []
+    for row in input_rows:
+        if len(row) < len(mapped_header):
+            row = row + [''] * (len(mapped_header) - len(row))
+        elif len(row) > len(mapped_header):
+            row = row[:len(mapped_header)]
+        if not any(c and MEANINGFUL_RE.search(c) for c in row):
+            continue
+        title_val = (row[title_idx] or '').strip() if title_idx is not None else ''
+        price_present = any((row[pi] or '').strip() and re.search(r'[0-9]', row[pi]) for pi in price_idxs)
+        if not title_val and not price_present:
+            continue
+        out_rows.append(row)
+
+    rows_dicts = [{h.lower(): r[i] for i, h in enumerate(mapped_header)} for r in out_rows]
+
+    def parse_decimal(s: str):
+        if not s:
+            return None
+        try:
+            return Decimal(re.sub(r'[¥￥,\s]', '', s))
+        except (InvalidOperation, TypeError):
+            return None
+
+    def key(item):
+        idx, d = item
+        return (d.get('order_id') or '').strip() or f'__row_{idx}'
+
+    final_rows = []
+    for _, grp in groupby(enumerate(rows_dicts), key=key):
+        group: List[Dict[str, str]] = [d for _, d in grp]
+        totals = []
+        paid_val = None
+        for d in group:
+            unit = parse_decimal(d.get('unit_price') or '')
+            qty_raw = (d.get('quantity') or '').strip()
+            try:
+                qty = Decimal(qty_raw) if qty_raw else None
+            except (InvalidOperation, TypeError):
+                qty = None
+            item_total = parse_decimal(d.get('item_total') or '')
+            if unit is not None and qty is not None:
+                totals.append((unit * qty).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+            elif item_total is not None:
+                totals.append(item_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+            if paid_val is None:
+                p = parse_decimal(d.get('paid') or '')
+                if p is not None:
+                    paid_val = p.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        sum_items = sum(totals) if totals else Decimal('0.00')
+        shipping = None
+        if paid_val is not None:
+            if sum_items == paid_val:
+                shipping = Decimal('0.00')
+            else:
+                shipping = (paid_val - sum_items).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        for n, d in enumerate(group):
+            d = dict(d)
+            if n == 0:
+                if shipping is not None:
+                    d['lieferkosten'] = str(shipping)
+                if paid_val is not None:
+                    d['paid'] = str(paid_val)
+            else:
+                d['order_id'] = d['paid'] = d['lieferkosten'] = ''
+            final_rows.append([d.get(fh, '') for fh in CANONICAL_HEADERS])
+    return final_rows
+
+
+def load_scaled(scale: int):
+    src = sorted((ROOT / 'input_csv').glob('*.csv'))[0]
+    it = iter_csv_rows(str(src))
+    header = next(it)
+    base = list(it)
+    oid = [h.lower() for h in map_headers(header)].index('order_id')
+    rows = []
+    for k in range(scale):
+        for r in base:
+            r = list(r)
+            if r[oid].strip():
+                r[oid] = f'{r[oid].strip()}{k:04d}'
+            rows.append(r)
+    return header, rows
+
+
+def to_csv(header, rows) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(header)
+    w.writerows(rows)
+    return buf.getvalue()
+
+
+def best_of(repeat: int, fn):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = fn()
+        best = min(best, perf_counter() - start)
+    return best, result
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description='Benchmark clean_rows() against the pre-engine implementation')
+    p.add_argument('--scale', type=int, default=100, help='Copies of the bundled export (default 100)')
+    p.add_argument('--repeat', type=int, default=3, help='Runs per implementation; the best is reported')
+    args = p.parse_args(argv)
+
+    header, rows = load_scaled(args.scale)
+    print(f'{len(rows)} input rows ({args.scale}x bundled export)')
+
+    t_ref, ref = best_of(args.repeat, lambda: reference_clean_rows(header, rows))
+
+    def run_engine():
+        # lru caches persist across repeats; clear them so every run starts cold
+        for fn in (parse_price, parse_quantity, item_total_of, paid_of):
+            fn.cache_clear()
+        return clean_rows(header, rows)[1]
+
+    t_new, new = best_of(args.repeat, run_engine)
+
+    identical = to_csv(CANONICAL_HEADERS, ref) == to_csv(CANONICAL_HEADERS, new)
+    print(f'reference : {t_ref:7.3f}s  {len(rows) / t_ref:10.0f} rows/s')
+    print(f'engine    : {t_new:7.3f}s  {len(rows) / t_new:10.0f} rows/s')
+    print(f'speed-up  : {t_ref / t_new:.2f}x   output identical: {identical}')
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
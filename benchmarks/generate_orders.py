@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+generate_orders.py
+
+Seeded generator of synthetic Taobao order data for load tests, in the two input formats the
+pipeline reads:
+
+  csv   a recorder-format export (one wrapped record per line, see tools/recorder_csv.py):
+        the first item row of an order carries the "<date>订单号: <id>\\t<seller>" title blob,
+        further items start with leftover button labels ("再次购买 ..."), plus junk rows
+        ("申请售后  投诉卖家" with the shipping fee as price, label-only rows)
+  page  a saved "Bought items" page with the orders embedded as JSON.parse('...') payload
+        (mainOrders / subOrders like the real page, see tools/embedded_json.py)
+
+The data is shaped like real exports: multi-item orders, a few sellers and products that make
+up most of the orders (Zipf-distributed titles and sellers, so the translation dedup ratio is
+realistic), mixed price formats ("88.00", "¥88.00", "￥1,280.00", "1,280.00"), shipping fees
+and discounts. The same --seed and --rows always give byte-identical output; everything is
+written while generating; only the product catalog (at most MAX_PRODUCTS) is kept in memory.
+
+No real customer data is involved: names, titles and ids are composed from the word lists below.
+
+Usage:
+  python benchmarks/generate_orders.py --rows 1000000 -o synthetic_1M.csv
+  python benchmarks/generate_orders.py --rows 20000 --format page -o synthetic.html
+  python benchmarks/generate_orders.py --rows 10000000 --seed 7 --junk-rate 0.05 -o big.csv
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, TextIO, Tuple
+
+HEADER = ['order_id', 'order_date', 'seller', 'title', 'specification', 'item_url', 'item_id', 'unit_price',
+          'quantity', 'item_total', 'paid', 'lieferkosten']
+
+MIN_ROWS = 1_000
+MAX_ROWS = 10_000_000
+DEFAULT_SEED = 42
+DEFAULT_JUNK_RATE = 0.03
+# exponent of the Zipf distributions (rank k is drawn with weight 1 / k**s)
+ZIPF_S = 1.1
+# distinct shops and products; the cap keeps the catalog in memory small at 10M rows
+MAX_SELLERS = 20_000
+MAX_PRODUCTS = 250_000
+# every order lies within this many days before LAST_DAY
+DAYS = 1100
+LAST_DAY = date(2025, 10, 20)
+# order ids: 13 running digits + the buyer suffix Taobao appends
+FIRST_ORDER = 2_950_548_049_244
+BUYER_SUFFIX = '739241'
+
+CITIES = ('上海', '广州', '深圳', '杭州', '义乌', '北京', '成都', '苏州', '宁波', '厦门')
+SHOP_WORDS = ('欧意', '晴天', '鼎峰', '哈比百', '欧美嘉', '源味', '乐购', '百货', '优选', '嘉禾', '味源', '佳品')
+SHOP_KINDS = ('西餐', '食品商行', '进口连锁店', '专业工具', '旗舰店', '杂货店', '专营店', '餐料行', '数码', '服饰')
+LATIN_SHOPS = ('munchies shop', 'Silver Palate Groceries', 'HALAL FOOD', 'Euro Deli', 'Tool House')
+
+ADJECTIVES = ('进口', '新鲜', '即食', '意式', '法式', '有机', '低脂', '原味', '手工', '冷冻', '家用', '加厚',
+              '便携', '迷你', '专业', '数显', '纯棉', '防水')
+NOUNS = ('芝士', '奶酪', '萨拉米肠', '黄油', '橄榄油', '咖啡豆', '麦片', '意面', '番茄酱', '巧克力', '螺丝刀',
+         '扭力计', '收纳盒', '保温杯', '数据线', 'T恤', '卫衣', '运动鞋', '甜菜根', '酸黄瓜')
+EXTRAS = ('披萨', '烘焙', '早餐', '西餐', '户外', '办公室', '厨房', '礼盒装', '整箱', '包邮', '预置扭矩', '学生')
+LATIN = ('Pizza Cheese', 'parmesan cheese', 'salami', 'KUHNE', 'Alpen Swiss Style Muesli', 'SDE-05BN', 'USB-C',
+         'Pro Max', 'pepper jack cheese', 'SLICED BEETROOT')
+UNITS = ('200g', '400g', '500g', '800g', '1kg', '2.5kg', '6罐', '12支', '3件套', '')
+SPEC_LABELS = (('口味', ('原味', '400', '1kg', '辣味', 'Blue One蓝色盒装550g')),
+               ('颜色分类', ('宝蓝', '黑色', 'WHITE', '红色', 'SDE-05BN(5-50cN.m）')),
+               ('尺码', ('S', 'M', 'L', 'XL', 'XXL', 'XXXL')),
+               ('净含量', ('250ml', '500ml', '1L')))
+STATUSES = ('交易成功', '交易成功', '交易成功', '卖家已发货', '买家已付款', '交易关闭')
+# leftover button labels in front of the 2nd.. item title, and label-only junk rows
+ITEM_PREFIXES = ('再次购买     ', '申请售后  再次购买     ', '')
+JUNK_LABELS = ('申请售后  投诉卖家', '确认收货  查看物流', '追加评论', '运费险已出单')
+
+
+class Product(NamedTuple):
+    item_id: str
+    title: str
+    specs: Tuple[str, ...]
+    price: int  # cents
+    seller: int
+
+
+class Item(NamedTuple):
+    product: Product
+    spec: str
+    quantity: int
+    unit: int  # cents
+
+
+class Order(NamedTuple):
+    order_id: str
+    day: str
+    seller: str
+    status: str
+    items: List[Item]
+    paid: int  # cents
+    shipping: int  # cents
+
+
+def zipf_cum_weights(n: int, s: float = ZIPF_S) -> List[float]:
+    return list(accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+
+
+class OrderGenerator:
+    """Deterministic stream of synthetic orders holding about `rows` item rows in total."""
+
+    def __init__(self, rows: int, seed: int = DEFAULT_SEED) -> None:
+        self.rows = rows
+        self.rng = random.Random(seed)
+        # catalog and seller pool grow with the input, far slower than the row count and capped
+        self.sellers = self._sellers(min(max(20, rows // 60), MAX_SELLERS))
+        self.products = self._products(min(max(200, rows // 8), MAX_PRODUCTS))
+        self._product_cum = zipf_cum_weights(len(self.products))
+
+    def _sellers(self, n: int) -> List[str]:
+        rng = self.rng
+        seen = set()
+        out = []
+        while len(out) < n:
+            if rng.random() < 0.1:
+                name = rng.choice(LATIN_SHOPS) + rng.choice(('', rng.choice(SHOP_WORDS) + rng.choice(SHOP_KINDS)))
+            else:
+                name = rng.choice(CITIES) + rng.choice(SHOP_WORDS) + rng.choice(SHOP_KINDS)
+            if name in seen:
+                name = f'{name}{len(out)}号店'
+            seen.add(name)
+            out.append(name)
+        return out
+
+    def _products(self, n: int) -> List[Product]:
+        rng = self.rng
+        seller_cum = zipf_cum_weights(len(self.sellers))
+        sellers = rng.choices(range(len(self.sellers)), cum_weights=seller_cum, k=n)
+        seen = set()
+        out = []
+        for k in range(n):
+            words = [rng.choice(ADJECTIVES), rng.choice(NOUNS)]
+            if rng.random() < 0.4:
+                words.append(rng.choice(LATIN))
+            words += [rng.choice(EXTRAS), rng.choice(UNITS)]
+            title = ''.join(words) if rng.random() < 0.5 else ' '.join(w for w in words if w)
+            if title in seen:
+                title = f'{title} {k}款'
+            seen.add(title)
+            specs = tuple(f'{label}：{rng.choice(values)}'
+                          for label, values in rng.sample(SPEC_LABELS, rng.randint(0, 2)))
+            price = int(rng.lognormvariate(3.6, 1.0) * 100)
+            out.append(Product(str(500_000_000_000 + k * 7919), title, specs or ('',), max(price, 50), sellers[k]))
+        return out
+
+    def __iter__(self) -> Iterator[Order]:
+        rng = self.rng
+        products = self.products
+        n_orders = max(1, int(self.rows / 1.35))
+        days = [(LAST_DAY - timedelta(days=d)).isoformat() for d in range(DAYS + 1)]
+        emitted = 0
+        k = 0
+        while emitted < self.rows:
+            n_items = 1 if rng.random() < 0.78 else min(2 + int(rng.expovariate(0.8)), 12)
+            n_items = min(n_items, self.rows - emitted)
+            picks = rng.choices(products, cum_weights=self._product_cum, k=n_items)
+            items = []
+            for p in picks:
+                qty = 1 if rng.random() < 0.85 else rng.randint(2, 5)
+                items.append(Item(p, rng.choice(p.specs), qty, p.price))
+            total = sum(i.unit * i.quantity for i in items)
+            r = rng.random()
+            if r < 0.55:
+                shipping = 0
+            elif r < 0.9:
+                shipping = rng.choice((400, 460, 600, 800, 1000, 1200, 2700))
+            else:
+                # discounts show up as "paid < sum(items)"; the pipeline reports |difference|
+                shipping = -min(total // 10, rng.randint(100, 2000))
+            paid = total + shipping
+            day = days[min(DAYS, (n_orders - 1 - k) * DAYS // n_orders)] if k < n_orders else days[0]
+            yield Order(f'{FIRST_ORDER + k}{BUYER_SUFFIX}', day, self.sellers[picks[0].seller],
+                        rng.choice(STATUSES), items, paid, abs(shipping))
+            emitted += n_items
+            k += 1
+
+
+def money(cents: int, rng: random.Random, mixed: bool = True) -> str:
+    """Price cell: plain, with ¥/￥ and with thousands separators, like the different exports."""
+    text = f'{Decimal(cents) / 100:.2f}'
+    if not mixed:
+        return text
+    r = rng.random()
+    if cents >= 100_000 and r < 0.5:
+        text = f'{Decimal(cents) / 100:,.2f}'
+    if r < 0.1:
+        return '¥' + text
+    if r < 0.2:
+        return '￥' + text
+    return text
+
+
+def _quote(field: str) -> str:
+    return '"' + field.replace('"', '""') + '"'
+
+
+def write_recorder_csv(out: TextIO, orders: OrderGenerator, junk_rate: float) -> Tuple[int, int]:
+    """Write orders as a recorder export; returns (item rows, junk rows)."""
+    rng = random.Random(orders.rng.random())
+    out.write(','.join(HEADER) + '\r\n')
+    rows = junk = 0
+    for o in orders:
+        for n, it in enumerate(o.items):
+            if n == 0:
+                title = f'{o.day}订单号: {o.order_id}\t{o.seller}\t\t   {it.product.title}'
+                extra = [o.order_id, money(it.unit, rng), str(it.quantity), money(it.unit * it.quantity, rng),
+                         money(o.paid, rng), money(o.shipping, rng, mixed=False)]
+            else:
+                title = rng.choice(ITEM_PREFIXES) + it.product.title
+                extra = ['', money(it.unit, rng), str(it.quantity), money(it.unit * it.quantity, rng), '', '']
+            if it.spec:
+                title = f'{title}  {it.spec}'
+            fields = [o.day, o.seller, title, '', ''] + extra
+            out.write(_quote(f'\t{o.order_id},' + ','.join(map(_quote, fields))) + '\r\n')
+            rows += 1
+            if n == 0 and rng.random() < junk_rate:
+                label = rng.choice(JUNK_LABELS)
+                price = money(o.shipping, rng) if o.shipping and label == JUNK_LABELS[0] else ''
+                fields = [o.day, o.seller, label, '', '', '', price, '', '', '', '']
+                out.write(_quote(f'\t{o.order_id},' + ','.join(map(_quote, fields))) + '\r\n')
+                junk += 1
+    return rows, junk
+
+
+def _js_single_quoted(text: str) -> str:
+    # the same escaping Taobao uses for the JSON.parse('...') argument
+    return text.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('/', '\\/')
+
+
+def _main_order(o: Order, rng: random.Random) -> dict:
+    subs = []
+    for it in o.items:
+        p = it.product
+        subs.append({
+            'id': int(o.order_id) + len(subs),
+            'itemInfo': {
+                'id': int(p.item_id),
+                'itemUrl': f'//item.taobao.com/item.htm?id={p.item_id}',
+                'pic': f'//img.alicdn.com/imgextra/i1/{p.item_id}.jpg_80x80.jpg',
+                'skuText': [{'name': s.split('：')[0], 'value': s.split('：', 1)[1], 'visible': 'SOLID'}
+                            for s in it.spec.split('  ') if s],
+                'title': p.title,
+            },
+            'operations': [{'style': 't0', 'text': '退款/退货'}, {'style': 't0', 'text': '投诉卖家'}],
+            'priceInfo': {'realTotal': money(it.unit, rng)},
+            'quantity': str(it.quantity),
+        })
+    return {
+        'id': o.order_id,
+        'orderInfo': {'createDay': o.day, 'createTime': f'{o.day} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00',
+                      'id': o.order_id},
+        'payInfo': {'actualFee': money(o.paid, rng),
+                    'postFees': [{'prefix': '(含运费', 'suffix': ')', 'value': '￥' + money(o.shipping, rng, False)}]},
+        'seller': {'nick': f'seller{zlib.crc32(o.seller.encode())}', 'shopName': o.seller},
+        'statusInfo': {'text': o.status, 'type': 't0'},
+        'subOrders': subs,
+    }
+
+
+def write_page(out: TextIO, orders: OrderGenerator) -> Tuple[int, int]:
+    """Write orders as a saved order page; returns (item rows, 0)."""
+    rng = random.Random(orders.rng.random())
+    out.write('<!DOCTYPE html><html><head><meta charset="utf-8"><title>我已买到的宝贝</title></head><body>\n')
+    out.write('<div id="tp-bought-root"></div>\n<script>var data = JSON.parse(\'{\\"error\\":\\"\\",\\"mainOrders\\":[')
+    rows = 0
+    for n, o in enumerate(orders):
+        if n:
+            out.write(',')
+        out.write(_js_single_quoted(json.dumps(_main_order(o, rng), ensure_ascii=False, separators=(',', ':'))))
+        rows += len(o.items)
+    tail = {'page': {'currentPage': 1, 'prefetchCount': 0, 'pageSize': n + 1, 'totalNumber': n + 1}}
+    out.write('],' + _js_single_quoted(json.dumps(tail, separators=(',', ':'))[1:]) + "');</script>\n</body></html>\n")
+    return rows, 0
+
+
+def generate(path: Path, rows: int, fmt: str = 'csv', seed: int = DEFAULT_SEED,
+             junk_rate: float = DEFAULT_JUNK_RATE) -> Tuple[int, int]:
+    """Write a synthetic input of about `rows` item rows; returns (item rows, junk rows)."""
+    orders = OrderGenerator(rows, seed)
+    with path.open('w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='') as f:
+        if fmt == 'csv':
+            return write_recorder_csv(f, orders, junk_rate)
+        return write_page(f, orders)
+
+
+def parse_rows(value: str) -> int:
+    mult = {'k': 1_000, 'm': 1_000_000}.get(value[-1:].lower(), 1)
+    try:
+        n = int(float(value[:-1] if mult > 1 else value) * mult)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'not a row count: {value!r}')
+    if not MIN_ROWS <= n <= MAX_ROWS:
+        raise argparse.ArgumentTypeError(f'row count must be between {MIN_ROWS:,} and {MAX_ROWS:,}')
+    return n
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description='Generate reproducible synthetic Taobao order exports and pages')
+    p.add_argument('-o', '--output', required=True, help='File to write (.csv export or .html page)')
+    p.add_argument('--rows', type=parse_rows, default=10_000,
+                   help=f'Item rows to generate, {MIN_ROWS:,}..{MAX_ROWS:,} (suffixes k/M allowed; default 10k)')
+    p.add_argument('--format', choices=('csv', 'page'), help='Output format (default: from the file extension)')
+    p.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'Random seed (default {DEFAULT_SEED})')
+    p.add_argument('--junk-rate', type=float, default=DEFAULT_JUNK_RATE,
+                   help=f'Share of orders followed by a junk row in CSV output (default {DEFAULT_JUNK_RATE})')
+    args = p.parse_args(argv)
+
+    out = Path(args.output)
+    fmt = args.format or ('page' if out.suffix.lower() in ('.html', '.htm') else 'csv')
+    rows, junk = generate(out, args.rows, fmt, args.seed, args.junk_rate)
+    print(f'Wrote {rows} item rows ({junk} junk rows) to {out} ({out.stat().st_size / 1e6:.1f} MB)')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+run_benchmarks.py
+
+Timing suite for the extract -> translate -> finalize pipeline.
+
+Stages (each timed separately, best of --repeat runs):
+
+  extract    embedded-JSON extraction from a saved order page (bytes -> payload -> rows)
+  decode     reading + decoding a recorder-format CSV export (iter_csv_rows)
+  translate  plan distinct Chinese strings, translate them with the local fake backend
+             (--fake-latency seconds per call, --workers calls in flight) and apply them
+  clean      clean_rows() filtering, order grouping and shipping computation
+  write      writing the cleaned rows as CSV
+
+Inputs are the bundled files (``data/Bought the product.html``, ``input_csv/*.csv``) and
+synthetic inputs built from them at the sizes given with --sizes (default 10k, 100k and 1M
+rows): the bundled records are repeated with a per-copy order-id suffix, so every copy
+forms its own orders. With ``--synthetic generated`` the inputs come from generate_orders.py
+instead (seeded with --seed: Zipf-distributed titles and sellers, mixed price formats, junk
+rows), which exercises grouping and translation dedup at realistic ratios. Synthetic order
+pages get large fast (~3.7 KB of payload per item), so page extraction is only run up to
+--max-page-rows.
+
+Results are written as JSON (--output) and can be checked against an earlier run with
+--compare; any stage slower than the baseline by more than --threshold (default 0.25 = 25%)
+is reported and the script exits with status 1.
+
+Usage:
+  python benchmarks/run_benchmarks.py -o bench.json
+  python benchmarks/run_benchmarks.py --sizes 10000,100000 --stages decode,clean,write
+  python benchmarks/run_benchmarks.py -o new.json --compare bench.json --threshold 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from embedded_json import decode_payload, iter_orders, load_payload, orders_to_rows  # noqa: E402
+from finalize_translated_csv import (CANONICAL_HEADERS, clean_rows, item_total_of, iter_csv_rows,  # noqa: E402
+                                     map_headers, paid_of, parse_price, parse_quantity, write_csv_rows)
+from translate_all_progress import apply_translations, iter_batches, plan_translations, translate_batch  # noqa: E402
+from translation_engine import run_ordered  # noqa: E402
+from translator_backends import FakeBackend  # noqa: E402
+
+from generate_orders import generate  # noqa: E402
+
+STAGES = ('extract', 'decode', 'translate', 'clean', 'write')
+DEFAULT_SIZES = '10000,100000,1000000'
+DEFAULT_MAX_PAGE_ROWS = 10_000
+DEFAULT_THRESHOLD = 0.25
+# timings below this are mostly noise; they are reported but never flagged
+DEFAULT_MIN_SECONDS = 0.05
+
+BUNDLED_PAGE = ROOT / 'data' / 'Bought the product.html'
+
+
+def bundled_csv() -> Path:
+    return sorted((ROOT / 'input_csv').glob('*.csv'))[0]
+
+
+# ---------------------------------------------------------------------------
+# synthetic inputs
+
+def write_scaled_recorder_csv(path: Path, rows: int) -> int:
+    """Repeat the bundled recorder export until `rows` records; returns the number written."""
+    src = bundled_csv()
+    with src.open('r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        records = [r for r in reader if r]
+    # the order id of a wrapped record is the tab-prefixed first inner field
+    ids = [r[0].lstrip('\t').split(',', 1)[0] for r in records]
+    written = 0
+    with path.open('w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        copy = 0
+        while written < rows:
+            for rec, oid in zip(records, ids):
+                if written >= rows:
+                    break
+                field = rec[0]
+                if oid.isdigit():
+                    field = field.replace(oid, f'{oid}{copy:04d}')
+                writer.writerow([field] + rec[1:])
+                written += 1
+            copy += 1
+    return written
+
+
+def _js_single_quoted(text: str) -> str:
+    # the same escaping Taobao uses for the JSON.parse('...') argument
+    return text.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('/', '\\/')
+
+
+def write_scaled_page(path: Path, rows: int) -> int:
+    """Build an order page whose embedded payload holds about `rows` item rows."""
+    payload = decode_payload(BUNDLED_PAGE.read_bytes())
+    base = payload.get('mainOrders') or []
+    orders = []
+    items = 0
+    copy = 0
+    while items < rows:
+        for order in base:
+            if items >= rows:
+                break
+            order = json.loads(json.dumps(order))
+            info = order.setdefault('orderInfo', {})
+            info['id'] = f"{info.get('id') or order.get('id') or ''}{copy:04d}"
+            orders.append(order)
+            items += len(order.get('subOrders') or [])
+        copy += 1
+    payload = dict(payload, mainOrders=orders)
+    body = _js_single_quoted(json.dumps(payload, ensure_ascii=True, separators=(',', ':')))
+    with path.open('w', encoding='gb18030') as f:
+        f.write('<!DOCTYPE html><html><head><meta charset="gbk"><title>synthetic</title></head><body>\n')
+        f.write(f"<script>var data = JSON.parse('{body}');</script>\n</body></html>\n")
+    return items
+
+
+# ---------------------------------------------------------------------------
+# stages
+
+def best_of(repeat: int, fn: Callable[[], object]) -> Tuple[float, object]:
+    best = float('inf')
+    result = None
+    for _ in range(max(1, repeat)):
+        start = perf_counter()
+        result = fn()
+        best = min(best, perf_counter() - start)
+    return best, result
+
+
+def stage_extract(page: Path) -> int:
+    payload = load_payload(page)
+    return sum(1 for _ in orders_to_rows(iter_orders(payload)))
+
+
+def stage_decode(path: Path) -> int:
+    it = iter_csv_rows(str(path))
+    next(it, None)
+    return sum(1 for _ in it)
+
+
+def stage_translate(header: List[str], rows: List[List[str]], latency: float, workers: int) -> int:
+    backend = FakeBackend(latency=latency)
+    dict_rows = (dict(zip(header, r)) for r in rows)
+    plan = plan_translations(dict_rows, header)
+    batches = list(iter_batches(list(plan)))
+    translations = {}
+    work = lambda batch: translate_batch(backend, batch)  # noqa: E731
+    for batch, results in run_ordered(batches, work, workers=workers):
+        translations.update(zip(batch, results))
+    dict_rows = (dict(zip(header, r)) for r in rows)
+    return sum(1 for _ in apply_translations(dict_rows, header, translations))
+
+
+def stage_clean(header: List[str], rows: List[List[str]]) -> List[Tuple[str, ...]]:
+    # the parse caches persist across calls; clear them so every run starts cold
+    for fn in (parse_price, parse_quantity, item_total_of, paid_of):
+        fn.cache_clear()
+    return clean_rows(header, rows)[1]
+
+
+def stage_write(path: Path, rows: List[Tuple[str, ...]]) -> int:
+    write_csv_rows(str(path), list(CANONICAL_HEADERS), rows)
+    return path.stat().st_size
+
+
+# ---------------------------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                             timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(args: argparse.Namespace, workdir: Path) -> List[Dict[str, object]]:
+    stages = set(args.stages)
+    results: List[Dict[str, object]] = []
+
+    def record(stage: str, label: str, rows: int, seconds: float, **extra) -> None:
+        entry = {'stage': stage, 'input': label, 'rows': rows, 'seconds': round(seconds, 6),
+                 'rows_per_s': round(rows / seconds, 1) if seconds > 0 else None}
+        entry.update(extra)
+        results.append(entry)
+        print(f'  {stage:<10} {label:<10} {rows:>9} rows  {seconds:9.3f}s  {entry["rows_per_s"] or 0:>12,.0f} rows/s')
+        sys.stdout.flush()
+
+    inputs: List[Tuple[str, Optional[Path], Path]] = [('bundled', BUNDLED_PAGE, bundled_csv())]
+    for size in args.sizes:
+        label = f'{size // 1000}k' if size < 1_000_000 else f'{size // 1_000_000}M'
+        csv_path = workdir / f'synthetic_{size}.csv'
+        if args.synthetic == 'generated':
+            generate(csv_path, size, 'csv', seed=args.seed)
+        else:
+            write_scaled_recorder_csv(csv_path, size)
+        page = None
+        if 'extract' in stages and size <= args.max_page_rows:
+            page = workdir / f'synthetic_{size}.html'
+            if args.synthetic == 'generated':
+                generate(page, size, 'page', seed=args.seed)
+            else:
+                write_scaled_page(page, size)
+        inputs.append((label, page, csv_path))
+
+    for label, page, csv_path in inputs:
+        print(f'{label}:')
+        if 'extract' in stages and page is not None:
+            secs, n = best_of(args.repeat, lambda: stage_extract(page))
+            record('extract', label, n, secs, bytes=page.stat().st_size)
+        if 'decode' in stages:
+            secs, n = best_of(args.repeat, lambda: stage_decode(csv_path))
+            record('decode', label, n, secs, bytes=csv_path.stat().st_size)
+        if not stages & {'translate', 'clean', 'write'}:
+            continue
+        it = iter_csv_rows(str(csv_path))
+        header = map_headers(next(it))
+        rows = list(it)
+        if 'translate' in stages:
+            secs, n = best_of(args.repeat, lambda: stage_translate(header, rows, args.fake_latency, args.workers))
+            record('translate', label, n, secs, fake_latency=args.fake_latency, workers=args.workers)
+        if stages & {'clean', 'write'}:
+            secs, cleaned = best_of(args.repeat if 'clean' in stages else 1, lambda: stage_clean(header, rows))
+            if 'clean' in stages:
+                record('clean', label, len(rows), secs, rows_out=len(cleaned))
+            if 'write' in stages:
+                out = workdir / f'final_{label}.csv'
+                secs, size = best_of(args.repeat, lambda: stage_write(out, cleaned))
+                record('write', label, len(cleaned), secs, bytes=size)
+                out.unlink()
+        # drop this size's rows before the next (larger) input is loaded
+        rows = cleaned = None
+    return results
+
+
+def compare(results: List[Dict[str, object]], baseline: Dict[str, object], threshold: float,
+            min_seconds: float = DEFAULT_MIN_SECONDS) -> List[str]:
+    """Return a message per stage/input that got slower than the baseline by more than `threshold`."""
+    base = {(r['stage'], r['input']): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f'\nComparison with baseline {baseline.get("commit") or "?"} (threshold {threshold:.0%}):')
+    for r in results:
+        old = base.get((r['stage'], r['input']))
+        if not old or not old.get('seconds') or old.get('rows') != r['rows']:
+            print(f'  {r["stage"]:<10} {r["input"]:<10} no comparable baseline entry')
+            continue
+        ratio = r['seconds'] / old['seconds']
+        flag = ''
+        if ratio > 1 + threshold and max(r['seconds'], old['seconds']) >= min_seconds:
+            flag = '  REGRESSION'
+            regressions.append(f'{r["stage"]} {r["input"]}: {old["seconds"]:.3f}s -> {r["seconds"]:.3f}s '
+                               f'({ratio - 1:+.0%})')
+        print(f'  {r["stage"]:<10} {r["input"]:<10} {old["seconds"]:9.3f}s -> {r["seconds"]:9.3f}s  '
+              f'{ratio - 1:+7.1%}{flag}')
+    return regressions
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(v.replace('_', '')) for v in value.split(',') if v.strip()] if value else []
+
+
+def parse_stages(value: str) -> List[str]:
+    stages = [s.strip() for s in value.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f'unknown stage(s): {", ".join(unknown)} (choose from {", ".join(STAGES)})')
+    return stages
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description='Time the extract/translate/finalize stages on bundled and synthetic inputs')
+    p.add_argument('--sizes', type=parse_sizes, default=parse_sizes(DEFAULT_SIZES),
+                   help=f'Comma-separated synthetic input sizes in rows (default {DEFAULT_SIZES}; empty = bundled only)')
+    p.add_argument('--stages', type=parse_stages, default=list(STAGES), help=f'Subset of {",".join(STAGES)}')
+    p.add_argument('--repeat', type=int, default=3, help='Runs per stage; the best time is reported')
+    p.add_argument('--fake-latency', type=float, default=0.02, help='Simulated seconds per fake translator call')
+    p.add_argument('--workers', type=int, default=4, help='Translator calls in flight during the translate stage')
+    p.add_argument('--max-page-rows', type=int, default=DEFAULT_MAX_PAGE_ROWS,
+                   help=f'Largest synthetic order page to extract, in item rows (default {DEFAULT_MAX_PAGE_ROWS})')
+    p.add_argument('--synthetic', choices=('scaled', 'generated'), default='scaled',
+                   help='Synthetic inputs: the bundled files repeated (default) or generate_orders.py output')
+    p.add_argument('--seed', type=int, default=42, help='Seed for --synthetic generated')
+    p.add_argument('--workdir', help='Directory for synthetic inputs (default: a temporary directory)')
+    p.add_argument('-o', '--output', help='Write results as JSON')
+    p.add_argument('--compare', help='Baseline JSON from an earlier run')
+    p.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                   help='Allowed slowdown against the baseline before failing (0.25 = 25%%)')
+    p.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                   help=f'Ignore stages faster than this in both runs when comparing (default {DEFAULT_MIN_SECONDS}s)')
+    args = p.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f'Cannot read baseline {args.compare}: {e}', file=sys.stderr)
+            return 2
+
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = run_suite(args, workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix='taobao_bench_') as tmp:
+            results = run_suite(args, Path(tmp))
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'repeat': args.repeat, 'fake_latency': args.fake_latency, 'workers': args.workers,
+                     'synthetic': args.synthetic, 'seed': args.seed},
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        print(f'\nWrote {len(results)} results to {args.output}')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) above {args.threshold:.0%}:')
+            for msg in regressions:
+                print(f'  {msg}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,26 +1,14 @@
-import re, json, os
-p = os.path.abspath(r"d:/Daten/3-PROJECTS/4-EXTRACT_PAPA/data/input.html")
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from embedded_json import load_payload
+
+p = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else 'data/input.html')
 print('reading', p)
-with open(p, 'r', encoding='utf-8') as f:
-    txt = f.read()
-# find var data = JSON.parse('...'); pattern
-m = re.search(r"var\s+data\s*=\s*JSON\.parse\('([\s\S]*?)'\);", txt)
-if not m:
+# charset-aware byte scan + single-pass unescape (see tools/embedded_json.py)
+data = load_payload(p)
+if data is None:
     print('embedded JSON not found')
     raise SystemExit(1)
-raw = m.group(1)
-# unescape similar to userscript
-s = raw.replace('\\\\','\\').replace('\\"','\"').replace('\\x','\\u00')
-try:
-    data = json.loads(s)
-except Exception as e:
-    print('json parse failed', e)
-    s2 = s.encode('utf-8').decode('unicode_escape')
-    try:
-        data = json.loads(s2)
-    except Exception as e2:
-        print('second parse failed', e2)
-        raise
 orders = data.get('mainOrders', [])
 print('found', len(orders), 'orders')
 if not orders:
@@ -0,0 +1,74 @@
+"""
+taobao_extractor
+
+Importable entry point to the pipeline in ``tools/``: extract -> translate -> clean -> export.
+
+  import taobao_extractor as tx
+
+  header, rows = tx.extract('data/Bought the product.html')   # or an export .csv/.parquet
+  header, rows = tx.translate(header, rows, backend='googletrans', cache='translations.sqlite')
+  final = tx.clean(header, rows)
+  tx.export('final_output/orders_final.csv', final)
+
+Everything is resolved on first attribute access, so ``import taobao_extractor`` costs
+almost nothing and the heavy optional dependencies (googletrans/httpx, pandas, pyarrow)
+are only imported by the code paths that need them. A long-running process can keep one
+translator backend (``tx.get_backend('googletrans')``) and pass it to every translate()
+call. ``python -m taobao_extractor`` is the command line front end (see cli.py).
+
+The implementation lives in the tool modules next to the scripts (tools/*.py); they stay
+runnable on their own and are put on ``sys.path`` when this package is imported.
+"""
+from __future__ import annotations
+
+import importlib
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parent.parent / 'tools'
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+# public name -> (module, attribute); modules are imported on first use
+_EXPORTS = {
+    # pipeline functions
+    'extract': ('taobao_extractor.pipeline', 'extract'),
+    'translate': ('taobao_extractor.pipeline', 'translate'),
+    'clean': ('taobao_extractor.pipeline', 'clean'),
+    'export': ('taobao_extractor.pipeline', 'export'),
+    'process': ('taobao_extractor.pipeline', 'process'),
+    # building blocks
+    'CANONICAL_HEADERS': ('export_formats', 'CANONICAL_HEADERS'),
+    'CleanEngine': ('finalize_translated_csv', 'CleanEngine'),
+    'clean_rows': ('finalize_translated_csv', 'clean_rows'),
+    'iter_csv_rows': ('finalize_translated_csv', 'iter_csv_rows'),
+    'write_csv_rows': ('finalize_translated_csv', 'write_csv_rows'),
+    'write_rows': ('export_formats', 'write_rows'),
+    'SchemaError': ('export_formats', 'SchemaError'),
+    'load_payload': ('embedded_json', 'load_payload'),
+    'iter_page_orders': ('embedded_json', 'iter_page_orders'),
+    'orders_to_rows': ('embedded_json', 'orders_to_rows'),
+    'get_backend': ('translator_backends', 'get_backend'),
+    'BackendUnavailable': ('translator_backends', 'BackendUnavailable'),
+    'TranslationCache': ('translation_cache', 'TranslationCache'),
+    'has_chinese': ('han_text', 'has_chinese'),
+    'Metrics': ('metrics', 'Metrics'),
+    'OrderIndex': ('order_index', 'OrderIndex'),
+    'OrderStore': ('order_store', 'OrderStore'),
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str):
+    try:
+        module, attr = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+    value = getattr(importlib.import_module(module), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
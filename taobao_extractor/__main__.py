@@ -0,0 +1,3 @@
+from taobao_extractor.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,47 @@
+"""
+Command line front end: ``python -m taobao_extractor <command> [options]``.
+
+Every command is one of the scripts in tools/ (same options, see ``<command> -h``); only the
+module of the chosen command is imported, so commands that do not translate start without
+loading any translator, pandas or pyarrow code.
+"""
+from __future__ import annotations
+
+import importlib
+import sys
+from typing import List, Optional
+
+# command -> (module, description)
+COMMANDS = {
+    'extract': ('embedded_json', 'Extract orders from a saved order page into a CSV'),
+    'translate': ('translate_all_progress', 'Translate the Chinese cells of a CSV'),
+    'finalize': ('finalize_translated_csv', 'Map headers, drop junk rows, compute totals and shipping'),
+    'process': ('translate_and_clean', 'Translate and finalize in one run, without intermediate files'),
+    'batch': ('batch_process', 'Extract, merge and finalize many pages / exports at once'),
+    'merge': ('merge_exports', 'Merge exports of several accounts / snapshots into unique orders'),
+    'incremental': ('incremental_update', 'Translate and finalize only new or changed orders'),
+    'query': ('order_index', 'Filter and aggregate queries over a finalized CSV'),
+    'fix': ('fix_final_output', 'Rewrite a translated CSV into the fixed 10-column layout'),
+}
+
+
+def usage() -> str:
+    width = max(len(c) for c in COMMANDS)
+    lines = ['usage: python -m taobao_extractor <command> [options]', '', 'commands:']
+    lines += [f'  {name:<{width}}  {desc}' for name, (_, desc) in COMMANDS.items()]
+    lines += ['', 'Run "python -m taobao_extractor <command> -h" for the options of a command.']
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0 if argv else 2
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f'Unknown command: {command}\n\n{usage()}', file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[command][0])
+    sys.argv[0] = f'taobao_extractor {command}'
+    return module.main(rest) or 0
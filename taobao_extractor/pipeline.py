@@ -0,0 +1,99 @@
+"""
+Pipeline functions behind ``taobao_extractor.extract/translate/clean/export/process``.
+
+They take and return plain header lists and row iterables, never exit the interpreter and
+keep no global state, so they can be called repeatedly from one long-running process.
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from export_formats import CANONICAL_HEADERS, write_canonical
+from finalize_translated_csv import CleanEngine, iter_csv_rows, write_csv_rows
+
+PAGE_SUFFIXES = ('.html', '.htm')
+
+
+def extract(path: Union[str, Path]) -> Tuple[List[str], Iterator[List[str]]]:
+    """Header and rows of a saved order page (embedded JSON) or of an export (.csv/.parquet/.arrow)."""
+    path = Path(path)
+    if path.suffix.lower() in PAGE_SUFFIXES:
+        from embedded_json import iter_page_orders, orders_to_rows
+        return list(CANONICAL_HEADERS), orders_to_rows(iter_page_orders(path))
+    rows = iter_csv_rows(str(path))
+    return next(rows, []), rows
+
+
+def translation_options(**overrides) -> argparse.Namespace:
+    """The translate_all_progress.py option defaults with `overrides` applied (e.g. workers=4)."""
+    from translate_all_progress import add_translation_args
+    p = argparse.ArgumentParser(add_help=False)
+    add_translation_args(p)
+    args = p.parse_args([])
+    for name, value in overrides.items():
+        if not hasattr(args, name):
+            raise TypeError(f'Unknown translation option: {name}')
+        setattr(args, name, value)
+    return args
+
+
+def translate(header: List[str], rows: Iterable[Sequence[str]], backend='googletrans', cache=None,
+              metrics=None, failed: Optional[dict] = None, **options) -> Tuple[List[str], List[List[str]]]:
+    """Translate every Chinese cell of `rows`; returns (header, translated rows).
+
+    `backend` is a backend name or an instance from get_backend() (reuse one across calls);
+    `cache` is a TranslationCache or the path of one. Cells left untranslated are added to
+    `failed` ({cell: reason}) when a dict is passed. Other keyword arguments are the
+    translate_all_progress.py options (src, dest, segment, workers, rate, retries, ...).
+    """
+    from metrics import Metrics
+    from translate_all_progress import translate_cells
+    from translate_and_clean import plan_cells
+    from translation_cache import TranslationCache
+    from translator_backends import get_backend
+
+    args = translation_options(**options)
+    if isinstance(backend, str):
+        backend = get_backend(backend, glossary=args.glossary, fake_latency=args.fake_latency,
+                              fake_fail_rate=args.fake_fail_rate)
+    own_cache = isinstance(cache, (str, Path))
+    if own_cache:
+        cache = TranslationCache(str(cache), max_entries=args.cache_size)
+    rows = [list(r) for r in rows]
+    try:
+        translations, _, failed_cells = translate_cells(plan_cells(rows), backend, args, metrics or Metrics(), cache)
+    finally:
+        if own_cache:
+            cache.close()
+    if failed is not None:
+        failed.update(failed_cells)
+    return list(header), [[translations.get(v, v) for v in r] for r in rows]
+
+
+def clean(header: List[str], rows: Iterable[Sequence[str]], collapse: bool = True,
+          zero_shipping: bool = True) -> Iterator[tuple]:
+    """Finalized rows in CANONICAL_HEADERS order: junk rows dropped, item totals and shipping computed."""
+    return CleanEngine(header, collapse_groups=collapse, zero_shipping_if_equal=zero_shipping).rows(rows)
+
+
+def export(path: Union[str, Path], rows: Iterable[Sequence[str]], header: Optional[List[str]] = None,
+           fmt: Optional[str] = None) -> int:
+    """Write rows atomically as CSV, JSON Lines, Parquet/Arrow or Markdown (by suffix, or fmt); returns the count.
+
+    Without a header the rows must be in the CANONICAL_HEADERS layout (SchemaError otherwise).
+    """
+    if header is None:
+        return write_canonical(str(path), rows, fmt)
+    return write_csv_rows(str(path), list(header), rows, fmt)
+
+
+def process(source: Union[str, Path], output: Union[str, Path], backend='googletrans', cache=None,
+            collapse: bool = True, zero_shipping: bool = True, **options) -> int:
+    """Extract, clean, translate and export one file (like translate_and_clean.py); returns the row count."""
+    header, rows = extract(source)
+    final = list(clean(header, rows, collapse=collapse, zero_shipping=zero_shipping))
+    _, translated = translate(list(CANONICAL_HEADERS), final, backend=backend, cache=cache, **options)
+    export(output, translated)
+    return len(translated)
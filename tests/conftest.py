@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# the tools are plain scripts that import their siblings, like benchmarks/ does
+for sub in ('tools', 'benchmarks'):
+    path = str(ROOT / sub)
+    if path not in sys.path:
+        sys.path.insert(0, path)
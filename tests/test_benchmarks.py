@@ -0,0 +1,23 @@
+import json
+
+import run_benchmarks
+
+
+def test_compare_against_saved_baseline(tmp_path):
+    baseline = tmp_path / 'bench.json'
+    common = ['--sizes', '', '--stages', 'clean', '--repeat', '1']
+    assert run_benchmarks.main(common + ['-o', str(baseline)]) == 0
+    report = json.loads(baseline.read_text(encoding='utf-8'))
+    assert report['results']
+
+    # a generous threshold: the same tree must not regress against itself
+    assert run_benchmarks.main(common + ['--compare', str(baseline), '--threshold', '100']) == 0
+
+
+def test_compare_flags_regressions_above_min_seconds():
+    baseline = {'results': [{'stage': 'clean', 'input': 'a', 'rows': 10, 'seconds': 1.0},
+                            {'stage': 'write', 'input': 'a', 'rows': 10, 'seconds': 0.001}]}
+    results = [{'stage': 'clean', 'input': 'a', 'rows': 10, 'seconds': 2.0},
+               {'stage': 'write', 'input': 'a', 'rows': 10, 'seconds': 0.004}]
+    regressions = run_benchmarks.compare(results, baseline, threshold=0.25, min_seconds=0.05)
+    assert len(regressions) == 1 and regressions[0].startswith('clean a')
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from embedded_json import decode_js_string, iter_page_orders, load_payload, main, orders_to_rows
+
+PAYLOAD = {
+    'mainOrders': [{
+        'orderInfo': {'id': '1002', 'createDay': '2023-01-06'},
+        'seller': {'shopName': '芝士, 专卖店'},
+        'statusInfo': {'text': '交易成功'},
+        'payInfo': {'actualFee': '39.60'},
+        'subOrders': [
+            {'itemInfo': {'id': 12, 'title': '马苏里拉 "Pizza" Cheese', 'itemUrl': '//item.taobao.com/item.htm?id=12',
+                          'skuText': [{'name': '口味', 'value': '400g'}]},
+             'priceInfo': {'realTotal': '12.50'}, 'quantity': 2},
+            {'itemInfo': {'id': 13, 'title': 'Pizza sauce (classic)'}, 'priceInfo': {'realTotal': '8.00'},
+             'quantity': 1},
+        ],
+    }],
+}
+
+
+def page(payload, charset='utf-8'):
+    # the payload as the page embeds it: JSON inside a single-quoted JavaScript string, using only
+    # escapes JSON also knows (\" \\), so the json module decodes it
+    literal = json.dumps(payload, ensure_ascii=False).replace('\\', '\\\\').replace('"', '\\"')
+    html = (f'<html><head><meta charset="{charset}"><title>已买到的宝贝</title></head><body>'
+            f"<script>var data = JSON.parse('{literal}');</script></body></html>")
+    return html.encode(charset)
+
+
+@pytest.mark.parametrize('charset', ['utf-8', 'gbk'])
+def test_orders_from_embedded_payload(tmp_path, charset):
+    path = tmp_path / 'orders.html'
+    path.write_bytes(page(PAYLOAD, charset))
+    assert load_payload(path) == PAYLOAD
+    assert list(orders_to_rows(iter_page_orders(path))) == [
+        ['1002', '2023-01-06', '芝士， 专卖店', '马苏里拉 "Pizza" Cheese', '口味：400g',
+         'https://item.taobao.com/item.htm?id=12', '12', '12.50', '2', '25.00', '39.60', '6.60'],
+        ['1002', '2023-01-06', '芝士， 专卖店', 'Pizza sauce (classic)', '', '', '13', '8.00', '1', '8.00', '', ''],
+    ]
+
+
+def test_javascript_only_escapes():
+    # \' \xHH and \u{...} are not JSON escapes and take the regex path
+    assert decode_js_string(r'it\'s \x41\u{1F600} 中\"') == 'it\'s A\U0001F600 中"'
+    # a surrogate pair is merged into one code point
+    assert decode_js_string(r'\ud83d\ude00 \/') == '\U0001F600 /'
+
+
+def test_page_without_marker(tmp_path, capsys):
+    path = tmp_path / 'login.html'
+    path.write_text('<html><script>var data = {};</script></html>', encoding='utf-8')
+    empty = tmp_path / 'empty.html'
+    empty.write_bytes(b'')
+    assert load_payload(path) is None and load_payload(empty) is None
+    assert list(iter_page_orders(path)) == []
+    assert main([str(path)]) == 3
+    assert 'No embedded JSON' in capsys.readouterr().err
@@ -0,0 +1,38 @@
+import os
+import stat
+
+import pytest
+
+from export_formats import write_rows
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write_keeps_existing_mode(tmp_path):
+    out = tmp_path / 'final.csv'
+    out.write_text('old\n', encoding='utf-8')
+    os.chmod(out, 0o640)
+    write_rows(out, ['a'], [['1']])
+    assert mode(out) == 0o640
+    assert out.read_bytes() == '\ufeffa\r\n1\r\n'.encode('utf-8')
+
+
+def test_atomic_write_new_file_follows_umask(tmp_path):
+    out = tmp_path / 'final.jsonl'
+    umask = os.umask(0o022)
+    try:
+        write_rows(out, ['a'], [['1']])
+    finally:
+        os.umask(umask)
+    assert mode(out) == 0o644
+
+
+def test_table_write_keeps_existing_mode(tmp_path):
+    pytest.importorskip('pyarrow')
+    out = tmp_path / 'translated.parquet'
+    out.write_bytes(b'')
+    os.chmod(out, 0o640)
+    write_rows(out, ['a'], [['1']])
+    assert mode(out) == 0o640
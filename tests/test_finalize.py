@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+
+import finalize_translated_csv
+
+DATA = Path(__file__).resolve().parent / 'data'
+# junk rows, multi-item orders, shipping, negative shipping and odd price strings
+FIXTURE = DATA / 'finalize_input.csv'
+EXPECTED = DATA / 'finalize_expected.csv'
+
+
+def finalize(tmp_path, *options):
+    out = tmp_path / 'final.csv'
+    assert finalize_translated_csv.main(['-i', str(FIXTURE), '-o', str(out), *options]) == 0
+    return out.read_bytes()
+
+
+def test_finalize_matches_expected_output(tmp_path):
+    assert finalize(tmp_path) == EXPECTED.read_bytes()
+
+
+@pytest.mark.parametrize('options', [[], ['--no-collapse'], ['--no-zero-shipping']])
+def test_pandas_engine_matches_rows_engine(tmp_path, options):
+    pytest.importorskip('pandas')
+    # 1004, 1005 and 1008 hold non-canonical numbers and go through the Decimal fallback
+    assert finalize(tmp_path, '--engine', 'pandas', *options) == finalize(tmp_path, *options)
+
+
+@pytest.mark.parametrize('options', [[], ['--no-collapse'], ['--format', 'jsonl']])
+def test_parallel_blocks_match_single_process(tmp_path, monkeypatch, options):
+    # tiny blocks, so cuts land inside multi-item orders, next to junk rows and rows without an order id
+    monkeypatch.setattr(finalize_translated_csv, 'BLOCK_ROWS', 2)
+    assert finalize(tmp_path, '--jobs', '2', *options) == finalize(tmp_path, *options)
@@ -0,0 +1,17 @@
+from han_text import han_segments, has_chinese
+from translate_and_clean import plan_cells
+
+
+def test_cjk_punctuation_alone_is_not_chinese():
+    assert not has_chinese('￥4.58')
+    assert not has_chinese('Size：XL')
+    assert has_chinese('颜色：红色')
+    assert han_segments('颜色：红色 Size：XL') == ['颜色：红色']
+
+
+def test_plan_skips_price_and_punctuation_cells():
+    rows = [
+        ['123', '￥4.58', 'Size：XL', '马苏里拉碎芝士'],
+        ['124', '（￥12.00）', 'Size：XL', '马苏里拉碎芝士'],
+    ]
+    assert plan_cells(rows) == {'马苏里拉碎芝士': 2}
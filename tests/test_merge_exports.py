@@ -0,0 +1,24 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from merge_exports import snapshot_time
+
+MTIME = datetime(2024, 5, 6, 7, 8, 9)
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('taobao_orders_export_recorder_2025-10-20-21-13-52.csv', '2025-10-20 21:13:52'),
+    ('orders_2025-10-20T21_13_52.csv', '2025-10-20 21:13:52'),
+    # digit runs (order ids) and impossible dates fall back to the mtime
+    ('orders_12345678901234.csv', '2024-05-06 07:08:09'),
+    ('orders_2025-13-40-25-61-61.csv', '2024-05-06 07:08:09'),
+    ('orders_12025-10-20-21-13-52.csv', '2024-05-06 07:08:09'),
+])
+def test_snapshot_time(tmp_path, name, expected):
+    path = tmp_path / name
+    path.touch()
+    stamp = MTIME.timestamp()
+    os.utime(path, (stamp, stamp))
+    assert snapshot_time(path) == expected
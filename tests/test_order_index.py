@@ -0,0 +1,15 @@
+import os
+import stat
+
+from finalize_translated_csv import CANONICAL_HEADERS, write_csv_rows
+from order_index import build_index
+
+
+def test_rebuilt_index_keeps_its_mode(tmp_path):
+    final = tmp_path / 'final.csv'
+    row = ['1', '2024-01-02', 'Shop', 'Cheese', '', '', '', '5.00', '1', '5.00', '5.00', '0.00']
+    write_csv_rows(str(final), CANONICAL_HEADERS, [row])
+    index = build_index(str(final))
+    os.chmod(index, 0o640)
+    assert build_index(str(final)) == index
+    assert stat.S_IMODE(os.stat(index).st_mode) == 0o640
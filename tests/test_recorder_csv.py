@@ -0,0 +1,36 @@
+import csv
+import io
+
+import pytest
+
+from recorder_csv import split_title_blob, unwrap_rows
+
+HEADER = ['order_id', 'order_date', 'seller', 'title', 'specification', 'item_url', 'item_id',
+          'unit_price', 'quantity', 'item_total', 'paid', 'lieferkosten']
+
+
+@pytest.mark.parametrize('blob, parts', [
+    ('2022-10-14订单号: 2950548049245739241\t哈比百进口HALAL FOOD\t\t   马苏里拉碎芝士Pizza Cheese 随机发送  口味：400',
+     ('2022-10-14', '2950548049245739241', '哈比百进口HALAL FOOD', '马苏里拉碎芝士Pizza Cheese 随机发送', '口味：400')),
+    # full-width colon after 订单号, leftover button labels, half-width colon in the spec
+    ('2023-01-05订单号：1001\t晴天餐料行\t申请售后 再次购买 意式萨拉米香肠  颜色分类:WHITE',
+     ('2023-01-05', '1001', '晴天餐料行', '意式萨拉米香肠', '颜色分类:WHITE')),
+    ('[交易快照] 芝士 500g', ('', '', '', '芝士 500g', '')),
+    ('Plain title', ('', '', '', 'Plain title', '')),
+])
+def test_split_title_blob(blob, parts):
+    assert split_title_blob(blob) == parts
+
+
+def test_unwrap_recorder_rows():
+    inner = ['\t1001', '2023-01-05', '', '2023-01-05订单号: 1001\t晴天餐料行\t\t   意式萨拉米香肠  口味：辣', '', '',
+             '1001', '88.00', '1', '88.00', '88.00', '0.00']
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator='').writerow(inner)
+    plain = ['1002', '2023-01-06', 'Cheese Shop', 'Mozzarella', '', '', '12', '12.50', '2', '25.00', '39.60', '14.60']
+    assert list(unwrap_rows(HEADER, [[buf.getvalue()], plain])) == [
+        ['1001', '2023-01-05', '晴天餐料行', '意式萨拉米香肠', '口味：辣', '', '1001', '88.00', '1', '88.00', '88.00', '0.00'],
+        plain,
+    ]
+    # files that are not in recorder format pass through untouched
+    assert list(unwrap_rows(HEADER, [plain])) == [plain]
@@ -0,0 +1,129 @@
+import argparse
+import time
+from itertools import chain
+
+import pytest
+
+from checkpoint import CheckpointJournal, CheckpointMismatch, load_journal
+from metrics import Metrics
+from translate_all_progress import DeferredTranslator, add_translation_args, open_journal, translate_batch
+from translation_engine import CircuitBreaker, TokenBucket, run_ordered
+from translator_backends import FakeBackend
+
+
+def options(**overrides):
+    p = argparse.ArgumentParser()
+    add_translation_args(p)
+    args = p.parse_args([])
+    vars(args).update(backoff=0.0, **overrides)
+    return args
+
+
+def test_run_ordered_keeps_input_order():
+    backend = FakeBackend()
+    batches = [[f'文本{i}'] for i in range(40)]
+
+    def call(batch):
+        # later batches finish first, so completion order is the reverse of input order
+        time.sleep(0.002 * (40 - int(batch[0][2:])) / 40)
+        return backend.translate_batch(batch, 'zh-cn', 'en')
+
+    results = list(run_ordered(batches, call, workers=8))
+    assert [batch for batch, _ in results] == batches
+    assert [out for _, out in results] == [[f'<en:{b[0]}>'] for b in batches]
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=1)
+    backend = FakeBackend()
+    start = time.monotonic()
+    for i in range(11):
+        assert translate_batch(backend, [f'文本{i}'], limiter=bucket) == [f'<en:文本{i}>']
+    # one token up front, then one every 1/50 s
+    assert time.monotonic() - start >= 10 / 50 * 0.9
+    assert backend.calls == 11
+
+
+def test_breaker_opens_and_deferred_queue_drains():
+    backend = FakeBackend(fail_rate=1.0)
+    args = options(breaker_threshold=2, breaker_cooldown=0.05, retries=3, batch_size=2)
+    translator = DeferredTranslator(backend, args, Metrics())
+    batches = [[f'文本{i}', f'字{i}'] for i in range(6)]
+
+    assert list(translator.run(batches)) == []
+    # two failed calls open the circuit; the other batches are deferred without a call
+    assert backend.calls == 2
+    assert translator.breaker.is_open
+    assert sum(len(b) for b in translator.queue) == 12
+
+    backend.fail_rate = 0.0
+    drained = list(translator.drain())
+    assert not translator.breaker.is_open
+    assert translator.queue == [] and translator.failed == set()
+    assert {t: out for batch, results in drained for t, out in zip(batch, results)} == \
+        {t: f'<en:{t}>' for t in chain.from_iterable(batches)}
+
+
+def test_flaky_backend_translates_everything_with_retries():
+    backend = FakeBackend(fail_rate=0.5, seed=3)
+    args = options(breaker_threshold=0, retries=20, workers=4)
+    translator = DeferredTranslator(backend, args, Metrics())
+    texts = [f'文本{i}' for i in range(50)]
+    batches = [texts[i:i + 5] for i in range(0, 50, 5)]
+
+    done = {}
+    for batch, results in chain(translator.run(batches), translator.drain()):
+        done.update(zip(batch, results))
+    assert translator.failed == set()
+    assert done == {t: f'<en:{t}>' for t in texts}
+
+
+def test_breaker_half_open_trial():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.02)
+    assert breaker.failure() is True
+    assert not breaker.allow()
+    time.sleep(0.03)
+    assert breaker.allow()
+    # only a single trial call while half-open
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.allow() and not breaker.is_open
+
+
+def test_resume_cuts_torn_journal_line(tmp_path):
+    path = tmp_path / 'out.csv.journal.jsonl'
+    fingerprint = {'input': 'export.csv'}
+    journal = CheckpointJournal(path, fingerprint)
+    journal.record([('文本1', 'text 1'), ('文本2', 'text 2')])
+    journal.flush()
+    journal.close()
+    # crash in the middle of a record
+    with path.open('a', encoding='utf-8') as fh:
+        fh.write('{"text": "文本3", "va')
+
+    done, valid = load_journal(path, fingerprint)
+    assert done == {'文本1': 'text 1', '文本2': 'text 2'}
+    journal = CheckpointJournal(path, fingerprint, resume=True, valid_size=valid)
+    journal.record([('文本3', 'text 3')])
+    journal.close()
+
+    done, valid = load_journal(path, fingerprint)
+    assert done == {'文本1': 'text 1', '文本2': 'text 2', '文本3': 'text 3'}
+    assert valid == path.stat().st_size
+
+
+def test_resume_refuses_other_translation_settings(tmp_path):
+    inp = tmp_path / 'export.csv'
+    inp.write_text('title\n文本\n', encoding='utf-8')
+    out = tmp_path / 'out.csv'
+    journal, _ = open_journal(options(backend='fake'), inp, out, ['title'])
+    journal.record([('文本', '<en:文本>')])
+    journal.close()
+
+    journal, resumed = open_journal(options(backend='fake', resume=True), inp, out, ['title'])
+    journal.close()
+    assert resumed == {'文本': '<en:文本>'}
+    with pytest.raises(CheckpointMismatch):
+        open_journal(options(backend='glossary', resume=True), inp, out, ['title'])
+    with pytest.raises(CheckpointMismatch):
+        open_journal(options(backend='fake', segment=True, resume=True), inp, out, ['title'])
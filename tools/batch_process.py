@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+batch_process.py
+
+Process many saved order pages and userscript CSV exports in one run.
+
+Every input (saved ``.html``/``.htm`` page or ``.csv`` export) is loaded in a worker
+process and normalized to the CANONICAL_HEADERS columns. Orders are then merged across
+files by order_id -- inputs are taken in sorted path order and a later file replaces an
+earlier file's rows for the same order, so timestamped exports resolve to their newest
+version -- and the consolidated set is cleaned with the finalize logic and written as one
+CSV. Per-file load timings are printed at the end.
+
+Usage:
+  python tools/batch_process.py data/ input_csv/*.csv -o final_output/all_orders_final.csv
+  python tools/batch_process.py "archive/**/*.html" -o final_output/archive.csv --jobs 8
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple
+
+from embedded_json import iter_orders, load_payload, orders_to_rows
+from export_formats import write_canonical
+from finalize_translated_csv import CANONICAL_HEADERS, CleanEngine, _column, iter_csv_rows, map_headers
+from intermediate import IntermediateUnavailable, check_available
+from metrics import Metrics, profiling
+
+
+HTML_SUFFIXES = ('.html', '.htm')
+CSV_SUFFIXES = ('.csv',)
+
+FileResult = Tuple[str, List[List[str]], float]
+
+
+def expand_inputs(specs: List[str]) -> List[Path]:
+    """Resolve directories, globs and plain paths into a sorted, de-duplicated file list."""
+    found = set()
+    for spec in specs:
+        p = Path(spec)
+        if p.is_dir():
+            candidates = [c for c in p.iterdir() if c.suffix.lower() in HTML_SUFFIXES + CSV_SUFFIXES]
+        elif p.exists():
+            candidates = [p]
+        else:
+            candidates = [Path(g) for g in glob.glob(spec, recursive=True)]
+        found.update(c.resolve() for c in candidates if c.is_file())
+    return sorted(found)
+
+
+def to_canonical(header: List[str], rows: Iterator[List[str]]) -> List[List[str]]:
+    # same column choice as CleanEngine: with duplicate headers the last column wins
+    mapped = [h.lower() for h in map_headers(header)]
+    index = [_column(mapped, h) for h in CANONICAL_HEADERS]
+    out = []
+    for r in rows:
+        out.append([r[i] if i is not None and i < len(r) else '' for i in index])
+    return out
+
+
+def load_file(path: str) -> FileResult:
+    """Worker: load one input file as canonical rows; returns (path, rows, seconds)."""
+    start = perf_counter()
+    p = Path(path)
+    if p.suffix.lower() in HTML_SUFFIXES:
+        payload = load_payload(p)
+        rows = list(orders_to_rows(iter_orders(payload))) if payload else []
+    else:
+        it = iter_csv_rows(path)
+        header = next(it, None)
+        rows = to_canonical(header, it) if header else []
+    return path, rows, perf_counter() - start
+
+
+def merge_orders(results: List[FileResult]) -> Iterator[List[str]]:
+    """Merge canonical rows across files; the last file containing an order_id wins."""
+    oid_idx = CANONICAL_HEADERS.index('order_id')
+    orders: Dict[str, List[List[str]]] = {}
+    anon = 0
+    for _, rows, _ in results:
+        seen_here: Dict[str, List[List[str]]] = {}
+        current = None
+        for r in rows:
+            oid = r[oid_idx].strip()
+            if oid:
+                current = oid
+            elif current is None:
+                # item rows without any order id: keep them, each as its own entry
+                anon += 1
+                orders[f'__anon_{anon}'] = [r]
+                continue
+            seen_here.setdefault(current, []).append(r)
+        for oid, group in seen_here.items():
+            # assignment keeps the order's first-seen position, only its rows are replaced
+            orders[oid] = group
+    for group in orders.values():
+        yield from group
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description='Extract, merge and finalize many saved pages / CSV exports at once')
+    p.add_argument('inputs', nargs='+', help='Files, directories or glob patterns (.html/.htm/.csv)')
+    p.add_argument('-o', '--output', required=True, help='Consolidated final CSV path')
+    p.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+    p.add_argument('--no-collapse', dest='collapse', action='store_false',
+                   help='Keep order_id/paid/shipping on every row')
+    p.add_argument('--no-zero-shipping', dest='zero_shipping', action='store_false',
+                   help='Do not force shipping to 0 when sum(items)==paid')
+    p.add_argument('--profile', metavar='PATH',
+                   help='Time each stage; write a JSON metrics summary (*.json) or cProfile stats (other paths)')
+    args = p.parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print('No input files found', file=sys.stderr)
+        return 2
+    try:
+        check_available(args.output)
+    except IntermediateUnavailable as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    metrics = Metrics()
+    with profiling(args.profile, metrics):
+        run(args, files, metrics)
+    return 0
+
+
+def run(args: argparse.Namespace, files: List[Path], metrics: Metrics) -> None:
+    start = perf_counter()
+    paths = [str(f) for f in files]
+    with metrics.stage('load'):
+        if args.jobs > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(args.jobs, len(paths))) as pool:
+                # map keeps input order, which merge_orders relies on for "newest file wins"
+                results = list(pool.map(load_file, paths))
+        else:
+            results = [load_file(path) for path in paths]
+
+    counts = {'merged': 0, 'kept': 0, 'out': 0}
+
+    def counted(it, key):
+        for r in it:
+            counts[key] += 1
+            yield r
+
+    engine = CleanEngine(list(CANONICAL_HEADERS), collapse_groups=args.collapse,
+                         zero_shipping_if_equal=args.zero_shipping)
+    merged = counted(metrics.timed_iter('merge', merge_orders(results)), 'merged')
+    kept = counted(metrics.timed_iter('clean', engine.meaningful_rows(merged)), 'kept')
+    final_rows = metrics.timed_iter('group', engine.group_rows(kept))
+    with metrics.stage('write'):
+        write_canonical(args.output, counted(final_rows, 'out'))
+
+    total_in = 0
+    print('Per-file timings:')
+    for path, rows, secs in results:
+        total_in += len(rows)
+        metrics.observe('file_load_seconds', secs)
+        metrics.incr('bytes_read', os.path.getsize(path))
+        print(f'  {secs * 1000:8.1f} ms  {len(rows):7d} rows  {path}')
+    metrics.incr('rows_read', total_in)
+    metrics.incr('rows_merged_away', total_in - counts['merged'])
+    metrics.incr('rows_dropped', counts['merged'] - counts['kept'])
+    metrics.incr('rows_written', counts['out'])
+    metrics.incr('bytes_written', os.path.getsize(args.output))
+    print(f'Wrote {counts["out"]} rows to {args.output} (from {total_in} rows in {len(results)} files) '
+          f'in {perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+checkpoint.py
+
+Append-only checkpoint journal for translate_all_progress.py, plus an atomic writer for dict rows.
+
+The journal is a JSON-lines file. The first line fingerprints the input (path, size,
+mtime, columns) and the translation settings (backend, languages, segment mode) so a resume
+against a different file or with different settings is refused; every following line
+records one completed translation as ``{"text": <source>, "value": <translation>}``.
+Translations are planned per distinct string and applied while rows stream to the
+output, so the journal is keyed by source text: resuming skips every cell holding an
+already-translated string. Lines are appended as batches complete and flushed
+incrementally, so a crash loses at most the batch in flight. A torn final line (crash
+mid-write) is ignored on load and cut off before a resumed run appends to the journal.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from export_formats import write_rows
+
+
+class CheckpointMismatch(RuntimeError):
+    """The journal on disk belongs to a different input file."""
+
+
+def input_fingerprint(path: Path, fields: List[str], settings: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """Identity of a run: the input file and the translation settings (backend, languages, segment mode)."""
+    st = path.stat()
+    return {'input': str(path.resolve()), 'size': st.st_size, 'mtime': int(st.st_mtime), 'fields': fields,
+            'settings': settings or {}}
+
+
+def default_journal_path(output: Path) -> Path:
+    return output.with_name(output.name + '.journal.jsonl')
+
+
+def load_journal(path: Path, fingerprint: Dict[str, object]) -> Tuple[Dict[str, str], int]:
+    """Return (completed translations, byte length of the intact journal prefix) from an existing journal.
+
+    Reading stops at the first torn line (crash mid-write, no trailing newline or invalid JSON);
+    the journal is truncated to the returned length before new records are appended to it.
+    """
+    done: Dict[str, str] = {}
+    if not path.exists():
+        return done, 0
+    with path.open('rb') as fh:
+        first = fh.readline()
+        if not first:
+            return done, 0
+        try:
+            header = json.loads(first)
+        except ValueError:
+            raise CheckpointMismatch(f'Unreadable checkpoint header in {path}')
+        if header != fingerprint:
+            raise CheckpointMismatch(f'Checkpoint {path} was written for a different input or translation settings; '
+                                     'delete it or drop --resume')
+        end = len(first)
+        for line in fh:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # torn write from a crash: everything before it is still valid
+                break
+            done[rec['text']] = rec['value']
+            end += len(line)
+    return done, end
+
+
+class CheckpointJournal:
+    def __init__(self, path: Path, fingerprint: Dict[str, object], resume: bool = False,
+                 valid_size: Optional[int] = None) -> None:
+        """Open the journal for writing; with resume an existing one is appended to.
+
+        `valid_size` (from load_journal) cuts a torn final line off first, so appended records
+        start on a line of their own.
+        """
+        self.path = path
+        fresh = not (resume and path.exists() and path.stat().st_size > 0 and valid_size != 0)
+        if not fresh and valid_size is not None and path.stat().st_size > valid_size:
+            with path.open('r+b') as fh:
+                fh.truncate(valid_size)
+        self._fh = path.open('w' if fresh else 'a', encoding='utf-8', newline='\n')
+        if fresh:
+            self._fh.write(json.dumps(fingerprint, ensure_ascii=False) + '\n')
+            self.flush()
+
+    def record(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        self._fh.writelines(
+            json.dumps({'text': t, 'value': v}, ensure_ascii=False) + '\n' for t, v in pairs
+        )
+
+    def flush(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self, remove: bool = False) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+
+def atomic_write_csv(path: Path, fields: List[str], rows: Iterable[Dict[str, str]]) -> None:
+    """Write dict rows to a temp file beside `path` and rename it into place.
+
+    The format follows the suffix (.parquet/.arrow, .jsonl, .md, else CSV), see export_formats.py.
+    """
+    write_rows(path, fields, ([row.get(f, '') for f in fields] for row in rows))
+
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+embedded_json.py
+
+Extract orders from a saved Taobao "Bought items" page (HTML -> orders stage).
+
+The page embeds its order list as ``var data = JSON.parse('...');``. Instead of running
+a lazy regex over the whole decoded page and chaining several replace/unicode_escape
+round-trips, this module
+
+  1. memory-maps the file and picks the charset declared in the page (<meta charset>),
+  2. locates the marker and the closing quote of the JS string directly on the mapped bytes,
+  3. decodes only that slice, resolving JS escapes (\\" \\/ \\uXXXX \\xHH ...) in one pass,
+  4. yields ``MainOrder`` / ``SubOrder`` records built from ``mainOrders``/``subOrders``.
+
+The rest of the page (inline scripts, styles, markup -- usually most of it) is never copied
+or decoded, so memory and decode time follow the payload size, not the page size. Payloads
+whose escapes are all valid JSON escapes (the usual case) are unescaped by the json module's
+C scanner; anything JavaScript-only (\\' \\xHH \\u{...} octal, line continuations) takes the
+regex path.
+
+Usage:
+  python tools/embedded_json.py "data/Bought the product.html" -o input_csv/page_orders.csv
+
+The CSV uses the same columns as the userscript export (CANONICAL_HEADERS), so it can be
+fed straight into translate_all_progress.py / finalize_translated_csv.py.
+"""
+from __future__ import annotations
+
+import argparse
+import codecs
+import json
+import mmap
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from export_formats import write_canonical
+
+
+MARKER_RE = re.compile(rb"var\s+data\s*=\s*JSON\.parse\('")
+# Charset declarations live in <head>; browsers only look at the first 1024 bytes, be a bit more lenient
+CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+CHARSET_SCAN_BYTES = 4096
+# GBK/GB2312 pages routinely contain GB18030-only characters; gb18030 is a strict superset
+CHARSET_ALIASES = {'gbk': 'gb18030', 'gb2312': 'gb18030', 'x-gbk': 'gb18030'}
+
+JS_ESCAPE_RE = re.compile(r'\\(u\{[0-9A-Fa-f]+\}|u[0-9A-Fa-f]{4}|x[0-9A-Fa-f]{2}|[0-7]{1,3}|\r\n|.)', re.DOTALL)
+JS_SIMPLE_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f', 'v': '\v',
+                     '\n': '', '\r': '', '\r\n': '', '\u2028': '', '\u2029': ''}
+SURROGATE_RE = re.compile('[\ud800-\udfff]')
+
+CENT = Decimal('0.01')
+
+
+@dataclass
+class SubOrder:
+    item_id: str
+    title: str
+    item_url: str
+    spec: str
+    quantity: int
+    unit_price: Optional[Decimal]
+    item_total: Optional[Decimal]
+
+
+@dataclass
+class MainOrder:
+    order_id: str
+    order_date: str
+    seller: str
+    status: str
+    paid: Optional[Decimal]
+    sub_orders: List[SubOrder] = field(default_factory=list)
+
+
+def detect_charset(data: bytes, default: str = 'utf-8') -> str:
+    m = CHARSET_RE.search(data, 0, CHARSET_SCAN_BYTES)
+    name = m.group(1).decode('ascii').lower() if m else default
+    return CHARSET_ALIASES.get(name, name)
+
+
+def find_payload(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return (start, end) byte offsets of the JS string literal passed to JSON.parse."""
+    m = MARKER_RE.search(data)
+    if not m:
+        return None
+    start = pos = m.end()
+    while True:
+        end = data.find(b"'", pos)
+        if end < 0:
+            return None
+        # a quote preceded by an odd number of backslashes is escaped
+        bs = 0
+        while data[end - 1 - bs] == 0x5C:
+            bs += 1
+        if bs % 2 == 0:
+            return start, end
+        pos = end + 1
+
+
+def _js_escape(m: re.Match) -> str:
+    esc = m.group(1)
+    c = esc[0]
+    if c == 'u' and len(esc) > 1:
+        return chr(int(esc[2:-1] if esc[1] == '{' else esc[1:], 16))
+    if c == 'x' and len(esc) == 3:
+        return chr(int(esc[1:], 16))
+    if c in '01234567':
+        return chr(int(esc, 8))
+    return JS_SIMPLE_ESCAPES.get(esc, esc)
+
+
+def decode_js_string(raw: str) -> str:
+    """Resolve JavaScript string-literal escapes in a single left-to-right pass."""
+    if '\\' not in raw:
+        return raw
+    try:
+        # JSON string escapes are a subset of JavaScript's; an unescaped '"' or a JS-only escape
+        # makes this fail and the general path below handles the literal
+        out = json.loads('"' + raw + '"', strict=False)
+    except ValueError:
+        out = JS_ESCAPE_RE.sub(_js_escape, raw)
+    if SURROGATE_RE.search(out):
+        # \uD83D\uDE00-style pairs decode to two surrogates; merge them into real code points
+        out = out.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+    return out
+
+
+def decode_payload(data) -> Optional[dict]:
+    """Payload of a page given as bytes or any buffer (e.g. an mmap); only the payload slice is decoded."""
+    span = find_payload(data)
+    if span is None:
+        return None
+    with memoryview(data) as view:
+        raw = codecs.decode(view[span[0]:span[1]], detect_charset(data), 'replace')
+    return json.loads(decode_js_string(raw))
+
+
+def load_payload(path: Path) -> Optional[dict]:
+    with open(path, 'rb') as fh:
+        try:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file: nothing to map
+            return None
+        with mapped:
+            return decode_payload(mapped)
+
+
+def _num(v) -> Optional[Decimal]:
+    if v is None or v == '':
+        return None
+    try:
+        d = Decimal(str(v).replace('¥', '').replace('￥', '').replace(',', '').strip())
+    except InvalidOperation:
+        return None
+    return d if d.is_finite() else None
+
+
+def _qty(v) -> int:
+    try:
+        return int(Decimal(str(v)))
+    except (InvalidOperation, ValueError):
+        return 0
+
+
+def _order_date(order: dict) -> str:
+    info = order.get('orderInfo') or {}
+    pay = order.get('payInfo') or {}
+    raw = (info.get('createTime') or info.get('createDate') or info.get('gmtCreate') or order.get('createTime')
+           or order.get('createDate') or pay.get('payTime') or pay.get('createTime') or info.get('createDay') or '')
+    raw = str(raw)
+    if raw.isdigit() and len(raw) in (10, 13):
+        secs = int(raw) / (1000 if len(raw) == 13 else 1)
+        return datetime.fromtimestamp(secs, tz=timezone.utc).strftime('%Y-%m-%d')
+    return raw.split(' ')[0].split('T')[0]
+
+
+def _seller(order: dict) -> str:
+    seller = order.get('seller') or {}
+    name = (seller.get('shopName') or seller.get('shopTitle') or seller.get('storeName') or seller.get('name')
+            or seller.get('nick') or '')
+    subs = order.get('subOrders') or []
+    if not name and subs:
+        s0 = subs[0] or {}
+        s0_seller = s0.get('seller') or {}
+        name = (s0_seller.get('shopName') or s0_seller.get('name') or s0_seller.get('nick') or s0.get('shopName')
+                or s0.get('shopTitle') or '')
+    name = name or order.get('sellerName') or order.get('shopName') or ''
+    # same as the userscript: keep commas out of the seller column
+    return str(name).replace(',', '，')
+
+
+def _sub_order(so: dict) -> SubOrder:
+    it = so.get('itemInfo') or {}
+    spi = so.get('priceInfo') or {}
+    ipi = it.get('priceInfo') or {}
+    qty = _qty(so.get('quantity') or it.get('quantity') or so.get('count') or 0)
+    unit = None
+    for c in (spi.get('realTotal') or ipi.get('realTotal'), spi.get('original') or ipi.get('original'),
+              so.get('price'), so.get('unitPrice'), so.get('skuPrice'), so.get('payPrice'),
+              it.get('price'), it.get('promotionPrice'), it.get('skuPrice')):
+        unit = _num(c)
+        if unit is not None:
+            break
+    explicit = _num(so.get('totalFee'))
+    if explicit is None:
+        explicit = _num(so.get('totalPayment'))
+    if explicit is not None and qty > 0:
+        unit = (explicit / qty).quantize(CENT, rounding=ROUND_HALF_UP)
+        total = explicit
+    else:
+        total = unit * qty if unit is not None and qty > 0 else None
+    title = it.get('title') or so.get('title') or ''
+    spec = '  '.join(f"{s.get('name')}：{s.get('value')}" for s in (it.get('skuText') or []) if s.get('value'))
+    return SubOrder(
+        item_id=str(it.get('id') or it.get('itemId') or so.get('itemId') or so.get('skuId') or it.get('skuId') or ''),
+        title=str(title).replace(',', '，'),
+        item_url=re.sub(r'^//', 'https://', it.get('itemUrl') or so.get('itemUrl') or ''),
+        spec=spec,
+        quantity=qty,
+        unit_price=unit,
+        item_total=total,
+    )
+
+
+def iter_orders(payload: dict) -> Iterator[MainOrder]:
+    for order in (payload or {}).get('mainOrders') or []:
+        info = order.get('orderInfo') or {}
+        yield MainOrder(
+            order_id=str(info.get('id') or order.get('id') or ''),
+            order_date=_order_date(order),
+            seller=_seller(order),
+            status=str((order.get('statusInfo') or {}).get('text') or ''),
+            paid=_num((order.get('payInfo') or {}).get('actualFee')),
+            sub_orders=[_sub_order(so) for so in order.get('subOrders') or []],
+        )
+
+
+def iter_page_orders(path: Path) -> Iterator[MainOrder]:
+    payload = load_payload(path)
+    if payload is None:
+        return iter(())
+    return iter_orders(payload)
+
+
+def _money(d: Optional[Decimal]) -> str:
+    return '' if d is None else str(d.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def orders_to_rows(orders: Iterable[MainOrder]) -> Iterator[List[str]]:
+    """Rows in CANONICAL_HEADERS order, like the userscript export (order id on every item row)."""
+    for o in orders:
+        sum_items = sum((s.item_total.quantize(CENT, rounding=ROUND_HALF_UP) for s in o.sub_orders
+                         if s.item_total is not None), Decimal('0.00'))
+        # signed like finalize_translated_csv.py: negative when discounts/coupons cut the paid amount
+        shipping = o.paid - sum_items if o.paid is not None else None
+        for n, s in enumerate(o.sub_orders):
+            first = n == 0
+            yield [o.order_id, o.order_date, o.seller, s.title, s.spec, s.item_url, s.item_id,
+                   _money(s.unit_price), str(s.quantity or ''), _money(s.item_total),
+                   _money(o.paid) if first else '', _money(shipping) if first else '']
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description='Extract orders embedded in a saved Taobao order page')
+    p.add_argument('input', help='Saved order page (.html)')
+    p.add_argument('-o', '--output', help='Write orders as CSV (default: print a summary)')
+    args = p.parse_args(argv)
+
+    path = Path(args.input)
+    if not path.exists():
+        print(f'Input file not found: {path}', file=sys.stderr)
+        return 2
+    payload = load_payload(path)
+    if payload is None:
+        print(f'No embedded JSON found in {path}', file=sys.stderr)
+        return 3
+    orders = list(iter_orders(payload))
+    items = sum(len(o.sub_orders) for o in orders)
+    if args.output:
+        write_canonical(args.output, orders_to_rows(orders))
+        print(f'Wrote {items} item rows from {len(orders)} orders to {args.output}')
+    else:
+        print(f'{len(orders)} orders, {items} items')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
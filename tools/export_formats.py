@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+export_formats.py
+
+Shared export layer: every stage writes its rows through ``write_rows()`` (or
+``write_canonical()`` for order rows), which
+
+  * validates the header -- and the width of every row -- against a schema, by default
+    CANONICAL_HEADERS, so a stage cannot emit a drifted layout (``spec`` instead of
+    ``specification``, a missing ``lieferkosten`` column, ...);
+  * writes to a temp file beside the target and renames it into place, so readers never
+    see a half-written export;
+  * formats rows in blocks of EXPORT_BLOCK_ROWS (one ``writerows`` call per block) through
+    a large write buffer, in a single pass over the rows.
+
+The format follows the output suffix, or an explicit ``fmt``:
+
+  csv        .csv (and anything unknown)  UTF-8 with BOM, like the Taobao exports
+  jsonl      .jsonl / .ndjson             one JSON object per row, keyed by the header
+  parquet    .parquet / .pq               typed columnar table, see intermediate.py
+  arrow      .arrow / .feather / .ipc     Arrow IPC file, see intermediate.py
+  md         .md / .markdown              Markdown table, e.g. for a README or an issue
+
+JSON Lines files are read back by ``iter_jsonl_rows()`` (and so by finalize's
+``iter_csv_rows()``) as header + rows, exactly like a CSV.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Sequence
+
+from intermediate import ARROW_SUFFIXES, PARQUET_SUFFIXES, write_table
+
+# Canonical header ordering we prefer in the final CSV
+CANONICAL_HEADERS = [
+    'order_id', 'order_date', 'seller', 'title', 'specification',
+    'item_url', 'item_id', 'unit_price', 'quantity', 'item_total', 'paid', 'lieferkosten'
+]
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet', 'arrow', 'md')
+FORMAT_SUFFIXES = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.md': 'md',
+    '.markdown': 'md',
+    **{s: 'parquet' for s in PARQUET_SUFFIXES},
+    **{s: 'arrow' for s in ARROW_SUFFIXES},
+}
+
+EXPORT_BLOCK_ROWS = 8192
+WRITE_BUFFER = 1 << 20
+
+
+class SchemaError(ValueError):
+    """An export's header or row width does not match the schema it is written against."""
+
+
+def export_format(path, fmt: Optional[str] = None) -> str:
+    """The format `path` is written in: `fmt` if given, else by suffix (CSV for unknown ones)."""
+    if fmt:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'unknown export format {fmt!r} (choose from {", ".join(EXPORT_FORMATS)})')
+        return fmt
+    return FORMAT_SUFFIXES.get(Path(path).suffix.lower(), 'csv')
+
+
+def is_jsonl_path(path) -> bool:
+    return export_format(path) == 'jsonl'
+
+
+def validate_header(header: Sequence[str], schema: Sequence[str] = CANONICAL_HEADERS) -> None:
+    """Raise SchemaError unless `header` is exactly `schema` (same names, same order)."""
+    if list(header) == list(schema):
+        return
+    missing = [h for h in schema if h not in header]
+    unexpected = [h for h in header if h not in schema]
+    detail = []
+    if missing:
+        detail.append('missing ' + ', '.join(missing))
+    if unexpected:
+        detail.append('unexpected ' + ', '.join(unexpected))
+    raise SchemaError(f'header does not match the export schema ({"; ".join(detail) or "column order differs"})')
+
+
+def _blocks(rows: Iterable[Sequence[str]], width: Optional[int]) -> Iterator[List[Sequence[str]]]:
+    it = iter(rows)
+    seen = 0
+    while True:
+        block = list(islice(it, EXPORT_BLOCK_ROWS))
+        if not block:
+            return
+        if width is not None and any(len(r) != width for r in block):
+            bad = next(i for i, r in enumerate(block) if len(r) != width)
+            raise SchemaError(f'row {seen + bad + 1} has {len(block[bad])} cells, the schema has {width}')
+        seen += len(block)
+        yield block
+
+
+def replace_file(tmp, path) -> None:
+    """os.replace(tmp, path), with `tmp` first given the mode `path` has (or gets from open()).
+
+    mkstemp() creates its files 0600; without this every atomically written output would end
+    up private to the user, whatever the old file's mode or the umask.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def atomic_open(path, encoding: str = 'utf-8-sig') -> Iterator[IO[str]]:
+    """Text handle on a temp file beside `path` that replaces `path` once the block succeeds.
+
+    Non-regular targets (/dev/stdout, a named pipe) are written to directly.
+    """
+    path = Path(path)
+    if path.exists() and not path.is_file():
+        with path.open('w', encoding=encoding, newline='') as fh:
+            yield fh
+        return
+    fd, tmp = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=str(path.parent or Path('.')))
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='', buffering=WRITE_BUFFER) as fh:
+            yield fh
+            fh.flush()
+            os.fsync(fh.fileno())
+        replace_file(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _write_csv(fh: IO[str], header: Sequence[str], blocks: Iterable[List[Sequence[str]]]) -> int:
+    writer = csv.writer(fh)
+    writer.writerow(header)
+    count = 0
+    for block in blocks:
+        writer.writerows(block)
+        count += len(block)
+    return count
+
+
+def _write_jsonl(fh: IO[str], header: Sequence[str], blocks: Iterable[List[Sequence[str]]]) -> int:
+    keys = list(header)
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    count = 0
+    for block in blocks:
+        fh.write(''.join([dumps(dict(zip(keys, r))) + '\n' for r in block]))
+        count += len(block)
+    return count
+
+
+def _md_cell(value) -> str:
+    text = '' if value is None else str(value)
+    return text.replace('\\', '\\\\').replace('|', '\\|').replace('\r\n', '<br>').replace('\n', '<br>')
+
+
+def _write_md(fh: IO[str], header: Sequence[str], blocks: Iterable[List[Sequence[str]]]) -> int:
+    fh.write('| ' + ' | '.join(map(_md_cell, header)) + ' |\n')
+    fh.write('|' + '---|' * len(header) + '\n')
+    count = 0
+    for block in blocks:
+        fh.write(''.join(['| ' + ' | '.join(map(_md_cell, r)) + ' |\n' for r in block]))
+        count += len(block)
+    return count
+
+
+TEXT_WRITERS = {
+    # format -> (writer, encoding)
+    'csv': (_write_csv, 'utf-8-sig'),
+    'jsonl': (_write_jsonl, 'utf-8'),
+    'md': (_write_md, 'utf-8'),
+}
+
+
+def write_rows(path, header: Sequence[str], rows: Iterable[Sequence[str]], fmt: Optional[str] = None,
+               schema: Optional[Sequence[str]] = None) -> int:
+    """Write header + rows to `path` atomically in the format of export_format(); returns the row count.
+
+    With a `schema` the header must match it exactly and every row must have its width.
+    """
+    if schema is not None:
+        validate_header(header, schema)
+    width = len(header) if schema is not None else None
+    fmt = export_format(path, fmt)
+    if fmt in ('parquet', 'arrow'):
+        if fmt != export_format(path):
+            raise ValueError(f'{fmt} output needs a matching file suffix, got {path}')
+        return write_table(path, header, (r for b in _blocks(rows, width) for r in b))
+    writer, encoding = TEXT_WRITERS[fmt]
+    with atomic_open(path, encoding) as fh:
+        return writer(fh, header, _blocks(rows, width))
+
+
+def write_canonical(path, rows: Iterable[Sequence[str]], fmt: Optional[str] = None) -> int:
+    """write_rows() for order rows in the CANONICAL_HEADERS layout."""
+    return write_rows(path, CANONICAL_HEADERS, rows, fmt, schema=CANONICAL_HEADERS)
+
+
+def iter_jsonl_rows(path) -> Iterator[List[str]]:
+    """Header, then one row per line of a JSON Lines export (keys of the first object are the header)."""
+    with open(path, 'r', encoding='utf-8-sig') as fh:
+        header: Optional[List[str]] = None
+        for line in fh:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if header is None:
+                header = list(record)
+                yield header
+            yield ['' if record.get(h) is None else str(record.get(h)) for h in header]
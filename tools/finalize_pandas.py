@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+finalize_pandas.py
+
+Columnar implementation of the finalize step, used by
+``finalize_translated_csv.py --engine pandas``. This module imports pandas at the top;
+finalize_translated_csv.py only imports it when that engine is requested.
+
+The result is byte-identical to the row engine (CleanEngine):
+
+  * the input is loaded with every column as ``str`` (no NA conversion), headers are
+    mapped with HEADER_MAP and columns resolved exactly like CleanEngine (last duplicate wins);
+  * cells are dictionary-encoded per column (``pd.factorize``): the junk-row filter and the
+    price/quantity parsing run once per distinct value and are broadcast back via the codes,
+    which is what makes this fast -- exports repeat the same prices, quantities and sellers;
+  * prices are int64 cents: a cell whose stripped text is a plain number with at most two
+    decimals (and a plain integer quantity) is parsed on this fast path, so
+    ``unit_price * quantity`` is exact and needs no rounding. An order containing a
+    price/quantity cell outside that canonical form (more decimals, signs, exponents,
+    full-width digits, ...) is computed by CleanEngine with Decimal/ROUND_HALF_UP instead;
+  * orders are runs of consecutive rows with the same order_id (rows without one are their
+    own order), so per-order sums are ``np.add.reduceat`` over the run starts; shipping is
+    ``paid - sum(items)`` and order-level fields of all but the first row are cleared with a mask.
+
+Recorder-format exports and files the C parser rejects (rows wider than the header) are
+decoded with the regular streaming reader and then processed the same way.
+"""
+from __future__ import annotations
+
+import csv
+import re
+import warnings
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from finalize_translated_csv import (CANONICAL_HEADERS, DIGIT_RE, MEANINGFUL_RE, PRICE_STRIP, CleanEngine, _column,
+                                     iter_csv_rows, map_headers)
+from intermediate import is_table_path, read_table_columns
+from recorder_csv import is_wrapped
+
+# canonical cells parsed on the fast path; the limits keep every item total far inside int64
+PRICE_RE = re.compile(r'[0-9]{1,9}(?:\.[0-9]{1,2})?')
+QUANTITY_RE = re.compile(r'[0-9]{1,6}')
+# codes for cells that do not parse on the fast path
+BLANK = -1
+ODD = -2
+INT64_SAFE = 2 ** 62
+
+
+def _sniff(path: str) -> Tuple[Optional[List[str]], bool]:
+    """Return (header, wrapped) from the first two records."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as fh:
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        first = next(reader, None)
+    return header, bool(header and first and is_wrapped(header, first))
+
+
+def load_frame(path: str) -> Tuple[Optional[List[str]], pd.DataFrame]:
+    """Read `path` as (raw header, DataFrame of str cells with positional column labels)."""
+    if is_table_path(path):
+        header, columns = read_table_columns(path)
+        return header, pd.DataFrame({i: pd.array(c, dtype=str) for i, c in enumerate(columns)},
+                                    columns=range(len(header)))
+    header, wrapped = _sniff(path)
+    if header is None:
+        return None, pd.DataFrame()
+    width = len(header)
+    if not wrapped:
+        try:
+            with warnings.catch_warnings():
+                # a wide first row only warns (and would otherwise become the index); treat it like the rest
+                warnings.simplefilter('error', pd.errors.ParserWarning)
+                df = pd.read_csv(path, header=0, index_col=False, dtype=str, na_filter=False,
+                                 encoding='utf-8-sig', engine='c')
+            df.columns = range(width)
+            return header, df
+        except (pd.errors.ParserError, pd.errors.ParserWarning):
+            # rows wider than the header: let the csv module + row normalization handle it
+            pass
+    rows = iter_csv_rows(path)
+    next(rows, None)
+    records = [r[:width] if len(r) >= width else r + [''] * (width - len(r)) for r in rows if r]
+    return header, pd.DataFrame.from_records(records, columns=range(width)).astype(str)
+
+
+def by_value(column: pd.Series, fn: Callable[[str], object], dtype) -> np.ndarray:
+    """Apply `fn` once per distinct cell value; returns the results aligned with `column`."""
+    codes, uniques = pd.factorize(column)
+    values = np.fromiter((fn(u) for u in uniques), dtype=dtype, count=len(uniques))
+    return values[codes]
+
+
+def price_code(s: str) -> int:
+    """Cents of a canonical price cell, BLANK when it parses to nothing, ODD otherwise."""
+    s = s.translate(PRICE_STRIP)
+    if not s:
+        return BLANK
+    if not PRICE_RE.fullmatch(s):
+        return ODD
+    whole, _, frac = s.partition('.')
+    return int(whole) * 100 + int(frac.ljust(2, '0'))
+
+
+def quantity_code(s: str) -> int:
+    s = s.strip()
+    if not s:
+        return BLANK
+    return int(s) if QUANTITY_RE.fullmatch(s) else ODD
+
+
+def format_cents(c: int) -> str:
+    sign = '-' if c < 0 else ''
+    c = abs(c)
+    return f'{sign}{c // 100}.{c % 100:02d}'
+
+
+class FrameCleaner:
+    """Vectorized counterpart of CleanEngine for one input header."""
+
+    def __init__(self, input_header: List[str], collapse_groups: bool = True,
+                 zero_shipping_if_equal: bool = True) -> None:
+        self.engine = CleanEngine(input_header, collapse_groups, zero_shipping_if_equal)
+        lower = [h.lower() for h in map_headers(input_header)]
+        self.src = [_column(lower, h) for h in CANONICAL_HEADERS]
+        self.collapse_groups = collapse_groups
+
+    def meaningful(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop junk rows; same rules as CleanEngine.meaningful_rows()."""
+        if df.empty:
+            return df
+        e = self.engine
+        price_ok = np.zeros(len(df), dtype=bool)
+        for pi in e.price_idxs:
+            price_ok |= by_value(df[pi], lambda u: DIGIT_RE.search(u) is not None, bool)
+        if e.title_idx is None:
+            # a digit in a price column is itself meaningful
+            return df[price_ok]
+        title = df[e.title_idx]
+        title_ok = by_value(title, lambda u: bool(u.strip()), bool)
+        # a price digit or a meaningful title settles it; only titles made of punctuation alone
+        # need the remaining columns checked
+        settled = price_ok | by_value(title, lambda u: MEANINGFUL_RE.search(u) is not None, bool)
+        unsure = np.flatnonzero(title_ok & ~settled)
+        if len(unsure):
+            search = MEANINGFUL_RE.search
+            rows = df.iloc[unsure].to_numpy(dtype=object).tolist()
+            settled[unsure] = [search('\0'.join(r)) is not None for r in rows]
+        return df[(title_ok | price_ok) & settled]
+
+    def _codes(self, df: pd.DataFrame, idx: Optional[int], fn: Callable[[str], int]) -> np.ndarray:
+        if idx is None:
+            return np.full(len(df), BLANK, dtype=np.int64)
+        return by_value(df[idx], fn, np.int64)
+
+    def clean(self, df: pd.DataFrame) -> np.ndarray:
+        """Return the final rows (CANONICAL_HEADERS order) as a 2-D object array."""
+        n = len(df)
+        out = np.empty((n, len(CANONICAL_HEADERS)), dtype=object)
+        for j, idx in enumerate(self.src):
+            out[:, j] = '' if idx is None else df[idx].to_numpy(dtype=object)
+        if not self.collapse_groups or n == 0:
+            return out
+
+        e = self.engine
+        # order runs: a row starts a new order when its stripped id is empty or differs from the previous one
+        start = np.ones(n, dtype=bool)
+        if e.oid_idx is not None:
+            codes, uniques = pd.factorize(df[e.oid_idx])
+            stripped = [u.strip() for u in uniques]
+            ids = {}
+            oid = np.fromiter((ids.setdefault(s, len(ids)) for s in stripped), dtype=np.int64,
+                              count=len(stripped))[codes]
+            start[1:] = oid[1:] != oid[:-1]
+            if '' in ids:
+                start |= oid == ids['']
+        starts = np.flatnonzero(start)
+        gid = np.cumsum(start) - 1
+
+        unit = self._codes(df, e.unit_idx, price_code)
+        total = self._codes(df, e.total_idx, price_code)
+        paid = self._codes(df, e.paid_idx, price_code)
+        qty = self._codes(df, e.qty_idx, quantity_code)
+
+        # item total in cents: unit * quantity when both parse, else the explicit item_total
+        both = (unit >= 0) & (qty >= 0)
+        item = np.where(both, unit * qty, np.maximum(total, 0))
+        sum_items = np.add.reduceat(item, starts)
+
+        # first parsable paid value of every order; orders without one keep their raw
+        # paid / shipping cells, as in CleanEngine
+        first_paid = np.minimum.reduceat(np.where(paid >= 0, np.arange(n), n), starts)
+        has_paid = first_paid < n
+        pos = starts[has_paid]
+        p = paid[first_paid[has_paid]]
+        ship = p - sum_items[has_paid]
+        out[pos, CANONICAL_HEADERS.index('paid')] = by_value(pd.Series(p), format_cents, object)
+        out[pos, CANONICAL_HEADERS.index('lieferkosten')] = by_value(pd.Series(ship), format_cents, object)
+
+        # all other rows of an order lose the order-level fields
+        rest = ~start
+        for name in ('order_id', 'paid', 'lieferkosten'):
+            out[rest, CANONICAL_HEADERS.index(name)] = ''
+
+        # orders with non-canonical numbers (or sums near the int64 range) take the Decimal path
+        odd = (unit == ODD) | (total == ODD) | (paid == ODD) | (qty == ODD)
+        slow = np.zeros(len(starts), dtype=bool)
+        slow[gid[odd]] = True
+        slow |= np.add.reduceat(np.abs(item).astype(np.float64), starts) >= INT64_SAFE
+        if slow.any():
+            positions = np.flatnonzero(slow[gid])
+            rows = df.iloc[positions].to_numpy(dtype=object).tolist()
+            gids = gid[positions]
+            k = 0
+            while k < len(rows):
+                end = k + 1
+                while end < len(rows) and gids[end] == gids[k]:
+                    end += 1
+                for offset, r in enumerate(e._group(rows[k:end])):
+                    out[positions[k + offset]] = r
+                k = end
+        return out
+
+
+def clean_frame(input_header: List[str], df: pd.DataFrame, collapse_groups: bool = True,
+                zero_shipping_if_equal: bool = True) -> np.ndarray:
+    cleaner = FrameCleaner(input_header, collapse_groups, zero_shipping_if_equal)
+    return cleaner.clean(cleaner.meaningful(df))
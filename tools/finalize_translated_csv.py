@@ -10,19 +10,41 @@ Usage:
   python tools/finalize_translated_csv.py -i input_no_chinese.csv -o output_final.csv
 
 If -o is omitted the script writes to the input path with '_final' appended before
-the extension.
+the extension. The output suffix (or --format) selects CSV, JSON Lines, Parquet/Arrow or a
+Markdown table, see export_formats.py.
 
-This script is intentionally small and dependency-free (uses only the stdlib).
+Recorder-format exports (each record wrapped in one quoted field) are decoded on the fly,
+see recorder_csv.py.
+
+With ``--jobs N`` the rows are cleaned on N worker processes: this process streams the
+input, cuts it into blocks of whole orders and writes the cleaned blocks back in input
+order, while the workers filter, group, compute totals/shipping and format the CSV lines.
+The output is identical to a single-process run.
+
+This script is intentionally small and dependency-free (uses only the stdlib). The optional
+``--engine pandas`` mode (finalize_pandas.py) processes the file column-wise instead; it
+loads the whole file but produces byte-identical output.
 """
 from __future__ import annotations
 
 import argparse
 import csv
+import io
 import os
 import re
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import sys
-from typing import List, Dict, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from export_formats import (CANONICAL_HEADERS, EXPORT_FORMATS, atomic_open, export_format, is_jsonl_path,
+                            iter_jsonl_rows, validate_header, write_rows)
+from intermediate import IntermediateUnavailable, check_available, is_table_path, iter_table_rows
+from metrics import Metrics, profiling
+from recorder_csv import unwrap_rows
 
 
 HEADER_MAP = {
@@ -40,28 +62,47 @@ HEADER_MAP = {
     '运费': 'lieferkosten'
 }
 
-# Canonical header ordering we prefer in the final CSV
-CANONICAL_HEADERS = [
-    'order_id', 'order_date', 'seller', 'title', 'specification',
-    'item_url', 'item_id', 'unit_price', 'quantity', 'item_total', 'paid', 'lieferkosten'
-]
-
 # Characters considered meaningful (alphanumeric or CJK)
 MEANINGFUL_RE = re.compile(r'[0-9A-Za-z\u4e00-\u9fff]')
+DIGIT_RE = re.compile(r'[0-9]')
 
+# Removed from price cells before parsing: currency signs, thousands separators and every
+# character that regex \s matches (str.isspace() agrees with it; none lie above U+3000)
+PRICE_STRIP = dict.fromkeys(map(ord, '¥￥,' + ''.join(c for c in map(chr, range(0x3001)) if c.isspace())))
 
-def read_csv_rows(path: str) -> List[List[str]]:
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+# Exports repeat the same price strings constantly; memoize parsing per distinct string
+PARSE_CACHE_SIZE = 65536
+
+
+def iter_csv_rows(path: str) -> Iterator[List[str]]:
+    # header first, then data rows; recorder-format exports are unwrapped on the fly
+    if is_table_path(path):
+        # Parquet/Arrow intermediate written by an earlier stage, see intermediate.py
+        yield from iter_table_rows(path)
+        return
+    if is_jsonl_path(path):
+        yield from iter_jsonl_rows(path)
+        return
     with open(path, 'r', encoding='utf-8-sig', newline='') as fh:
         reader = csv.reader(fh)
-        return [row for row in reader]
+        header = next(reader, None)
+        if header is None:
+            return
+        yield header
+        yield from unwrap_rows(header, reader)
 
 
-def write_csv_rows(path: str, header: List[str], rows: List[List[str]]) -> None:
-    with open(path, 'w', encoding='utf-8-sig', newline='') as fh:
-        writer = csv.writer(fh)
-        writer.writerow(header)
-        for r in rows:
-            writer.writerow(r)
+def read_csv_rows(path: str) -> List[List[str]]:
+    return list(iter_csv_rows(path))
+
+
+def write_csv_rows(path: str, header: List[str], rows: Iterable[List[str]], fmt: Optional[str] = None,
+                   schema: Optional[Sequence[str]] = None) -> int:
+    # CSV, JSON Lines, Parquet/Arrow or Markdown by suffix (or fmt), written atomically; see export_formats.py
+    return write_rows(path, header, rows, fmt, schema)
 
 
 def map_headers(input_header: List[str]) -> List[str]:
@@ -73,211 +114,314 @@ def map_headers(input_header: List[str]) -> List[str]:
     return mapped
 
 
-def row_is_meaningful(row: List[str]) -> bool:
-    # Any cell that contains at least one meaningful char qualifies the row
-    for c in row:
-        if c and MEANINGFUL_RE.search(c):
-            return True
-    return False
-
-
-def clean_rows(input_header: List[str], input_rows: List[List[str]], collapse_groups: bool = True, zero_shipping_if_equal: bool = True) -> Tuple[List[str], List[List[str]]]:
-    # Map header names
-    mapped_header = map_headers(input_header)
-
-    # Determine indices for title and price columns (by mapped header name)
-    h_lower = [h.lower() for h in mapped_header]
-    title_idx = None
-    for candidate in ('title', '商品名称'):
-        if candidate in h_lower:
-            title_idx = h_lower.index(candidate)
-            break
-
-    # price-ish columns
-    price_candidates = ['unit_price', 'item_total', 'paid', '单价', '单项总价', '实付款']
-    price_idxs = [i for i, hn in enumerate(h_lower) if hn in price_candidates]
-
-    out_rows: List[List[str]] = []
-
-    for row in input_rows:
-        # normalize row length to header
-        if len(row) < len(mapped_header):
-            row = row + [''] * (len(mapped_header) - len(row))
-        elif len(row) > len(mapped_header):
-            row = row[:len(mapped_header)]
-
-        # quick drop: completely empty or not meaningful at all
-        if not row_is_meaningful(row):
-            continue
-
-        # drop rows that lack both title and any price information
-        title_val = ''
-        if title_idx is not None and title_idx < len(row):
-            title_val = (row[title_idx] or '').strip()
-
-        price_present = False
-        for pi in price_idxs:
-            if pi < len(row):
-                v = (row[pi] or '').strip()
-                if v and re.search(r'[0-9]', v):
-                    price_present = True
+def row_is_meaningful(row: Sequence[str]) -> bool:
+    # Any cell that contains at least one meaningful char qualifies the row;
+    # NUL never matches MEANINGFUL_RE, so one search over the joined row is equivalent
+    return MEANINGFUL_RE.search('\0'.join(row)) is not None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_price(s: str) -> Decimal | None:
+    """Decimal value of a price cell with currency symbols, commas and whitespace removed."""
+    if not s:
+        return None
+    try:
+        return Decimal(s.translate(PRICE_STRIP))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_quantity(s: str) -> Decimal | None:
+    s = s.strip()
+    if not s:
+        return None
+    try:
+        return Decimal(s)
+    except (InvalidOperation, TypeError):
+        return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def item_total_of(unit_raw: str, qty_raw: str, total_raw: str) -> Decimal | None:
+    """unit_price * quantity (or the explicit item_total) rounded half-up to cents."""
+    unit = parse_price(unit_raw)
+    qty = parse_quantity(qty_raw)
+    if unit is not None and qty is not None:
+        return (unit * qty).quantize(CENT, rounding=ROUND_HALF_UP)
+    item_total = parse_price(total_raw)
+    if item_total is not None:
+        return item_total.quantize(CENT, rounding=ROUND_HALF_UP)
+    return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def paid_of(raw: str) -> Decimal | None:
+    p = parse_price(raw)
+    return None if p is None else p.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _column(mapped_lower: List[str], name: str) -> int | None:
+    # mirrors the former dict-per-row lookup: with duplicate headers the last column wins
+    idx = None
+    for i, h in enumerate(mapped_lower):
+        if h == name:
+            idx = i
+    return idx
+
+
+class CleanEngine:
+    """Cleaning plan for one input header: column indices and output getters resolved once.
+
+    Rows are processed as plain lists; order-level values for the first row of a group are
+    appended behind the row and picked up by a precomputed itemgetter, so every output row
+    is a tuple built in one C-level call.
+    """
+
+    def __init__(self, input_header: List[str], collapse_groups: bool = True,
+                 zero_shipping_if_equal: bool = True) -> None:
+        self.mapped_header = map_headers(input_header)
+        self.width = len(self.mapped_header)
+        self.collapse_groups = collapse_groups
+        self.zero_shipping_if_equal = zero_shipping_if_equal
+        lower = [h.lower() for h in self.mapped_header]
+
+        # junk-row filter: title column (first match) and price-ish columns
+        self.title_idx = None
+        for candidate in ('title', '商品名称'):
+            if candidate in lower:
+                self.title_idx = lower.index(candidate)
+                break
+        price_candidates = ('unit_price', 'item_total', 'paid', '单价', '单项总价', '实付款')
+        self.price_idxs = tuple(i for i, hn in enumerate(lower) if hn in price_candidates)
+
+        col = {name: _column(lower, name) for name in ('order_id', 'unit_price', 'quantity', 'item_total', 'paid',
+                                                      'lieferkosten')}
+        self.oid_idx = col['order_id']
+        self.unit_idx = col['unit_price']
+        self.qty_idx = col['quantity']
+        self.total_idx = col['item_total']
+        self.paid_idx = col['paid']
+        self.ship_idx = col['lieferkosten']
+
+        # Output getters work on row + [EMPTY, PAID, SHIPPING]
+        w = self.width
+        empty, paid, ship = w, w + 1, w + 2
+        src = [_column(lower, h) for h in CANONICAL_HEADERS]
+        plain = [empty if i is None else i for i in src]
+        first = list(plain)
+        first[CANONICAL_HEADERS.index('paid')] = paid
+        first[CANONICAL_HEADERS.index('lieferkosten')] = ship
+        rest = list(plain)
+        for name in ('order_id', 'paid', 'lieferkosten'):
+            rest[CANONICAL_HEADERS.index(name)] = empty
+        self._plain = itemgetter(*plain)
+        self._first = itemgetter(*first)
+        self._rest = itemgetter(*rest)
+
+    def meaningful_rows(self, input_rows: Iterable[List[str]]) -> Iterator[List[str]]:
+        """Normalize row length and drop junk rows, one row at a time."""
+        width = self.width
+        title_idx = self.title_idx
+        price_idxs = self.price_idxs
+        search = MEANINGFUL_RE.search
+        digit = DIGIT_RE.search
+        for row in input_rows:
+            # normalize row length to header
+            n = len(row)
+            if n < width:
+                row = row + [''] * (width - n)
+            elif n > width:
+                row = row[:width]
+
+            # quick drop: completely empty or not meaningful at all
+            if search('\0'.join(row)) is None:
+                continue
+
+            # drop rows that lack both title AND any price information
+            if title_idx is not None and (row[title_idx] or '').strip():
+                yield row
+                continue
+            for pi in price_idxs:
+                v = row[pi]
+                if v and digit(v):
+                    yield row
                     break
 
-        # If there's no title AND no price, drop the row
-        if not title_val and not price_present:
-            continue
-
-        out_rows.append(row)
-
-    # If group collapse disabled, simply return mapped header and rows
-    if not collapse_groups:
-        final_header = []
-        header_to_index: Dict[str, int] = {mapped_header[i].lower(): i for i in range(len(mapped_header))}
-        for ch in CANONICAL_HEADERS:
-            final_header.append(ch)
-        final_rows: List[List[str]] = []
-        for r in out_rows:
-            newr: List[str] = []
-            for fh in final_header:
-                idx = header_to_index.get(fh)
-                if idx is not None and idx < len(r):
-                    newr.append(r[idx])
-                else:
-                    newr.append('')
-            final_rows.append(newr)
-        return final_header, final_rows
-
-    # Build list of dict rows keyed by mapped_header
-    mapped_lower = [h.lower() for h in mapped_header]
-    rows_dicts: List[Dict[str, str]] = []
-    for r in out_rows:
-        d: Dict[str, str] = {}
-        for i, h in enumerate(mapped_header):
-            d[h.lower()] = r[i] if i < len(r) else ''
-        rows_dicts.append(d)
-
-    # Group by order_id (empty order_id -> unique group per-row)
-    groups: Dict[str, List[int]] = {}
-    for idx, d in enumerate(rows_dicts):
-        oid = (d.get('order_id') or '').strip()
-        if oid:
-            groups.setdefault(oid, []).append(idx)
-        else:
-            # make unique key for empty-order rows
-            groups.setdefault(f'__row_{idx}', []).append(idx)
-
-    def parse_decimal(s: str) -> Decimal | None:
-        if not s:
-            return None
-        try:
-            # remove currency symbols and commas
-            s2 = re.sub(r'[¥￥,\s]', '', s)
-            return Decimal(s2)
-        except (InvalidOperation, TypeError):
-            return None
-
-    final_rows_dicts: List[Dict[str, str]] = []
-
-    # Process each group
-    for gid, idxs in groups.items():
-        # compute per-row item total where possible
-        per_row_item_totals: List[Decimal] = []
-        paid_val: Decimal | None = None
-        # collect numeric sums
-        for i in idxs:
-            d = rows_dicts[i]
-            unit = parse_decimal(d.get('unit_price') or d.get('单价') or '')
-            qty_raw = (d.get('quantity') or d.get('数量') or '').strip()
-            qty = None
-            try:
-                qty = Decimal(qty_raw) if qty_raw else None
-            except (InvalidOperation, TypeError):
-                qty = None
-
-            item_total = parse_decimal(d.get('item_total') or d.get('单项总价') or '')
-
-            computed = None
-            if unit is not None and qty is not None:
-                computed = (unit * qty).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            elif item_total is not None:
-                computed = item_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
+    def _group(self, group: List[List[str]]) -> Iterator[Tuple[str, ...]]:
+        unit_idx, qty_idx, total_idx, paid_idx = self.unit_idx, self.qty_idx, self.total_idx, self.paid_idx
+        sum_items = 0
+        any_items = False
+        paid_val = None
+        for r in group:
+            computed = item_total_of(r[unit_idx] if unit_idx is not None else '',
+                                     r[qty_idx] if qty_idx is not None else '',
+                                     r[total_idx] if total_idx is not None else '')
             if computed is not None:
-                per_row_item_totals.append(computed)
-
-            if paid_val is None:
-                p = parse_decimal(d.get('paid') or d.get('实付款') or '')
-                if p is not None:
-                    paid_val = p.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        sum_items = sum(per_row_item_totals) if per_row_item_totals else Decimal('0.00')
+                sum_items += computed
+                any_items = True
+            if paid_val is None and paid_idx is not None:
+                paid_val = paid_of(r[paid_idx])
+        if not any_items:
+            sum_items = ZERO
 
         # determine shipping for the order if paid present
-        shipping_calc: Decimal | None = None
+        shipping = None
         if paid_val is not None:
-            if zero_shipping_if_equal and (sum_items == paid_val):
-                shipping_calc = Decimal('0.00')
+            if self.zero_shipping_if_equal and (sum_items == paid_val):
+                shipping = ZERO
             else:
                 # shipping = paid - sum_items (may be negative if data inconsistent)
-                shipping_calc = (paid_val - sum_items).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        # Emit rows: first item keeps order_id/paid/shipping, others have those cleared
-        first = True
-        for i in idxs:
-            d = dict(rows_dicts[i])  # copy
-            if first:
-                # ensure paid and lieferkosten set according to shipping_calc when available
-                if shipping_calc is not None:
-                    d['lieferkosten'] = str(shipping_calc)
-                # ensure paid field normalized
-                if paid_val is not None:
-                    d['paid'] = str(paid_val)
-                first = False
-                final_rows_dicts.append(d)
-            else:
-                # clear order-level fields
-                d['order_id'] = ''
-                d['paid'] = ''
-                d['lieferkosten'] = ''
-                final_rows_dicts.append(d)
-
-    # Build final header in canonical order and rows
-    header_to_index: Dict[str, int] = {mapped_header[i].lower(): i for i in range(len(mapped_header))}
-    final_header = [h for h in CANONICAL_HEADERS]
-    final_rows: List[List[str]] = []
-    for d in final_rows_dicts:
-        newr: List[str] = []
-        for fh in final_header:
-            newr.append(d.get(fh, ''))
-        final_rows.append(newr)
-
-    return final_header, final_rows
-
-    # Reorder the header to canonical order where possible; for missing canonical columns,
-    # leave other columns in their mapped form appended after canonical ones.
-    final_header = []
-    header_to_index: Dict[str, int] = {mapped_header[i].lower(): i for i in range(len(mapped_header))}
-
-    for ch in CANONICAL_HEADERS:
-        if ch in header_to_index:
-            final_header.append(ch)
-        else:
-            # if canonical header absent, still include it to keep consistent column count
-            final_header.append(ch)
-
-    # Build final rows aligned to final_header (pull values from mapped_header positions when available)
-    final_rows: List[List[str]] = []
-    for r in out_rows:
-        newr: List[str] = []
-        for fh in final_header:
-            idx = header_to_index.get(fh)
-            if idx is not None and idx < len(r):
-                newr.append(r[idx])
-            else:
-                newr.append('')
-        final_rows.append(newr)
+                shipping = (paid_val - sum_items).quantize(CENT, rounding=ROUND_HALF_UP)
+
+        # first item keeps order_id/paid/shipping, others have those cleared
+        r = group[0]
+        paid_s = str(paid_val) if paid_val is not None else (r[paid_idx] if paid_idx is not None else '')
+        ship_s = str(shipping) if shipping is not None else (r[self.ship_idx] if self.ship_idx is not None else '')
+        yield self._first(r + ['', paid_s, ship_s])
+        rest = self._rest
+        for r in group[1:]:
+            yield rest(r + [''])
+
+    def rows(self, input_rows: Iterable[List[str]]) -> Iterator[Tuple[str, ...]]:
+        return self.group_rows(self.meaningful_rows(input_rows))
+
+    def parallel_rows(self, input_rows: Iterable[List[str]], jobs: int, text: bool = False,
+                      head: int = 0) -> Iterator['CleanedBlock']:
+        """rows() on `jobs` worker processes: one CleanedBlock per block of input rows, in input order.
+
+        This process only streams the input and cuts it into blocks at order boundaries (see
+        _blocks()); junk-row filtering, grouping, Decimal totals and shipping run in the workers,
+        which with text=True also format their rows as CSV lines. `head` rows of every block
+        are sent back as tuples (for previews).
+        """
+        init = (self.mapped_header, self.collapse_groups, self.zero_shipping_if_equal, text, head)
+        pending: deque = deque()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_block_worker, initargs=init) as pool:
+            for block in self._blocks(input_rows, BLOCK_ROWS):
+                pending.append(pool.submit(_clean_block, block))
+                # at most two blocks per worker in flight, so memory stays bounded
+                if len(pending) >= jobs * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _blocks(self, input_rows: Iterable[List[str]], size: int) -> Iterator[List[List[str]]]:
+        # a block may only end where group_rows() starts a new group anyway: both rows around
+        # the cut are kept by meaningful_rows() and the second has no or another order id, so
+        # an order is never split and rows without an order id stay groups of their own
+        block: List[List[str]] = []
+        for row in input_rows:
+            if len(block) >= size and self._starts_group(block[-1], row):
+                yield block
+                block = []
+            block.append(row)
+        if block:
+            yield block
+
+    def _starts_group(self, prev: List[str], row: List[str]) -> bool:
+        if sum(1 for _ in self.meaningful_rows((prev, row))) < 2:
+            return False
+        i = self.oid_idx
+        if i is None or not self.collapse_groups:
+            return True
+        oid = row[i].strip() if i < len(row) else ''
+        return not oid or oid != (prev[i].strip() if i < len(prev) else '')
+
+    def group_rows(self, rows: Iterable[List[str]]) -> Iterator[Tuple[str, ...]]:
+        """Build output tuples from rows that already passed meaningful_rows()."""
+        if not self.collapse_groups:
+            plain = self._plain
+            for r in rows:
+                yield plain(r + [''])
+            return
+
+        # group consecutive rows sharing an order_id; rows without one form their own group,
+        # so only the current order is ever buffered
+        oid_idx = self.oid_idx
+        group: List[List[str]] = []
+        current = None
+        for r in rows:
+            oid = r[oid_idx].strip() if oid_idx is not None else ''
+            if group and (not oid or oid != current):
+                yield from self._group(group)
+                group = []
+            group.append(r)
+            current = oid
+        if group:
+            yield from self._group(group)
+
 
-    return final_header, final_rows
+class CleanedBlock(NamedTuple):
+    kept: int                        # input rows that passed the junk-row filter
+    count: int                       # output rows
+    rows: List[Tuple[str, ...]]      # output rows (empty when the worker formatted text)
+    text: str                        # output rows as CSV lines (text=True)
+    head: List[Tuple[str, ...]]      # first output rows, for previews
+
+
+# input rows per block handed to a --jobs worker: large enough to amortize the pickling,
+# small enough to keep every worker busy
+BLOCK_ROWS = 5000
+
+_block_worker: Tuple[CleanEngine, bool, int] | None = None
+
+
+def _init_block_worker(mapped_header: List[str], collapse_groups: bool, zero_shipping_if_equal: bool,
+                       text: bool, head: int) -> None:
+    global _block_worker
+    _block_worker = (CleanEngine(mapped_header, collapse_groups, zero_shipping_if_equal), text, head)
+
+
+def _clean_block(rows: List[List[str]]) -> CleanedBlock:
+    engine, text, head = _block_worker
+    kept = engine.meaningful_rows(rows)
+    kept_count = 0
+
+    def counted(it):
+        nonlocal kept_count
+        for r in it:
+            kept_count += 1
+            yield r
+
+    out = list(engine.group_rows(counted(kept)))
+    if not text:
+        return CleanedBlock(kept_count, len(out), out, '', out[:head])
+    buf = io.StringIO()
+    csv.writer(buf).writerows(out)
+    return CleanedBlock(kept_count, len(out), [], buf.getvalue(), out[:head])
+
+
+def write_blocks(path: str, header: List[str], blocks: Iterable[CleanedBlock], fmt: Optional[str] = None,
+                 schema: Optional[Sequence[str]] = None) -> None:
+    """write_csv_rows() for the blocks of CleanEngine.parallel_rows() (CSV blocks arrive pre-formatted)."""
+    if export_format(path, fmt) != 'csv':
+        write_rows(path, header, (r for b in blocks for r in b.rows), fmt, schema)
+        return
+    if schema is not None:
+        validate_header(header, schema)
+    with atomic_open(path) as fh:
+        csv.writer(fh).writerow(header)
+        for b in blocks:
+            fh.write(b.text)
+
+
+def iter_meaningful_rows(mapped_header: List[str], input_rows: Iterable[List[str]]) -> Iterator[List[str]]:
+    """Normalize row length and drop junk rows, one row at a time."""
+    engine = CleanEngine(mapped_header)
+    return engine.meaningful_rows(input_rows)
+
+
+def iter_clean_rows(input_header: List[str], input_rows: Iterable[List[str]], collapse_groups: bool = True,
+                    zero_shipping_if_equal: bool = True) -> Iterator[Tuple[str, ...]]:
+    """Streaming form of clean_rows(): yields final rows aligned to CANONICAL_HEADERS."""
+    return CleanEngine(input_header, collapse_groups, zero_shipping_if_equal).rows(input_rows)
+
+
+def clean_rows(input_header: List[str], input_rows: Iterable[List[str]], collapse_groups: bool = True, zero_shipping_if_equal: bool = True) -> Tuple[List[str], List[Tuple[str, ...]]]:
+    final_rows = list(iter_clean_rows(input_header, input_rows, collapse_groups=collapse_groups,
+                                      zero_shipping_if_equal=zero_shipping_if_equal))
+    return list(CANONICAL_HEADERS), final_rows
 
 
 def parse_args(argv: List[str]) -> argparse.Namespace:
@@ -287,7 +431,20 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
     p.add_argument('--no-collapse', dest='collapse', action='store_false', help='Do not collapse Sammelbestellungen (keep order_id/paid/shipping on every row)')
     p.add_argument('--no-zero-shipping', dest='zero_shipping', action='store_false', help='Do not force shipping to 0 when sum(items)==paid')
     p.add_argument('--preview', type=int, default=0, help='Print a preview of first N cleaned rows to stdout')
-    return p.parse_args(argv)
+    p.add_argument('--format', choices=EXPORT_FORMATS,
+                   help='Output format (default: by output suffix, CSV otherwise); see export_formats.py')
+    p.add_argument('--engine', choices=('rows', 'pandas'), default='rows',
+                   help='rows: streaming row engine (default); pandas: columnar engine, loads the whole file')
+    p.add_argument('--jobs', type=int, default=1,
+                   help='Worker processes for cleaning and grouping (rows engine; 0 = one per CPU)')
+    p.add_argument('--profile', metavar='PATH',
+                   help='Time each stage; write a JSON metrics summary (*.json) or cProfile stats (other paths)')
+    args = p.parse_args(argv)
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.jobs > 1 and args.engine != 'rows':
+        p.error('--jobs needs --engine rows')
+    return args
 
 
 def main(argv: List[str]) -> int:
@@ -301,25 +458,98 @@ def main(argv: List[str]) -> int:
     if not os.path.exists(inp):
         print(f'Input file not found: {inp}', file=sys.stderr)
         return 2
+    try:
+        check_available(inp, out)
+    except IntermediateUnavailable as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.format in ('parquet', 'arrow') and export_format(out) != args.format:
+        print(f'--format {args.format} needs a matching output suffix, got {out}', file=sys.stderr)
+        return 2
 
-    rows = read_csv_rows(inp)
-    if not rows:
-        print('No rows read from input', file=sys.stderr)
-        return 3
-
-    input_header = rows[0]
-    input_data = rows[1:]
-
-    final_header, final_rows = clean_rows(input_header, input_data, collapse_groups=args.collapse, zero_shipping_if_equal=args.zero_shipping)
+    if args.engine == 'pandas':
+        try:
+            from finalize_pandas import FrameCleaner, load_frame
+        except ImportError as e:
+            print(f'--engine pandas needs pandas: {e}', file=sys.stderr)
+            return 2
+
+    metrics = Metrics()
+    with profiling(args.profile, metrics):
+        counts = {'in': 0, 'kept': 0, 'out': 0}
+        if args.engine == 'pandas':
+            with metrics.stage('read'):
+                input_header, frame = load_frame(inp)
+        else:
+            rows = metrics.timed_iter('read', iter_csv_rows(inp))
+            input_header = next(rows, None)
+        if input_header is None:
+            print('No rows read from input', file=sys.stderr)
+            return 3
+
+        def counted(it, key):
+            for r in it:
+                counts[key] += 1
+                yield r
+
+        preview: List[List[str]] = []
+
+        def keep_preview(it):
+            for r in it:
+                if len(preview) < args.preview:
+                    preview.append(r)
+                yield r
+
+        final_header = list(CANONICAL_HEADERS)
+        if args.engine == 'pandas':
+            cleaner = FrameCleaner(input_header, collapse_groups=args.collapse,
+                                   zero_shipping_if_equal=args.zero_shipping)
+            with metrics.stage('clean'):
+                kept = cleaner.meaningful(frame)
+            with metrics.stage('group'):
+                final_rows = cleaner.clean(kept).tolist()
+            counts['in'], counts['kept'] = len(frame), len(kept)
+            final_rows = iter(final_rows)
+        elif args.jobs > 1:
+            # this process only reads and writes; the workers clean, group and format whole blocks
+            engine = CleanEngine(input_header, collapse_groups=args.collapse,
+                                 zero_shipping_if_equal=args.zero_shipping)
+            blocks = engine.parallel_rows(counted(rows, 'in'), args.jobs, text=export_format(out, args.format) == 'csv',
+                                          head=args.preview)
+            blocks = metrics.timed_iter('clean', blocks)
+        else:
+            # stream read -> clean -> group -> write; only counters and the preview are kept in memory
+            engine = CleanEngine(input_header, collapse_groups=args.collapse,
+                                 zero_shipping_if_equal=args.zero_shipping)
+            kept = metrics.timed_iter('clean', engine.meaningful_rows(counted(rows, 'in')))
+            final_rows = metrics.timed_iter('group', engine.group_rows(counted(kept, 'kept')))
+        if args.jobs > 1:
+            def tally(it):
+                for b in it:
+                    counts['kept'] += b.kept
+                    counts['out'] += b.count
+                    preview.extend(b.head[:args.preview - len(preview)])
+                    yield b
+
+            with metrics.stage('write'):
+                write_blocks(out, final_header, tally(blocks), args.format, CANONICAL_HEADERS)
+        else:
+            with metrics.stage('write'):
+                write_csv_rows(out, final_header, keep_preview(counted(final_rows, 'out')), args.format,
+                               CANONICAL_HEADERS)
 
-    write_csv_rows(out, final_header, final_rows)
+        metrics.incr('rows_read', counts['in'])
+        metrics.incr('rows_dropped', counts['in'] - counts['kept'])
+        metrics.incr('rows_written', counts['out'])
+        metrics.incr('bytes_read', os.path.getsize(inp))
+        metrics.incr('bytes_written', os.path.getsize(out))
+        print(f'Wrote {counts["out"]} rows to {out} (from {counts["in"]} input rows)')
 
-    print(f'Wrote {len(final_rows)} rows to {out} (from {len(input_data)} input rows)')
     if args.preview and args.preview > 0:
         print('\nPreview:')
         # print header then first N rows
         print(','.join(final_header))
-        for r in final_rows[:args.preview]:
+        for r in preview:
             print(','.join(r))
     return 0
 
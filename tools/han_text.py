@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+han_text.py
+
+Chinese-text detection and Han/non-Han segmentation for the translator.
+
+``has_chinese()`` recognizes every CJK ideograph block (Unified, Extensions A-H,
+Compatibility Ideographs, radicals), not just U+4E00-U+9FFF. CJK / full-width punctuation
+alone ('￥4.58', 'Size：XL') is not Chinese text; it is only translated as part of a Han run.
+
+``split_cell()`` scans a cell once and splits it into runs: Han runs (ideographs, with the
+CJK punctuation and spaces between and around them) and everything else (Latin text, SKU
+codes, numbers, ASCII punctuation). Only the Han runs need the translator; the rest is kept
+as it is and the cell is put back together by ``join_cell()``:
+
+  '马苏里拉碎芝士Pizza Cheese 披萨奶酪 500g'
+  -> ['马苏里拉碎芝士', 'Pizza Cheese ', '披萨奶酪', ' 500g']   (Han runs at 0 and 2)
+  -> 'Shredded mozzarella Pizza Cheese Pizza cheese 500g'
+
+A space is inserted where a translated run would otherwise be glued to a letter or digit.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# CJK ideographs: radicals, Extension A, Unified, Compatibility, Extensions B-F, G-H, compat. supplement
+IDEOGRAPHS = (
+    '\u2e80-\u2fdf'
+    '\u3005\u3007\u3021-\u3029\u3038-\u303b'
+    '\u3400-\u4dbf'
+    '\u4e00-\u9fff'
+    '\uf900-\ufaff'
+    '\U00020000-\U0002ebef'
+    '\U00030000-\U000323af'
+    '\U0002f800-\U0002fa1f'
+)
+# CJK symbols and punctuation, vertical/compatibility forms, full-width punctuation and signs
+CJK_PUNCTUATION = (
+    '\u3000-\u3004\u3008-\u3020\u3030-\u3037\u303c-\u303f'
+    '\ufe10-\ufe1f\ufe30-\ufe4f'
+    '\uff01-\uff0f\uff1a-\uff20\uff3b-\uff40\uff5b-\uff65\uffe0-\uffee'
+)
+
+CHINESE_RE = re.compile(f'[{IDEOGRAPHS}]')
+# a Han run starts and ends at an ideograph, optionally wrapped in CJK punctuation, and may contain
+# CJK punctuation and spaces (not tabs/newlines) in between
+HAN_RUN_RE = re.compile(
+    f'[{CJK_PUNCTUATION}]*[{IDEOGRAPHS}](?:[{IDEOGRAPHS}{CJK_PUNCTUATION} ]*[{IDEOGRAPHS}])?[{CJK_PUNCTUATION}]*'
+)
+# Latin letters (with accents) and digits; a Han run never matches
+WORD_CHAR_RE = re.compile('[0-9A-Za-z\u00c0-\u024f]')
+
+
+def has_chinese(s: str) -> bool:
+    return bool(s and CHINESE_RE.search(s))
+
+
+@lru_cache(maxsize=65536)
+def split_cell(cell: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    """Return (parts, indices of the Han runs in parts); ''.join(parts) == cell."""
+    parts: List[str] = []
+    han: List[int] = []
+    pos = 0
+    for m in HAN_RUN_RE.finditer(cell):
+        if m.start() > pos:
+            parts.append(cell[pos:m.start()])
+        han.append(len(parts))
+        parts.append(m.group(0))
+        pos = m.end()
+    if pos < len(cell):
+        parts.append(cell[pos:])
+    return tuple(parts), tuple(han)
+
+
+def han_segments(cell: str) -> List[str]:
+    parts, han = split_cell(cell)
+    return [parts[i] for i in han]
+
+
+def _glued(left: str, right: str) -> bool:
+    return bool(left and right and WORD_CHAR_RE.match(left[-1]) and WORD_CHAR_RE.match(right[0]))
+
+
+def join_cell(cell: str, translations: Dict[str, str]) -> str:
+    """Reassemble `cell` with every Han run replaced by its translation (untranslated runs stay)."""
+    parts, han = split_cell(cell)
+    if not han:
+        return cell
+    pieces = list(parts)
+    for i in han:
+        pieces[i] = translations.get(parts[i], parts[i])
+    out = pieces[0]
+    for i in range(1, len(pieces)):
+        piece = pieces[i]
+        # a translated run next to Latin text or digits needs a separating space
+        if (i in han or i - 1 in han) and _glued(out, piece):
+            out += ' '
+        out += piece
+    return out
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+incremental_update.py
+
+Translate and finalize only the orders of an export that are new or changed since the
+last run, and regenerate the final CSV from a local order store (order_store.py).
+
+Every export contains the full order history. The export is grouped into orders by
+order_id, each order's raw rows are hashed, and the hashes are compared with the store:
+
+  * unchanged orders are taken from the store as they are (no translation, no cleaning);
+  * new and changed orders have their Chinese cells translated (items whose raw row did
+    not change keep their stored translation) and go through CleanEngine, so the shipping
+    computation runs only for them;
+  * the final CSV is written from the store, in the order of the current export, followed
+    by orders that are no longer in the export (``--prune`` drops those instead).
+
+Cells the translator gave back unchanged (failed calls) are stored as they are, but their
+order is marked so the next run tries it again. Changing --src/--dest/--backend or the input
+columns rebuilds the store; changing --no-collapse/--no-zero-shipping only re-finalizes the
+stored translations.
+
+Usage:
+  python tools/incremental_update.py -i export.csv --store orders.sqlite -o final_output/orders_final.csv
+  python tools/incremental_update.py -i export.csv --store orders.sqlite -o final.csv --cache translations.sqlite
+  python tools/incremental_update.py -i export.csv --store orders.sqlite -o final.csv --backend fake --prune
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+from export_formats import write_canonical
+from finalize_translated_csv import CleanEngine, iter_csv_rows
+from han_text import han_segments, has_chinese, join_cell
+from intermediate import IntermediateUnavailable, check_available
+from metrics import Metrics, profiling
+from order_store import OrderStore, order_hash, row_hash
+from translate_all_progress import add_translator_args, translate_plan
+from translation_cache import TranslationCache
+from translator_backends import BackendUnavailable, get_backend
+
+
+def collect_orders(rows, width: int, oid_idx) -> Dict[str, List[List[str]]]:
+    """Group export rows by stripped order_id (first appearance order); rows without one stand alone."""
+    orders: Dict[str, List[List[str]]] = {}
+    for row in rows:
+        if not any(row):
+            continue
+        n = len(row)
+        if n < width:
+            row = row + [''] * (width - n)
+        elif n > width:
+            row = row[:width]
+        oid = row[oid_idx].strip() if oid_idx is not None else ''
+        if oid:
+            orders.setdefault(oid, []).append(row)
+            continue
+        key = f'row:{row_hash(row)}'
+        k = 1
+        while key in orders:
+            k += 1
+            key = f'row:{row_hash(row)}:{k}'
+        orders[key] = [row]
+    return orders
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Translate and finalize only new or changed orders of an export')
+    p.add_argument('-i', '--input', required=True, help='Export CSV (full order history, untranslated)')
+    p.add_argument('-o', '--output', required=True, help='Final CSV, regenerated from the store')
+    p.add_argument('--store', required=True, help='SQLite order store (created on first use)')
+    p.add_argument('--prune', action='store_true', help='Drop stored orders that are not in this export')
+    p.add_argument('--no-collapse', dest='collapse', action='store_false',
+                   help='Keep order_id/paid/shipping on every row')
+    p.add_argument('--no-zero-shipping', dest='zero_shipping', action='store_false',
+                   help='Do not force shipping to 0 when sum(items)==paid')
+    add_translator_args(p)
+    return p.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f'Input file not found: {args.input}', file=sys.stderr)
+        return 2
+    try:
+        check_available(args.input, args.output)
+        backend = get_backend(args.backend, glossary=args.glossary, fake_latency=args.fake_latency,
+                              fake_fail_rate=args.fake_fail_rate)
+    except (IntermediateUnavailable, BackendUnavailable, OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    metrics = Metrics()
+    with profiling(args.profile, metrics):
+        return run(args, backend, metrics)
+
+
+def run(args, backend, metrics) -> int:
+    rows = metrics.timed_iter('read', iter_csv_rows(args.input))
+    header = next(rows, None)
+    if header is None:
+        print('No rows read from input', file=sys.stderr)
+        return 3
+    engine = CleanEngine(header, collapse_groups=args.collapse, zero_shipping_if_equal=args.zero_shipping)
+    orders = collect_orders(rows, engine.width, engine.oid_idx)
+
+    with OrderStore(args.store) as store:
+        reset, stale = store.configure(header, translation=f'{backend.name}:{args.src}:{args.dest}'
+                                       + (':segment' if args.segment else ''),
+                                       cleaning=f'collapse={args.collapse},zero_shipping={args.zero_shipping}')
+        if reset:
+            print(f'Input columns or translation settings changed; rebuilding {args.store}')
+
+        # diff: which orders are new or changed, and which of their items still need translating
+        with metrics.stage('diff'):
+            known = store.hashes()
+            work = {}
+            texts: Dict[str, int] = {}
+            for key, order_rows in orders.items():
+                item_hashes = [row_hash(r) for r in order_rows]
+                digest = order_hash(item_hashes)
+                if known.get(key) == digest:
+                    continue
+                stored = store.items(key) if key in known else {}
+                work[key] = (digest, item_hashes, stored)
+                for h, r in zip(item_hashes, order_rows):
+                    if h not in stored:
+                        for cell in r:
+                            if not has_chinese(cell):
+                                continue
+                            for text in (han_segments(cell) if args.segment else (cell,)):
+                                texts[text] = texts.get(text, 0) + 1
+        new = sum(1 for key in work if key not in known)
+        print(f'{len(orders)} orders in export: {new} new, {len(work) - new} changed, '
+              f'{len(orders) - len(work)} unchanged')
+
+        translations: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+        if texts:
+            cache = TranslationCache(args.cache, max_entries=args.cache_size) if args.cache else None
+            try:
+                translations, _, failed = translate_plan(texts, backend, args, metrics, cache)
+            finally:
+                if cache is not None:
+                    print(cache.stats())
+                    cache.close()
+        if args.segment:
+            def translate_cell(cell):
+                return join_cell(cell, translations) if has_chinese(cell) else cell
+
+            def cell_failed(cell):
+                return has_chinese(cell) and any(seg in failed for seg in han_segments(cell))
+        else:
+            def translate_cell(cell):
+                return translations.get(cell, cell)
+
+            def cell_failed(cell):
+                return cell in failed
+
+        retry = 0
+        with metrics.stage('clean'):
+            for key, order_rows in orders.items():
+                if key not in work:
+                    store.touch(key)
+                    continue
+                digest, item_hashes, stored = work[key]
+                items = []
+                for h, r in zip(item_hashes, order_rows):
+                    translated = stored.get(h)
+                    if translated is None:
+                        translated = [translate_cell(cell) for cell in r]
+                        if failed and any(cell_failed(cell) for cell in r):
+                            # keep the order out of the "unchanged" set, and the item out of the
+                            # reusable translations (no raw hash), so the next run retries it
+                            digest = ''
+                            h = ''
+                    items.append((h, translated))
+                retry += digest == ''
+                final_rows = list(engine.rows([t for _, t in items]))
+                store.put_order(key, digest, items, final_rows)
+
+            if stale:
+                # cleaning options changed: rebuild the finalized rows of the untouched orders
+                for key in store.keys():
+                    if key not in work:
+                        store.set_final(key, list(engine.rows(store.translated_rows(key))))
+        pruned = store.prune() if args.prune else 0
+        store.finish()
+
+        with metrics.stage('write'):
+            counts = {'out': 0}
+
+            def counted(it):
+                for r in it:
+                    counts['out'] += 1
+                    yield r
+
+            write_canonical(args.output, counted(store.iter_final_rows()))
+        stored_orders = len(store)
+
+    metrics.incr('orders_new', new)
+    metrics.incr('orders_changed', len(work) - new)
+    metrics.incr('orders_unchanged', len(orders) - len(work))
+    metrics.incr('orders_pruned', pruned)
+    metrics.incr('strings_translated', len(texts))
+    metrics.incr('rows_written', counts['out'])
+    if retry:
+        print(f'{retry} orders kept untranslated cells and will be retried next run')
+    if pruned:
+        print(f'Pruned {pruned} orders that are no longer in the export')
+    print(f'Wrote {counts["out"]} rows ({stored_orders} orders) to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
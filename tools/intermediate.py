@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+intermediate.py
+
+Compact binary intermediate format between pipeline stages.
+
+Any path ending in ``.parquet`` (Parquet) or ``.arrow`` / ``.feather`` (Arrow IPC file) is
+read and written as a columnar table instead of CSV; the readers and writers in
+finalize_translated_csv.py (``iter_csv_rows`` / ``write_csv_rows``) and the translator's
+atomic output writer dispatch on the suffix, so e.g.
+
+  python tools/translate_all_progress.py -i export.csv -o translated.parquet
+  python tools/finalize_translated_csv.py -i translated.parquet -o final.csv
+
+only tokenizes CSV at the ends. pyarrow is imported lazily, only when such a path is used.
+
+The tables stay lossless with respect to the CSV text every stage works on:
+
+  * price columns (unit_price, item_total, paid, lieferkosten and their Chinese names) are
+    stored as decimal128(18, 2) and quantity columns as int64 -- but only cells already in
+    canonical form ('88.00', '3') go into the typed column; anything else ('¥1,234.5', '1.5')
+    is kept verbatim in a companion ``<column>.raw`` string column, which is null (and
+    therefore nearly free) for canonical data;
+  * seller / status / date columns are dictionary-encoded strings;
+  * empty cells are nulls.
+
+Columns are stored positionally (c0, c1, ...); the real header, which may contain
+duplicate names, lives in the schema metadata.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+METADATA_KEY = b'taobao_extractor'
+BATCH_ROWS = 65536
+
+# typed columns, by (lower-cased) header name
+DECIMAL_COLUMNS = {'unit_price', 'item_total', 'paid', 'lieferkosten', '单价', '单项总价', '实付款', '运费'}
+INTEGER_COLUMNS = {'quantity', '数量'}
+DICTIONARY_COLUMNS = {'seller', 'status', 'order_date', '卖家', '状态', '下单日期'}
+
+# cells that round-trip exactly through the typed columns
+MONEY_RE = re.compile(r'-?(?:0|[1-9][0-9]{0,15})\.[0-9]{2}')
+INT_RE = re.compile(r'-?(?:0|[1-9][0-9]{0,17})')
+
+
+class IntermediateUnavailable(RuntimeError):
+    """pyarrow is needed for .parquet / .arrow paths but is not installed."""
+
+
+def is_table_path(path) -> bool:
+    return Path(path).suffix.lower() in PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise IntermediateUnavailable(f'pyarrow is required for Parquet/Arrow files: {e}')
+    return pa
+
+
+def check_available(*paths) -> None:
+    """Raise IntermediateUnavailable up front if any of `paths` needs pyarrow and it is missing."""
+    if any(p and is_table_path(p) for p in paths):
+        _pyarrow()
+
+
+def column_kinds(header: Sequence[str]) -> List[str]:
+    kinds = []
+    for h in header:
+        key = h.strip().lower()
+        if key in DECIMAL_COLUMNS:
+            kinds.append('decimal')
+        elif key in INTEGER_COLUMNS:
+            kinds.append('int')
+        elif key in DICTIONARY_COLUMNS:
+            kinds.append('dict')
+        else:
+            kinds.append('string')
+    return kinds
+
+
+def _schema(pa, header: Sequence[str], kinds: Sequence[str]):
+    fields = []
+    for i, kind in enumerate(kinds):
+        if kind == 'decimal':
+            fields += [pa.field(f'c{i}', pa.decimal128(18, 2)), pa.field(f'c{i}.raw', pa.string())]
+        elif kind == 'int':
+            fields += [pa.field(f'c{i}', pa.int64()), pa.field(f'c{i}.raw', pa.string())]
+        elif kind == 'dict':
+            fields.append(pa.field(f'c{i}', pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(f'c{i}', pa.string()))
+    meta = {'header': list(header), 'kinds': list(kinds)}
+    return pa.schema(fields, metadata={METADATA_KEY: json.dumps(meta, ensure_ascii=False).encode('utf-8')})
+
+
+def _typed(values: List[str], pattern: re.Pattern, convert) -> Tuple[list, list]:
+    typed = []
+    raw = []
+    match = pattern.fullmatch
+    for v in values:
+        if not v:
+            typed.append(None)
+            raw.append(None)
+        elif match(v) and v not in ('-0', '-0.00'):
+            typed.append(convert(v))
+            raw.append(None)
+        else:
+            typed.append(None)
+            raw.append(v)
+    return typed, raw
+
+
+class _Dictionary:
+    """Running dictionary of one column, so every batch's dictionary extends the previous one."""
+
+    def __init__(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, pa, values: List[str]):
+        index = self.index
+        codes = []
+        for v in values:
+            if not v:
+                codes.append(None)
+                continue
+            code = index.get(v)
+            if code is None:
+                code = index[v] = len(self.values)
+                self.values.append(v)
+            codes.append(code)
+        return pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32()), pa.array(self.values, pa.string()))
+
+
+def _batch(pa, schema, kinds: Sequence[str], dictionaries: Dict[int, _Dictionary], rows: List[Sequence[str]]):
+    width = len(kinds)
+    columns = [[] for _ in range(width)]
+    for r in rows:
+        n = len(r)
+        for i in range(width):
+            columns[i].append(r[i] if i < n else '')
+    arrays = []
+    for i, (values, kind) in enumerate(zip(columns, kinds)):
+        if kind == 'decimal':
+            typed, raw = _typed(values, MONEY_RE, Decimal)
+            arrays += [pa.array(typed, pa.decimal128(18, 2)), pa.array(raw, pa.string())]
+        elif kind == 'int':
+            typed, raw = _typed(values, INT_RE, int)
+            arrays += [pa.array(typed, pa.int64()), pa.array(raw, pa.string())]
+        elif kind == 'dict':
+            arrays.append(dictionaries[i].encode(pa, values))
+        else:
+            arrays.append(pa.array([v or None for v in values], pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _chunks(rows: Iterable[Sequence[str]], size: int) -> Iterator[List[Sequence[str]]]:
+    chunk = []
+    for r in rows:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_table(path, header: Sequence[str], rows: Iterable[Sequence[str]], batch_rows: int = BATCH_ROWS) -> int:
+    """Stream rows into a Parquet / Arrow IPC file (temp file + atomic rename); returns the row count."""
+    from export_formats import replace_file  # export_formats imports this module
+    pa = _pyarrow()
+    path = Path(path)
+    kinds = column_kinds(header)
+    schema = _schema(pa, header, kinds)
+    dictionaries = {i: _Dictionary() for i, kind in enumerate(kinds) if kind == 'dict'}
+    parquet = path.suffix.lower() in PARQUET_SUFFIXES
+    fd, tmp = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=str(path.parent or Path('.')))
+    os.close(fd)
+    count = 0
+    try:
+        if parquet:
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(tmp, schema, compression='zstd')
+        else:
+            # the IPC file format cannot replace dictionaries between batches, only extend them
+            options = pa.ipc.IpcWriteOptions(compression='zstd', emit_dictionary_deltas=True)
+            writer = pa.ipc.new_file(tmp, schema, options=options)
+        try:
+            for chunk in _chunks(rows, batch_rows):
+                batch = _batch(pa, schema, kinds, dictionaries, chunk)
+                if parquet:
+                    writer.write_batch(batch)
+                else:
+                    writer.write(batch)
+                count += len(chunk)
+        finally:
+            writer.close()
+        replace_file(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return count
+
+
+def _open_batches(path):
+    pa = _pyarrow()
+    path = Path(path)
+    if path.suffix.lower() in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(str(path))
+        return pf.schema_arrow, pf.iter_batches(batch_size=BATCH_ROWS)
+    reader = pa.ipc.open_file(pa.memory_map(str(path), 'r'))
+    return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+
+def _layout(schema) -> Tuple[List[str], List[str], List[Tuple[int, Optional[int]]]]:
+    """Return (header, kinds, [(value column, raw column or None)]) for a table schema."""
+    meta = (schema.metadata or {}).get(METADATA_KEY)
+    if meta is None:
+        # a table written by another tool: plain columns, names from the schema
+        return list(schema.names), ['string'] * len(schema.names), [(i, None) for i in range(len(schema.names))]
+    meta = json.loads(meta.decode('utf-8'))
+    names = schema.names
+    positions = []
+    for i, kind in enumerate(meta['kinds']):
+        raw = names.index(f'c{i}.raw') if kind in ('decimal', 'int') else None
+        positions.append((names.index(f'c{i}'), raw))
+    return meta['header'], meta['kinds'], positions
+
+
+def _text_columns(batch, positions: Sequence[Tuple[int, Optional[int]]]) -> List[list]:
+    """The batch's cells as lists of str, exactly as they were written."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    out = []
+    for value, raw in positions:
+        col = batch.column(value)
+        if pa.types.is_dictionary(col.type):
+            col = col.dictionary_decode()
+        if not pa.types.is_string(col.type):
+            col = pc.cast(col, pa.string())
+        if raw is not None:
+            # non-canonical cells were kept verbatim beside the typed value
+            col = pc.coalesce(batch.column(raw), col)
+        out.append(pc.fill_null(col, '').to_pylist())
+    return out
+
+
+def iter_table_rows(path) -> Iterator[List[str]]:
+    """Header first, then data rows as lists of str -- the same shape iter_csv_rows() yields."""
+    schema, batches = _open_batches(path)
+    header, _, positions = _layout(schema)
+    yield list(header)
+    for batch in batches:
+        for row in zip(*_text_columns(batch, positions)):
+            yield list(row)
+
+
+def read_table_columns(path) -> Tuple[List[str], List[List[str]]]:
+    """Return (header, columns) with every column as one list of str (for columnar consumers)."""
+    schema, batches = _open_batches(path)
+    header, _, positions = _layout(schema)
+    columns: List[List[str]] = [[] for _ in header]
+    for batch in batches:
+        for col, values in zip(columns, _text_columns(batch, positions)):
+            col.extend(values)
+    return list(header), columns
+
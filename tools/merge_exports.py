@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+merge_exports.py
+
+Merge any number of userscript exports and saved order pages (several accounts, a year of
+weekly snapshots, ...) into one set of unique orders, backed by a persistent SQLite dedup
+index, so that translation and finalize only ever see every order once.
+
+Identity:
+  order   the stripped order_id; item rows without an order id inherit the one of the rows
+          above them (like batch_process.py), rows without any are keyed by their content
+  item    order key + item_id, else item_url, else title + specification (a repeated key
+          within one order gets a running "#n" suffix)
+
+Every input is loaded as CANONICAL_HEADERS rows and stamped with its snapshot time: the
+export timestamp in the file name (``..._2025-10-20-21-13-52.csv``), else the file's mtime.
+Inputs are ingested oldest snapshot first and per order the newest snapshot wins: an order
+whose rows are unchanged is only counted as duplicate, a changed one replaces the stored
+version, and an older snapshot never overwrites a newer one -- whatever order the files
+arrive in. Files that are already in the index (same path, size and mtime) are skipped, so
+a weekly run only pays for the new snapshot.
+
+The index lives in one SQLite file (--index). The merged orders are written in first-seen
+order as an untranslated canonical CSV (or Parquet/Arrow), ready for translate_and_clean.py
+or incremental_update.py; --new-only writes just the orders that are new or changed in
+this run.
+
+Usage:
+  python tools/merge_exports.py input_csv/ --index merged.sqlite -o final_output/merged_orders.csv
+  python tools/merge_exports.py "snapshots/*.csv" data/ --index merged.sqlite -o new.csv --new-only
+  python tools/translate_and_clean.py -i final_output/merged_orders.csv -o final_output/orders_final.csv
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from batch_process import expand_inputs, load_file
+from export_formats import CANONICAL_HEADERS, write_canonical
+from intermediate import IntermediateUnavailable, check_available
+from metrics import Metrics, profiling
+from order_store import row_hash
+from translation_engine import run_ordered
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS files ('
+    ' path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, snapshot TEXT NOT NULL,'
+    ' run INTEGER NOT NULL, rows INTEGER NOT NULL, orders INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS orders ('
+    ' order_key TEXT PRIMARY KEY, snapshot TEXT NOT NULL, digest TEXT NOT NULL, position INTEGER NOT NULL,'
+    ' changed_run INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS items ('
+    ' order_key TEXT NOT NULL, item_no INTEGER NOT NULL, item_key TEXT NOT NULL, row TEXT NOT NULL,'
+    ' PRIMARY KEY (order_key, item_no), UNIQUE (order_key, item_key))',
+    'CREATE INDEX IF NOT EXISTS orders_position ON orders(position)',
+)
+
+# ..._2025-10-20-21-13-52.csv / 2025-10-20T21_13_52; separators are required so that digit runs
+# such as order ids in a file name are never taken for a timestamp
+SNAPSHOT_RE = re.compile(r'(?<!\d)(\d{4})-(\d{2})-(\d{2})[-_T ](\d{2})[-_:](\d{2})[-_:](\d{2})(?!\d)')
+
+OID = CANONICAL_HEADERS.index('order_id')
+TITLE = CANONICAL_HEADERS.index('title')
+SPEC = CANONICAL_HEADERS.index('specification')
+ITEM_URL = CANONICAL_HEADERS.index('item_url')
+ITEM_ID = CANONICAL_HEADERS.index('item_id')
+
+
+class FileStats(NamedTuple):
+    path: str
+    snapshot: str
+    rows: int
+    orders: int
+    new: int
+    changed: int
+    duplicate: int
+    stale: int
+    seconds: float
+
+
+def snapshot_time(path: Path) -> str:
+    """Export time of a file: the timestamp in its name, else its mtime ('YYYY-MM-DD HH:MM:SS')."""
+    m = SNAPSHOT_RE.search(path.name)
+    if m:
+        stamp = '{}-{}-{} {}:{}:{}'.format(*m.groups())
+        try:
+            datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S')
+            return stamp
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def group_orders(rows: Sequence[List[str]]) -> Dict[str, List[List[str]]]:
+    """Order key -> rows, in first-seen order (see the module docstring for the keys)."""
+    orders: Dict[str, List[List[str]]] = {}
+    current = None
+    for r in rows:
+        oid = r[OID].strip()
+        if oid:
+            current = oid
+        elif current is None:
+            orders.setdefault(f'row:{row_hash(r)}', []).append(r)
+            continue
+        orders.setdefault(current, []).append(r)
+    return orders
+
+
+def order_digest(rows: Sequence[List[str]]) -> str:
+    # unit/record separators cannot occur in export cells; one hash per order keeps the
+    # duplicate check (most of the rows of a snapshot) cheap
+    text = '\x1e'.join('\x1f'.join(r) for r in rows)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def item_keys(rows: Sequence[List[str]]) -> List[str]:
+    keys = []
+    seen: Dict[str, int] = {}
+    for r in rows:
+        base = r[ITEM_ID].strip() or r[ITEM_URL].strip() or f'title:{r[TITLE].strip()}\x1f{r[SPEC].strip()}'
+        n = seen[base] = seen.get(base, 0) + 1
+        keys.append(base if n == 1 else f'{base}#{n}')
+    return keys
+
+
+class DedupIndex:
+    """Persistent order/item index: the newest version of every order seen in any export."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        for stmt in SCHEMA:
+            self._conn.execute(stmt)
+        row = self._conn.execute("SELECT value FROM meta WHERE key='run'").fetchone()
+        self.run = int(row[0]) + 1 if row else 1
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run', ?)", (str(self.run),))
+        self._position = self._conn.execute('SELECT COALESCE(MAX(position), 0) FROM orders').fetchone()[0]
+        # order key -> (snapshot, digest); the whole comparison happens in memory
+        self._known: Dict[str, Tuple[str, str]] = {
+            key: (snap, digest) for key, snap, digest in self._conn.execute('SELECT order_key, snapshot, digest FROM orders')}
+
+    def __enter__(self) -> 'DedupIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    def is_ingested(self, path: Path) -> bool:
+        st = path.stat()
+        row = self._conn.execute('SELECT size, mtime FROM files WHERE path=?', (str(path),)).fetchone()
+        return row is not None and row[0] == st.st_size and row[1] == st.st_mtime
+
+    def ingest(self, path: Path, snapshot: str, rows: Sequence[List[str]]) -> Tuple[int, int, int, int, int]:
+        """Merge one file's canonical rows; returns (orders, new, changed, duplicate, stale)."""
+        orders = group_orders(rows)
+        new = changed = duplicate = stale = 0
+        bump: List[Tuple[str, str]] = []
+        replace: List[Tuple[str, List[List[str]], str, Optional[int]]] = []
+        known = self._known
+        for key, group in orders.items():
+            digest = order_digest(group)
+            prev = known.get(key)
+            if prev is None:
+                self._position += 1
+                replace.append((key, group, digest, self._position))
+                new += 1
+            elif prev[1] == digest:
+                duplicate += 1
+                if snapshot > prev[0]:
+                    bump.append((snapshot, key))
+            elif snapshot >= prev[0]:
+                replace.append((key, group, digest, None))
+                changed += 1
+            else:
+                # an older version of an order we already hold in a newer one
+                stale += 1
+                continue
+            known[key] = (max(snapshot, prev[0]) if prev else snapshot, digest)
+
+        updated = [(snapshot, digest, self.run, key) for key, _, digest, position in replace if position is None]
+        inserted = [(key, snapshot, digest, position, self.run) for key, _, digest, position in replace
+                    if position is not None]
+        items = [(key, n, ik, json.dumps(r, ensure_ascii=False))
+                 for key, group, _, _ in replace for n, (ik, r) in enumerate(zip(item_keys(group), group))]
+        conn = self._conn
+        with conn:
+            conn.executemany('UPDATE orders SET snapshot=? WHERE order_key=?', bump)
+            conn.executemany('UPDATE orders SET snapshot=?, digest=?, changed_run=? WHERE order_key=?', updated)
+            conn.executemany('DELETE FROM items WHERE order_key=?', [(u[-1],) for u in updated])
+            conn.executemany('INSERT INTO orders (order_key, snapshot, digest, position, changed_run) '
+                             'VALUES (?, ?, ?, ?, ?)', inserted)
+            conn.executemany('INSERT INTO items (order_key, item_no, item_key, row) VALUES (?, ?, ?, ?)', items)
+            st = path.stat()
+            conn.execute('INSERT OR REPLACE INTO files (path, size, mtime, snapshot, run, rows, orders) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (str(path), st.st_size, st.st_mtime, snapshot, self.run, len(rows), len(orders)))
+        return len(orders), new, changed, duplicate, stale
+
+    def iter_rows(self, new_only: bool = False) -> Iterator[List[str]]:
+        """Canonical rows of the stored orders in first-seen order (only this run's changes with new_only)."""
+        sql = ('SELECT i.row FROM orders o JOIN items i ON i.order_key = o.order_key '
+               + ('WHERE o.changed_run = ? ' if new_only else '') + 'ORDER BY o.position, i.item_no')
+        for (row,) in self._conn.execute(sql, (self.run,) if new_only else ()):
+            yield json.loads(row)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Merge exports and saved pages into unique orders (persistent dedup index)')
+    p.add_argument('inputs', nargs='+', help='Files, directories or glob patterns (.html/.htm/.csv)')
+    p.add_argument('--index', required=True, help='SQLite dedup index (created on first use)')
+    p.add_argument('-o', '--output', help='Write the merged orders (canonical columns, untranslated)')
+    p.add_argument('--new-only', action='store_true', help='Write only the orders new or changed in this run')
+    p.add_argument('--reingest', action='store_true', help='Load files again even if the index already has them')
+    p.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes for loading files')
+    p.add_argument('--profile', metavar='PATH',
+                   help='Time each stage; write a JSON metrics summary (*.json) or cProfile stats (other paths)')
+    return p.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    files = expand_inputs(args.inputs)
+    if not files:
+        print('No input files found', file=sys.stderr)
+        return 2
+    if args.output:
+        try:
+            check_available(args.output)
+        except IntermediateUnavailable as e:
+            print(e, file=sys.stderr)
+            return 2
+
+    metrics = Metrics()
+    with profiling(args.profile, metrics):
+        run(args, files, metrics)
+    return 0
+
+
+def run(args: argparse.Namespace, files: List[Path], metrics: Metrics) -> None:
+    start = perf_counter()
+    with DedupIndex(args.index) as index:
+        todo = [f for f in files if args.reingest or not index.is_ingested(f)]
+        skipped = len(files) - len(todo)
+        # oldest snapshot first, so "newest wins" also holds within one run
+        todo.sort(key=lambda f: (snapshot_time(f), str(f)))
+        stats: List[FileStats] = []
+        loaded = run_ordered([str(f) for f in todo], load_file, workers=min(args.jobs, len(todo)), processes=True)
+        for _, (path, rows, secs) in metrics.timed_iter('load', loaded):
+            snapshot = snapshot_time(Path(path))
+            with metrics.stage('merge'):
+                counts = index.ingest(Path(path), snapshot, rows)
+            stats.append(FileStats(path, snapshot, len(rows), *counts, secs))
+            metrics.observe('file_load_seconds', secs)
+            metrics.incr('bytes_read', os.path.getsize(path))
+
+        if stats:
+            print('Per-file merge results (orders):')
+        for s in stats:
+            print(f'  {s.snapshot}  {s.rows:7d} rows  {s.orders:6d} orders: {s.new} new, {s.changed} changed, '
+                  f'{s.duplicate} duplicate, {s.stale} stale  {s.path}')
+        rows_in = sum(s.rows for s in stats)
+        orders_in = sum(s.orders for s in stats)
+        duplicate = sum(s.duplicate + s.stale for s in stats)
+        for name in ('new', 'changed', 'duplicate', 'stale'):
+            metrics.incr(f'orders_{name}', sum(getattr(s, name) for s in stats))
+        metrics.incr('rows_read', rows_in)
+        if skipped:
+            print(f'{skipped} files already in {args.index}, skipped (--reingest loads them again)')
+        if orders_in:
+            print(f'{orders_in - duplicate} of {orders_in} orders new or changed '
+                  f'({duplicate / orders_in:.1%} duplicates); the index holds {len(index)} orders')
+
+        if args.output:
+            counts = {'out': 0}
+
+            def counted(it):
+                for r in it:
+                    counts['out'] += 1
+                    yield r
+
+            with metrics.stage('write'):
+                write_canonical(args.output, counted(index.iter_rows(args.new_only)))
+            metrics.incr('rows_written', counts['out'])
+            metrics.incr('bytes_written', os.path.getsize(args.output))
+            what = 'new or changed' if args.new_only else 'merged'
+            print(f'Wrote {counts["out"]} {what} rows to {args.output}')
+    print(f'Done in {perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
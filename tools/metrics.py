@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+metrics.py
+
+Lightweight instrumentation shared by the pipeline tools.
+
+``Metrics`` collects three kinds of numbers:
+
+  * stage timers  -- ``with metrics.stage('write'):`` or ``metrics.timed_iter('read', rows)``;
+    stages nest (a streaming pipeline pulls rows from its reader while writing), and each
+    stage is charged only the time spent in itself, not in the stages it pulls from;
+  * counters      -- ``metrics.incr('cache_hits')``;
+  * histograms    -- ``metrics.observe('translator_latency', seconds)``.
+
+Stage timing costs a few clock reads per row, so it is off by default; counters and
+histograms are always kept. ``profiling()`` wraps a run: ``--profile run.json`` switches
+stage timing on and writes the metrics summary as JSON, any other path dumps cProfile
+statistics there instead (and prints the top functions). Either way the collected metrics
+are printed at the end. Build the timed iterators inside the ``profiling()`` block.
+
+``ProgressThrottle`` rate-limits progress lines so console output does not become the
+bottleneck on large inputs.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import pstats
+import sys
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Upper bucket bounds in seconds (the last bucket is open-ended)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_TOP = 25
+
+
+class Histogram:
+    """Bucketed distribution with exact count/sum/min/max; percentiles are bucket upper bounds."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'mean': round(self.total / self.count, 6) if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'buckets': {('le_%g' % b if i < len(self.bounds) else 'inf'): n
+                        for i, (b, n) in enumerate(zip(self.bounds + (None,), self.buckets)) if n},
+        }
+
+
+class Metrics:
+    def __init__(self, timing: bool = False) -> None:
+        self.timing = timing
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._threads: List[tuple] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = perf_counter()
+
+    # counters / histograms -------------------------------------------------
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(value)
+
+    # stage timers ----------------------------------------------------------
+
+    def _state(self):
+        # per-thread stage stack and totals: the hot path takes no lock
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            state = self._local.state = ([], {}, {})
+            with self._lock:
+                self._threads.append(state)
+        return state
+
+    def _enter(self, name: str) -> None:
+        now = perf_counter()
+        stack, seconds, _ = self._state()
+        if stack:
+            # pause the enclosing stage
+            outer = stack[-1]
+            seconds[outer[0]] = seconds.get(outer[0], 0.0) + now - outer[1]
+        stack.append([name, now])
+
+    def _exit(self) -> None:
+        now = perf_counter()
+        stack, seconds, calls = self._state()
+        name, since = stack.pop()
+        seconds[name] = seconds.get(name, 0.0) + now - since
+        calls[name] = calls.get(name, 0) + 1
+        if stack:
+            stack[-1][1] = now
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.timing:
+            yield
+            return
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Charge the time spent producing each item to `name` (pass-through when timing is off)."""
+        if not self.timing:
+            return iter(items)
+        return self._timed_iter(name, iter(items))
+
+    def _timed_iter(self, name: str, it: Iterator[T]) -> Iterator[T]:
+        enter, leave = self._enter, self._exit
+        while True:
+            enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                leave()
+            yield item
+
+    # reporting -------------------------------------------------------------
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        totals: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            threads = list(self._threads)
+        for _, seconds, calls in threads:
+            for name, secs in list(seconds.items()):
+                t = totals.setdefault(name, {'seconds': 0.0, 'calls': 0})
+                t['seconds'] += secs
+                t['calls'] += calls.get(name, 0)
+        return totals
+
+    def summary(self) -> Dict[str, object]:
+        stages = sorted(self.stage_totals().items(), key=lambda kv: -kv[1]['seconds'])
+        with self._lock:
+            return {
+                'wall_seconds': round(perf_counter() - self._start, 6),
+                'stages': {name: {'seconds': round(t['seconds'], 6), 'calls': t['calls']} for name, t in stages},
+                'counters': dict(sorted(self.counters.items())),
+                'histograms': {name: h.summary() for name, h in sorted(self.histograms.items())},
+            }
+
+    def report(self, file=None) -> None:
+        out = file or sys.stdout
+        s = self.summary()
+        wall = s['wall_seconds'] or 0.0
+        print(f'\nMetrics (wall {wall:.3f}s):', file=out)
+        for name, st in s['stages'].items():
+            share = st['seconds'] / wall if wall else 0.0
+            print(f'  stage {name:<12} {st["seconds"]:10.3f}s  {share:6.1%}', file=out)
+        for name, value in s['counters'].items():
+            print(f'  {name:<18} {value}', file=out)
+        for name, h in s['histograms'].items():
+            if h['count']:
+                print(f'  {name:<18} n={h["count"]} mean={h["mean"] * 1000:.1f}ms p50<={_ms(h["p50"])} '
+                      f'p95<={_ms(h["p95"])} max={_ms(h["max"])}', file=out)
+
+    def write_json(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.summary(), fh, indent=2)
+            fh.write('\n')
+
+
+def _ms(v: Optional[float]) -> str:
+    return '-' if v is None else f'{v * 1000:.1f}ms'
+
+
+@contextmanager
+def profiling(path: Optional[str], metrics: Metrics):
+    """Run the body under --profile: JSON metrics for ``*.json`` paths, cProfile stats otherwise."""
+    if not path:
+        yield
+        return
+    profiler = None if path.lower().endswith('.json') else cProfile.Profile()
+    # stage timers would mostly measure themselves under cProfile
+    metrics.timing = profiler is None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(path)
+        metrics.report()
+        if profiler is None:
+            metrics.write_json(path)
+            print(f'Metrics summary written to {path}')
+        else:
+            print(f'\ncProfile statistics written to {path} (top {PROFILE_TOP} by cumulative time):')
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(PROFILE_TOP)
+
+
+class ProgressThrottle:
+    """``ready()`` is true at most once per `interval` seconds (always when forced)."""
+
+    def __init__(self, interval: float = 1.0) -> None:
+        self.interval = interval
+        self._last = float('-inf')
+
+    def ready(self, force: bool = False) -> bool:
+        now = perf_counter()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+order_index.py
+
+Order-level index and queries over a finalized CSV (output of finalize_translated_csv.py,
+incremental_update.py or batch_process.py).
+
+The first query against ``final.csv`` builds ``final.csv.index.sqlite`` next to it: one
+row per order (order_id, date, month, seller, item count, item total, paid, shipping) and
+one row per item, with SQLite indexes on order_id, seller, order_date and the price
+columns. Later queries only open the index; it is rebuilt automatically when the CSV's
+size or modification time changes (or with ``--rebuild``).
+
+Orders are recovered the way the finalize step wrote them: a row with an order_id starts
+a new order (consecutive rows with the same id, as written by --no-collapse, stay one
+order) and rows with an empty order_id belong to the order above them. Amounts are kept
+as integer cents, so sums are exact.
+
+Usage:
+  python tools/order_index.py final_output/orders_final.csv --seller-contains cheese --min-shipping 10
+  python tools/order_index.py final.csv --since 2023-01-01 --until 2023-12-31 --group-by seller,month
+  python tools/order_index.py final.csv --order-id 2950548049244739241 --items
+  python tools/order_index.py final.csv --group-by year -o spend_per_year.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from export_formats import replace_file
+from finalize_translated_csv import CANONICAL_HEADERS, _column, iter_csv_rows, parse_price, write_csv_rows
+
+INDEX_SUFFIX = '.index.sqlite'
+SCHEMA_VERSION = '1'
+
+SCHEMA = (
+    'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE orders ('
+    ' order_no INTEGER PRIMARY KEY, order_id TEXT NOT NULL, order_date TEXT NOT NULL, month TEXT NOT NULL,'
+    ' year TEXT NOT NULL, seller TEXT NOT NULL, item_count INTEGER NOT NULL, items_cents INTEGER,'
+    ' paid_cents INTEGER, shipping_cents INTEGER)',
+    'CREATE TABLE items ('
+    ' row_no INTEGER PRIMARY KEY, order_no INTEGER NOT NULL, title TEXT NOT NULL, specification TEXT NOT NULL,'
+    ' item_url TEXT NOT NULL, item_id TEXT NOT NULL, unit_price TEXT NOT NULL, quantity TEXT NOT NULL,'
+    ' item_total TEXT NOT NULL, unit_cents INTEGER, total_cents INTEGER)',
+    'CREATE INDEX orders_order_id ON orders(order_id)',
+    'CREATE INDEX orders_seller ON orders(seller, order_date)',
+    'CREATE INDEX orders_date ON orders(order_date)',
+    'CREATE INDEX orders_paid ON orders(paid_cents)',
+    'CREATE INDEX orders_shipping ON orders(shipping_cents)',
+    'CREATE INDEX items_order ON items(order_no)',
+    'CREATE INDEX items_unit ON items(unit_cents)',
+)
+
+ORDER_COLUMNS = ('order_id', 'order_date', 'seller', 'item_count', 'items_total', 'paid', 'lieferkosten')
+ITEM_COLUMNS = tuple(CANONICAL_HEADERS)
+GROUP_KEYS = ('seller', 'year', 'month', 'order_date')
+AGGREGATE_COLUMNS = ('orders', 'items', 'items_total', 'paid', 'lieferkosten')
+
+
+def index_path(csv_path: str) -> str:
+    return csv_path + INDEX_SUFFIX
+
+
+def to_cents(raw: str) -> Optional[int]:
+    d = parse_price(raw)
+    if d is None or not d.is_finite():
+        return None
+    return int((d * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def money(cents: Optional[int]) -> str:
+    if cents is None:
+        return ''
+    return str((Decimal(cents) / 100).quantize(Decimal('0.01')))
+
+
+def _fingerprint(csv_path: str) -> str:
+    st = os.stat(csv_path)
+    return f'{SCHEMA_VERSION}:{st.st_size}:{st.st_mtime_ns}'
+
+
+def iter_orders(header: List[str], rows: Iterable[List[str]]) -> Iterable[Tuple[List[str], List[List[str]]]]:
+    """Yield (first row, rows) per order of a finalized file, rows normalized to CANONICAL_HEADERS."""
+    lower = [h.strip().lower() for h in header]
+    src = [_column(lower, h) for h in CANONICAL_HEADERS]
+    oid = CANONICAL_HEADERS.index('order_id')
+    current: List[List[str]] = []
+    for r in rows:
+        if not any(r):
+            continue
+        row = [r[i] if i is not None and i < len(r) else '' for i in src]
+        key = row[oid].strip()
+        if current and (not key or key == current[0][oid].strip()):
+            current.append(row)
+            continue
+        if current:
+            yield current[0], current
+        current = [row]
+    if current:
+        yield current[0], current
+
+
+def build_index(csv_path: str, path: Optional[str] = None) -> str:
+    """(Re)build the index of `csv_path`; written to a temp file and renamed into place."""
+    path = path or index_path(csv_path)
+    # a unique temp file per build, so concurrent builds of the same index cannot clobber each other
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                               dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        _build(csv_path, tmp)
+        replace_file(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def _build(csv_path: str, tmp: str) -> None:
+    fingerprint = _fingerprint(csv_path)
+    conn = sqlite3.connect(tmp)
+    try:
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        rows = iter_csv_rows(csv_path)
+        header = next(rows, None) or []
+        col = {h: CANONICAL_HEADERS.index(h) for h in CANONICAL_HEADERS}
+        order_rows = []
+        item_rows = []
+        for order_no, (first, group) in enumerate(iter_orders(header, rows)):
+            items_cents = 0
+            paid = shipping = None
+            for r in group:
+                unit = to_cents(r[col['unit_price']])
+                total = to_cents(r[col['item_total']])
+                item_rows.append((order_no, r[col['title']], r[col['specification']], r[col['item_url']],
+                                  r[col['item_id']], r[col['unit_price']], r[col['quantity']],
+                                  r[col['item_total']], unit, total))
+                if total is None and unit is not None and r[col['quantity']].strip().isdigit():
+                    total = unit * int(r[col['quantity']])
+                items_cents += total or 0
+                if paid is None:
+                    paid = to_cents(r[col['paid']])
+                if shipping is None:
+                    shipping = to_cents(r[col['lieferkosten']])
+            date = first[col['order_date']].strip()
+            order_rows.append((order_no, first[col['order_id']].strip(), date, date[:7], date[:4],
+                               first[col['seller']].strip(), len(group), items_cents, paid, shipping))
+            if len(item_rows) >= 10000:
+                _flush(conn, order_rows, item_rows)
+        _flush(conn, order_rows, item_rows)
+        conn.execute('INSERT INTO meta (key, value) VALUES (?, ?)', ('fingerprint', fingerprint))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _flush(conn, order_rows: list, item_rows: list) -> None:
+    conn.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', order_rows)
+    conn.executemany('INSERT INTO items (order_no, title, specification, item_url, item_id, unit_price, quantity,'
+                     ' item_total, unit_cents, total_cents) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', item_rows)
+    order_rows.clear()
+    item_rows.clear()
+
+
+class OrderIndex:
+    """Filter and aggregate queries over the index of one finalized CSV.
+
+    Filters (all optional, combined with AND): order_id, seller (exact), seller_contains,
+    since / until (order_date, inclusive, YYYY-MM-DD prefixes work), min_paid / max_paid,
+    min_shipping / max_shipping, min_price / max_price (unit price of at least one item;
+    for item queries, of the item itself). Amounts are in currency units.
+    """
+
+    def __init__(self, csv_path: str, rebuild: bool = False) -> None:
+        self.csv_path = csv_path
+        self.path = index_path(csv_path)
+        self.rebuilt = False
+        if rebuild or not self._fresh():
+            build_index(csv_path, self.path)
+            self.rebuilt = True
+        self._conn = sqlite3.connect(self.path)
+
+    def __enter__(self) -> 'OrderIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _fresh(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key='fingerprint'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return False
+        return row is not None and row[0] == _fingerprint(self.csv_path)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def _where(filters: Dict[str, object], items: bool = False) -> Tuple[str, list]:
+        clauses = []
+        params: list = []
+
+        def cents(v) -> int:
+            return int((Decimal(str(v)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == 'order_id':
+                clauses.append('o.order_id = ?')
+                params.append(str(value))
+            elif name == 'seller':
+                clauses.append('o.seller = ?')
+                params.append(str(value))
+            elif name == 'seller_contains':
+                clauses.append("o.seller LIKE ? ESCAPE '\\'")
+                escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f'%{escaped}%')
+            elif name == 'since':
+                clauses.append('o.order_date >= ?')
+                params.append(str(value))
+            elif name == 'until':
+                # a prefix such as '2023-06' includes the whole month
+                clauses.append('o.order_date <= ?')
+                params.append(str(value) + '\uffff')
+            elif name in ('min_paid', 'max_paid', 'min_shipping', 'max_shipping'):
+                column = 'o.paid_cents' if name.endswith('paid') else 'o.shipping_cents'
+                clauses.append(f'{column} {">=" if name.startswith("min") else "<="} ?')
+                params.append(cents(value))
+            elif name in ('min_price', 'max_price'):
+                op = '>=' if name == 'min_price' else '<='
+                if items:
+                    clauses.append(f'i.unit_cents {op} ?')
+                else:
+                    clauses.append(f'o.order_no IN (SELECT order_no FROM items WHERE unit_cents {op} ?)')
+                params.append(cents(value))
+            else:
+                raise ValueError(f'Unknown filter: {name}')
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def orders(self, limit: Optional[int] = None, **filters) -> List[Dict[str, str]]:
+        where, params = self._where(filters)
+        sql = ('SELECT o.order_id, o.order_date, o.seller, o.item_count, o.items_cents, o.paid_cents,'
+               f' o.shipping_cents FROM orders o{where} ORDER BY o.order_no')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        out = []
+        for oid, date, seller, count, items, paid, ship in self._conn.execute(sql, params):
+            out.append(dict(zip(ORDER_COLUMNS, (oid, date, seller, str(count), money(items), money(paid),
+                                                money(ship)))))
+        return out
+
+    def items(self, limit: Optional[int] = None, **filters) -> List[Dict[str, str]]:
+        where, params = self._where(filters, items=True)
+        sql = ('SELECT o.order_id, o.order_date, o.seller, i.title, i.specification, i.item_url, i.item_id,'
+               ' i.unit_price, i.quantity, i.item_total, o.paid_cents, o.shipping_cents'
+               f' FROM items i JOIN orders o ON o.order_no = i.order_no{where} ORDER BY i.row_no')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        out = []
+        for r in self._conn.execute(sql, params):
+            out.append(dict(zip(ITEM_COLUMNS, list(r[:10]) + [money(r[10]), money(r[11])])))
+        return out
+
+    def aggregate(self, by: Sequence[str], **filters) -> List[Dict[str, str]]:
+        """Orders, items and sums (item totals, paid, shipping) per combination of `by` keys."""
+        for key in by:
+            if key not in GROUP_KEYS:
+                raise ValueError(f'Cannot group by {key!r} (choose from {", ".join(GROUP_KEYS)})')
+        where, params = self._where(filters)
+        keys = ', '.join(f'o.{k}' for k in by)
+        select = (keys + ', ') if by else ''
+        sql = (f'SELECT {select}COUNT(*), SUM(o.item_count), SUM(o.items_cents), SUM(o.paid_cents),'
+               f' SUM(o.shipping_cents) FROM orders o{where}')
+        if by:
+            sql += f' GROUP BY {keys} ORDER BY {keys}'
+        out = []
+        n = len(by)
+        for r in self._conn.execute(sql, params):
+            values = list(r[:n]) + [str(r[n]), str(r[n + 1] or 0), money(r[n + 2]), money(r[n + 3]),
+                                    money(r[n + 4])]
+            out.append(dict(zip(list(by) + list(AGGREGATE_COLUMNS), values)))
+        return out
+
+
+def _amount(s: str) -> Decimal:
+    d = parse_price(s)
+    if d is None or not d.is_finite():
+        raise argparse.ArgumentTypeError(f'not an amount: {s!r}')
+    return d
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Query a finalized CSV through a persistent order index')
+    p.add_argument('input', help='Finalized CSV (the index is kept next to it as <input>.index.sqlite)')
+    p.add_argument('--rebuild', action='store_true', help='Rebuild the index even if it is up to date')
+    p.add_argument('--order-id')
+    p.add_argument('--seller', help='Exact seller name')
+    p.add_argument('--seller-contains', help='Case-insensitive (ASCII) substring of the seller name')
+    p.add_argument('--since', help='First order date (YYYY-MM-DD, or a prefix such as 2023-06)')
+    p.add_argument('--until', help='Last order date, inclusive (YYYY-MM-DD or a prefix)')
+    p.add_argument('--min-paid', type=_amount)
+    p.add_argument('--max-paid', type=_amount)
+    p.add_argument('--min-shipping', type=_amount)
+    p.add_argument('--max-shipping', type=_amount)
+    p.add_argument('--min-price', type=_amount, help='Unit price of at least one item (of the item with --items)')
+    p.add_argument('--max-price', type=_amount)
+    mode = p.add_mutually_exclusive_group()
+    mode.add_argument('--items', action='store_true', help='List matching items instead of orders')
+    mode.add_argument('--group-by', help=f'Aggregate per key(s), comma separated: {", ".join(GROUP_KEYS)}; '
+                                         'use "all" for a single total row')
+    p.add_argument('--limit', type=int, help='Return at most N rows')
+    p.add_argument('-o', '--output', help='Write the result to a file (.csv/.parquet/.arrow) instead of stdout')
+    return p.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f'Input file not found: {args.input}', file=sys.stderr)
+        return 2
+    filters = {name: getattr(args, name) for name in (
+        'order_id', 'seller', 'seller_contains', 'since', 'until', 'min_paid', 'max_paid', 'min_shipping',
+        'max_shipping', 'min_price', 'max_price')}
+
+    with OrderIndex(args.input, rebuild=args.rebuild) as index:
+        if index.rebuilt:
+            print(f'Indexed {args.input} -> {index.path}', file=sys.stderr)
+        try:
+            if args.group_by:
+                by = [] if args.group_by == 'all' else [k.strip() for k in args.group_by.split(',') if k.strip()]
+                result = index.aggregate(by, **filters)
+                columns = by + list(AGGREGATE_COLUMNS)
+            elif args.items:
+                result = index.items(limit=args.limit, **filters)
+                columns = list(ITEM_COLUMNS)
+            else:
+                result = index.orders(limit=args.limit, **filters)
+                columns = list(ORDER_COLUMNS)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    if args.limit and args.group_by:
+        result = result[:args.limit]
+
+    rows = [[r[c] for c in columns] for r in result]
+    if args.output:
+        write_csv_rows(args.output, columns, rows)
+        print(f'Wrote {len(rows)} rows to {args.output}', file=sys.stderr)
+    else:
+        w = csv.writer(sys.stdout, lineterminator='\n')
+        w.writerow(columns)
+        w.writerows(rows)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
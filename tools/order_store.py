@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+order_store.py
+
+Local SQLite store of already processed orders, used by incremental_update.py.
+
+Every export from the userscript contains the whole order history. The store remembers,
+per order, a content hash of its raw export rows, the translated rows (one per sub-item)
+and the finalized rows, so a new export only needs the orders that are new or whose rows
+changed translated and cleaned again; the final CSV is regenerated from the store.
+
+Orders are keyed by their stripped order_id; rows without one are keyed by their own
+content. Items are keyed by (order key, position within the order) and carry the hash of
+their raw row, so an unchanged item of a changed order keeps its translation.
+
+Usage:
+  with OrderStore('orders.sqlite') as store:
+      store.configure(header, translation='googletrans:zh-cn:en', cleaning='collapse')
+      known = store.hashes()
+      ...
+      store.put_order(key, digest, items, final_rows)
+      store.finish()
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS orders ('
+    ' order_key TEXT PRIMARY KEY, hash TEXT NOT NULL, position INTEGER NOT NULL,'
+    ' seen_run INTEGER NOT NULL, final TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS items ('
+    ' order_key TEXT NOT NULL, item_no INTEGER NOT NULL, raw_hash TEXT NOT NULL, translated TEXT NOT NULL,'
+    ' PRIMARY KEY (order_key, item_no))',
+    'CREATE INDEX IF NOT EXISTS orders_sequence ON orders(seen_run, position)',
+)
+
+# Commit after this many stored orders so an aborted run keeps most of its work
+COMMIT_EVERY = 500
+
+
+def row_hash(row: Sequence[str]) -> str:
+    return hashlib.blake2b(json.dumps(list(row), ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def order_hash(item_hashes: Sequence[str]) -> str:
+    return hashlib.blake2b('\n'.join(item_hashes).encode('ascii'), digest_size=16).hexdigest()
+
+
+class OrderStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        for stmt in SCHEMA:
+            self._conn.execute(stmt)
+        self._pending = 0
+        self.run = int(self._meta('run') or 0) + 1
+        self._position = 0
+
+    def __enter__(self) -> 'OrderStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def configure(self, header: List[str], translation: str, cleaning: str) -> Tuple[bool, bool]:
+        """Record the settings of this run; returns (translations_reset, finals_stale).
+
+        A different input header or translation setting invalidates every stored order; a
+        different cleaning setting only means the finalized rows must be rebuilt from the
+        stored translations (see refinalize()).
+        """
+        header_json = json.dumps(header, ensure_ascii=False)
+        reset = (self._meta('header') not in (None, header_json)
+                 or self._meta('translation') not in (None, translation))
+        if reset:
+            self._conn.execute('DELETE FROM items')
+            self._conn.execute('DELETE FROM orders')
+        stale = not reset and self._meta('cleaning') not in (None, cleaning)
+        self._set_meta('header', header_json)
+        self._set_meta('translation', translation)
+        self._set_meta('cleaning', cleaning)
+        self._conn.commit()
+        return reset, stale
+
+    def header(self) -> List[str]:
+        return json.loads(self._meta('header') or '[]')
+
+    def hashes(self) -> Dict[str, str]:
+        """order key -> content hash of every stored order."""
+        return dict(self._conn.execute('SELECT order_key, hash FROM orders'))
+
+    def items(self, key: str) -> Dict[str, List[str]]:
+        """raw row hash -> translated row of a stored order."""
+        return {h: json.loads(t) for h, t in self._conn.execute(
+            'SELECT raw_hash, translated FROM items WHERE order_key=?', (key,))}
+
+    def translated_rows(self, key: str) -> List[List[str]]:
+        return [json.loads(t) for (t,) in self._conn.execute(
+            'SELECT translated FROM items WHERE order_key=? ORDER BY item_no', (key,))]
+
+    def _next_position(self) -> int:
+        self._position += 1
+        return self._position
+
+    def touch(self, key: str) -> None:
+        """Mark an unchanged order as present in this run's export, at the next position."""
+        self._conn.execute('UPDATE orders SET position=?, seen_run=? WHERE order_key=?',
+                           (self._next_position(), self.run, key))
+        self._written()
+
+    def put_order(self, key: str, digest: str, items: Sequence[Tuple[str, List[str]]],
+                  final_rows: Sequence[Sequence[str]]) -> None:
+        """Store a new or changed order: (raw hash, translated row) per item plus its final rows."""
+        self._conn.execute('DELETE FROM items WHERE order_key=?', (key,))
+        self._conn.executemany(
+            'INSERT INTO items (order_key, item_no, raw_hash, translated) VALUES (?, ?, ?, ?)',
+            [(key, n, h, json.dumps(row, ensure_ascii=False)) for n, (h, row) in enumerate(items)])
+        self._conn.execute(
+            'INSERT OR REPLACE INTO orders (order_key, hash, position, seen_run, final) VALUES (?, ?, ?, ?, ?)',
+            (key, digest, self._next_position(), self.run, json.dumps([list(r) for r in final_rows],
+                                                                       ensure_ascii=False)))
+        self._written()
+
+    def set_final(self, key: str, final_rows: Sequence[Sequence[str]]) -> None:
+        self._conn.execute('UPDATE orders SET final=? WHERE order_key=?',
+                           (json.dumps([list(r) for r in final_rows], ensure_ascii=False), key))
+        self._written()
+
+    def keys(self) -> List[str]:
+        return [k for (k,) in self._conn.execute('SELECT order_key FROM orders')]
+
+    def prune(self) -> int:
+        """Drop orders that were not in this run's export; returns how many."""
+        gone = [k for (k,) in self._conn.execute('SELECT order_key FROM orders WHERE seen_run<?', (self.run,))]
+        self._conn.executemany('DELETE FROM items WHERE order_key=?', [(k,) for k in gone])
+        self._conn.executemany('DELETE FROM orders WHERE order_key=?', [(k,) for k in gone])
+        self._written()
+        return len(gone)
+
+    def iter_final_rows(self) -> Iterator[List[str]]:
+        """Final rows of every stored order: this run's export order first, then older orders."""
+        cur = self._conn.execute('SELECT final FROM orders ORDER BY seen_run DESC, position')
+        for (final,) in cur:
+            yield from json.loads(final)
+
+    def finish(self) -> None:
+        self._set_meta('run', str(self.run))
+        self.flush(force=True)
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.flush()
+
+    def flush(self, force: bool = False) -> None:
+        if self._pending or force:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
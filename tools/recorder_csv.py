@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+recorder_csv.py
+
+Streaming decoder for the "recorder" CSV format written by the userscript's DOM recorder.
+
+In that format every record is stored as ONE quoted field holding a whole inner CSV line
+(inner quotes doubled, order id prefixed with a tab for Excel):
+
+  "	2950548049244739241,""2022-10-14"",""晴天餐料行"",""2022-10-14订单号: 29505...	晴天餐料行		   意式…"",…"
+
+and the title column carries the raw text snippet of the order block: date, "订单号: <id>",
+seller and tab-separated fragments, sometimes preceded by leftover button labels
+("申请售后", "再次购买", ...) and followed by the SKU text ("口味：400").
+
+``unwrap_rows()`` feeds the wrapped fields through a single inner csv.reader (no second
+file pass), strips the Excel tab prefix and splits the title blob with one anchored regex
+into date / order id / seller / title, moving a trailing "label：value" part into the
+specification column. Files that are not in recorder format pass through untouched.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Both the English and the Chinese column names the userscript has used
+COLUMN_NAMES = {
+    'order_id': ('order_id', '订单号'),
+    'order_date': ('order_date', '下单日期'),
+    'seller': ('seller', '卖家'),
+    'title': ('title', '商品名称'),
+    'specification': ('specification', '规格'),
+}
+
+# Leftover button/label text the recorder picks up around the title
+JUNK_WORDS = ('申请售后', '投诉卖家', '再次购买', '双方已评', '追加评论', '查看物流', '订单详情',
+              '确认收货', '运费险已出单', '交易快照', '[交易快照]')
+
+TITLE_BLOB_RE = re.compile(
+    r'(?:(?P<date>\d{4}-\d{2}-\d{2})\s*订单号[:：]\s*(?P<oid>\d+)\t(?P<seller>[^\t]*))?'
+    r'(?:\s|\]|' + '|'.join(re.escape(w) for w in JUNK_WORDS) + r')*'
+    r'(?P<title>.*)',
+    re.DOTALL,
+)
+# "  口味：400" / "颜色分类：WHITE" -- a short label followed by a full- or half-width colon
+SPEC_SPLIT_RE = re.compile(r'(?:^|\s{2,})(?=[^\s：:]{1,16}[：:])')
+
+
+def split_title_blob(blob: str) -> Tuple[str, str, str, str, str]:
+    """Return (date, order_id, seller, title, spec); missing parts are empty strings."""
+    m = TITLE_BLOB_RE.match(blob)
+    rest = m.group('title').strip()
+    spec = ''
+    s = SPEC_SPLIT_RE.search(rest)
+    if s:
+        spec = rest[s.end():].strip()
+        rest = rest[:s.start()].strip()
+    return m.group('date') or '', m.group('oid') or '', (m.group('seller') or '').strip(), rest, spec
+
+
+def _column_index(header: List[str]) -> Dict[str, Optional[int]]:
+    names = [h.strip().lower() for h in header]
+    out: Dict[str, Optional[int]] = {}
+    for key, candidates in COLUMN_NAMES.items():
+        out[key] = next((names.index(c) for c in candidates if c in names), None)
+    return out
+
+
+def is_wrapped(header: List[str], row: List[str]) -> bool:
+    return len(header) > 1 and len(row) == 1 and ',' in row[0]
+
+
+def _inner_lines(rows: Iterable[List[str]]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='')
+    for r in rows:
+        if len(r) == 1:
+            yield r[0]
+        else:
+            # an already-columnized row inside a recorder file: re-serialize so one reader handles both
+            buf.seek(0)
+            buf.truncate()
+            writer.writerow(r)
+            yield buf.getvalue()
+
+
+def decode_record(cols: Dict[str, Optional[int]], width: int, row: List[str]) -> List[str]:
+    row = [c.lstrip('\t') for c in row]
+    if len(row) < width:
+        row += [''] * (width - len(row))
+    ti = cols['title']
+    if ti is None or not row[ti]:
+        return row
+    date, oid, seller, title, spec = split_title_blob(row[ti])
+    row[ti] = title
+    for key, value in (('order_date', date), ('order_id', oid), ('seller', seller), ('specification', spec)):
+        idx = cols[key]
+        if value and idx is not None and not row[idx].strip():
+            row[idx] = value
+    return row
+
+
+def unwrap_rows(header: List[str], rows: Iterable[List[str]]) -> Iterator[List[str]]:
+    """Yield data rows, decoding recorder-format records when the file uses that format."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    if not is_wrapped(header, first):
+        yield first
+        yield from rows
+        return
+    cols = _column_index(header)
+    width = len(header)
+    for inner in csv.reader(_inner_lines(chain([first], rows))):
+        yield decode_record(cols, width, inner)
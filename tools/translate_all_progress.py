@@ -2,115 +2,549 @@
 """
 translate_all_progress.py
 
-Translate any CSV cell that contains Chinese characters (Han) using googletrans,
-show per-row progress and optionally write interim output so you can see live progress.
+Translate any CSV cell that contains Chinese characters (Han) using a pluggable
+translator backend (googletrans by default, see translator_backends.py), show progress
+and optionally write interim output so you can see live progress.
+
+Before translating, a planning pass streams the file once and collects every distinct
+Chinese string; each one is translated once (in batches bounded by total character
+length, using the backend's ``translate_batch``). A second streaming pass then
+substitutes the translations into every cell that contained them while writing the
+output, so memory grows with the number of distinct strings, not with the number of rows.
+
+With ``--segment`` only the Han runs inside a cell are sent (han_text.py): in a title like
+'马苏里拉碎芝士Pizza Cheese 披萨奶酪' the Latin part, SKU codes and numbers stay untouched,
+each run is translated and cached on its own and the cell is reassembled afterwards.
+
+Translations are remembered in an on-disk SQLite cache (``--cache``), so repeated seller
+names, status strings and titles are translated once and re-runs are served from disk.
+
+Progress is checkpointed to an append-only journal next to the output
+(``<output>.journal.jsonl``); after a crash or throttling abort, ``--resume`` re-applies the
+journaled translations and only translates what is left. The output CSV is written once, at the
+end, through a temp file and an atomic rename.
+
+With ``--workers N`` up to N batches are in flight at once on a thread pool, throttled by
+a token bucket (``--rate`` calls per second); results are still applied in plan order.
+
+A failed call never blocks its worker: its strings go to a deferred retry queue that is
+retried after the main pass (``--retries`` rounds with jittered backoff, one string per call
+for batches that fail again). After ``--breaker-threshold`` failures in a row the backend is
+paused for ``--breaker-cooldown`` seconds and the remaining batches are deferred right away.
+Cells that are still Chinese afterwards are listed (row, column, text, reason) in
+``<output>.failed.csv``; ``--retry-failed`` translates just those cells and patches the output.
+
+Progress lines are throttled to one per ``--progress-interval`` seconds. ``--profile`` times
+the read / detect / cache / translate / write stages and reports counters (cache hits,
+retries, bytes) and the translator latency histogram, see metrics.py.
 
 Usage:
   python tools/translate_all_progress.py -i in.csv -o out.csv --write-interval 10
+  python tools/translate_all_progress.py -i in.csv -o out.csv --resume
+  python tools/translate_all_progress.py -i in.csv -o out.csv --cache translations.sqlite
+  python tools/translate_all_progress.py -i in.csv -o out.csv --workers 8 --rate 5
+  python tools/translate_all_progress.py -i in.csv -o out.csv --backend glossary --glossary terms.tsv
+  python tools/translate_all_progress.py -i in.csv -o out.csv --profile metrics.json
+  python tools/translate_all_progress.py -i in.csv -o out.csv --segment
+  python tools/translate_all_progress.py -o out.csv --retry-failed
 
 """
 import argparse
-import csv
-import re
 import sys
-from time import time, sleep
+from time import perf_counter, time, sleep
 from pathlib import Path
 
-try:
-    from googletrans import Translator
-except Exception as e:
-    Translator = None
+from translation_cache import TranslationCache, DEFAULT_MAX_ENTRIES
+from translation_engine import CircuitBreaker, TokenBucket, backoff_delay, run_ordered
+from translator_backends import BACKENDS, BackendUnavailable, get_backend
+from finalize_translated_csv import iter_csv_rows
+from han_text import han_segments, has_chinese, join_cell
+from intermediate import IntermediateUnavailable, check_available
+from checkpoint import (CheckpointJournal, CheckpointMismatch, atomic_write_csv, default_journal_path,
+                        input_fingerprint, load_journal)
+from metrics import Metrics, ProgressThrottle, profiling
+
+# Google rejects requests above ~5000 characters; stay below that per batch
+DEFAULT_BATCH_CHARS = 4500
+DEFAULT_BATCH_SIZE = 100
+# columns of the failure report written next to the output
+REPORT_FIELDS = ('row', 'column', 'text', 'reason')
+
+
+def _call_backend(backend, texts, src, dest, metrics=None):
+    if metrics is None:
+        return backend.translate_batch(texts, src, dest)
+    start = perf_counter()
+    try:
+        return backend.translate_batch(texts, src, dest)
+    finally:
+        metrics.observe('translator_latency', perf_counter() - start)
+        metrics.incr('translator_calls')
+
+
+def iter_dict_rows(path):
+    # shared reader: also decodes recorder-format exports (one wrapped record per line)
+    rows = iter_csv_rows(str(path))
+    fields = next(rows, [])
+    for r in rows:
+        yield dict(zip(fields, r))
+
+
+def read_fields(path):
+    return next(iter_csv_rows(str(path)), [])
+
+
+def plan_translations(rows, fields):
+    """Count, per distinct Chinese cell value, how many cells hold it (rows may be a stream)."""
+    plan = {}
+    for row in rows:
+        for col in fields:
+            val = row.get(col)
+            if val and has_chinese(val):
+                plan[val] = plan.get(val, 0) + 1
+    return plan
+
 
-CHINESE_RE = re.compile(r'[\u4e00-\u9fff]')
+def segment_plan(plan):
+    """Turn a cell plan into a plan of the Han runs inside those cells (see han_text.py)."""
+    segments = {}
+    for cell, count in plan.items():
+        for seg in han_segments(cell):
+            segments[seg] = segments.get(seg, 0) + count
+    return segments
 
 
-def has_chinese(s):
-    return bool(s and CHINESE_RE.search(s))
+def apply_translations(rows, fields, translations):
+    """Yield rows with every translated cell value substituted."""
+    for row in rows:
+        for col in fields:
+            new = translations.get(row.get(col))
+            if new is not None:
+                row[col] = new
+        yield row
+
+
+def iter_batches(texts, max_chars=DEFAULT_BATCH_CHARS, max_items=DEFAULT_BATCH_SIZE):
+    """Group texts into lists whose combined length stays within max_chars (an oversized text goes alone)."""
+    batch = []
+    size = 0
+    for text in texts:
+        if batch and (size + len(text) > max_chars or len(batch) >= max_items):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(text)
+        size += len(text)
+    if batch:
+        yield batch
+
+
+def translate_batch(backend, texts, src='zh-cn', dest='en', limiter=None, metrics=None, breaker=None):
+    """Translate a list of strings with one translator call; returns translations in input order.
+
+    Never retries or sleeps: returns None if the call failed or was skipped because the circuit
+    breaker is open, and the caller defers the texts (see DeferredTranslator).
+    """
+    if breaker is not None and not breaker.allow():
+        if metrics is not None:
+            metrics.incr('circuit_skips')
+        return None
+    try:
+        if limiter is not None:
+            limiter.acquire()
+        out = _call_backend(backend, list(texts), src, dest, metrics)
+        if len(out) != len(texts):
+            raise ValueError(f'{len(out)} translations returned for {len(texts)} texts')
+    except Exception as e:
+        if metrics is not None:
+            metrics.incr('failed_calls')
+        print(f'  batch translate failed for {len(texts)} texts: {e}; deferred')
+        sys.stdout.flush()
+        if breaker is not None and breaker.failure():
+            print(f'  {breaker.threshold} calls failed in a row: circuit open, '
+                  f'backend paused for {breaker.cooldown:g}s')
+        return None
+    if breaker is not None:
+        breaker.success()
+    return out
+
+
+class DeferredTranslator:
+    """Batched translator calls with a deferred retry queue instead of inline retries.
+
+    run() makes one attempt per batch: a failed call (or one skipped while the circuit breaker
+    is open) parks its texts in the queue and the worker moves on to the next batch. drain()
+    retries the queue in up to args.retries rounds, with jittered backoff (or the breaker
+    cooldown) between rounds; the texts of a batch that fails again are retried one by one, so
+    a single bad string cannot hold back the rest. What still fails ends up in `failed`.
+    Both methods yield (batch, translations) for the calls that succeeded, in batch order.
+    """
 
+    def __init__(self, backend, args, metrics) -> None:
+        self.backend = backend
+        self.args = args
+        self.metrics = metrics
+        self.limiter = TokenBucket(args.rate, args.burst or None) if args.rate > 0 else None
+        self.breaker = CircuitBreaker(args.breaker_threshold, args.breaker_cooldown)
+        self.queue = []
+        self.failed = set()
 
-def translate_value(translator, text, src='zh-cn', dest='en', retries=2, backoff=0.5):
-    if not text:
-        return text
-    attempt = 0
-    while attempt <= retries:
-        try:
-            res = translator.translate(text, src=src, dest=dest)
-            return res.text if hasattr(res, 'text') else str(res)
-        except Exception as e:
-            attempt += 1
-            wait = backoff * attempt
-            print(f'  translate failed attempt {attempt} for text len {len(text)}: {e}; retry {wait}s')
+    def _work(self, batch):
+        return translate_batch(self.backend, batch, src=self.args.src, dest=self.args.dest,
+                               limiter=self.limiter, metrics=self.metrics, breaker=self.breaker)
+
+    def _calls(self, batches, split):
+        for batch, results in run_ordered(batches, self._work, workers=self.args.workers):
+            if results is not None:
+                yield batch, results
+                continue
+            self.metrics.incr('deferred_texts', len(batch))
+            if split and len(batch) > 1:
+                self.queue.extend([t] for t in batch)
+            else:
+                self.queue.append(batch)
+
+    def run(self, batches):
+        return self._calls(batches, split=False)
+
+    def drain(self):
+        retries = max(0, self.args.retries)
+        for attempt in range(1, retries + 1):
+            if not self.queue:
+                break
+            batches, self.queue = self.queue, []
+            wait = max(backoff_delay(attempt, self.args.backoff), self.breaker.remaining())
+            print(f'Retrying {sum(len(b) for b in batches)} deferred strings '
+                  f'(round {attempt}/{retries}) in {wait:.1f}s')
             sys.stdout.flush()
             sleep(wait)
-    print('  translate ultimately failed, returning original')
-    return text
+            self.metrics.incr('retries', len(batches))
+            yield from self._calls(batches, split=True)
+        for batch in self.queue:
+            self.failed.update(batch)
+        self.queue = []
 
 
-def main():
-    p = argparse.ArgumentParser()
-    p.add_argument('--input', '-i', required=True)
-    p.add_argument('--output', '-o', required=True)
-    p.add_argument('--write-interval', type=int, default=0, help='Write interim output every N rows')
-    p.add_argument('--retries', type=int, default=2)
-    p.add_argument('--backoff', type=float, default=0.5)
+def add_translation_args(p):
+    """Translator, cache, journal and batching options shared by the CLIs that translate a file."""
+    p.add_argument('--write-interval', type=int, default=1, help='Flush the checkpoint journal to disk every N batches')
+    p.add_argument('--journal', help='Checkpoint journal path (default: <output>.journal.jsonl)')
+    p.add_argument('--resume', action='store_true', help='Re-apply cells from the checkpoint journal and skip them')
+    p.add_argument('--failure-report', help='CSV listing the cells left untranslated (default: <output>.failed.csv)')
+    p.add_argument('--retry-failed', action='store_true',
+                   help='Only retry the cells of the failure report and patch the output in place')
+    add_translator_args(p)
+
+
+def add_translator_args(p):
+    """Backend, cache, batching, retry and rate options used by every translate_plan() caller."""
+    p.add_argument('--retries', type=int, default=2,
+                   help='Rounds in which failed strings are retried after the main pass')
+    p.add_argument('--backoff', type=float, default=0.5, help='Base delay (seconds) before each retry round')
+    p.add_argument('--breaker-threshold', type=int, default=5,
+                   help='Pause the backend after this many failed calls in a row (0 = never)')
+    p.add_argument('--breaker-cooldown', type=float, default=30.0,
+                   help='Seconds before a paused backend is tried again')
     p.add_argument('--src', default='zh-cn')
     p.add_argument('--dest', default='en')
-    args = p.parse_args()
+    p.add_argument('--cache', help='SQLite file used to persist translations across runs')
+    p.add_argument('--cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                   help='Maximum cached translations; least recently used entries are evicted')
+    p.add_argument('--batch-chars', type=int, default=DEFAULT_BATCH_CHARS,
+                   help='Maximum total characters sent to the translator per call')
+    p.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                   help='Maximum number of strings sent to the translator per call')
+    p.add_argument('--backend', choices=sorted(BACKENDS), default='googletrans', help='Translator backend')
+    p.add_argument('--glossary', help='TSV/JSON phrase table for the glossary backend')
+    p.add_argument('--fake-latency', type=float, default=0.0, help='Simulated per-call latency for the fake backend')
+    p.add_argument('--fake-fail-rate', type=float, default=0.0, help='Share of failing calls for the fake backend')
+    p.add_argument('--workers', type=int, default=1, help='Number of translator calls kept in flight')
+    p.add_argument('--rate', type=float, default=0, help='Maximum translator calls per second (0 = unlimited)')
+    p.add_argument('--burst', type=int, default=0, help='Token-bucket burst size for --rate (default: rate)')
+    p.add_argument('--segment', action='store_true',
+                   help='Translate only the Han runs of each cell and keep Latin text, codes and numbers as they are')
+    p.add_argument('--progress-interval', type=float, default=1.0,
+                   help='Seconds between progress lines (0 = one line per batch)')
+    p.add_argument('--profile', metavar='PATH',
+                   help='Time each stage; write a JSON metrics summary (*.json) or cProfile stats (other paths)')
+
 
-    inp = Path(args.input)
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', '-i', help='CSV to translate (not read with --retry-failed)')
+    p.add_argument('--output', '-o', required=True)
+    add_translation_args(p)
+    args = p.parse_args(argv)
+    if not args.input and not args.retry_failed:
+        p.error('the following arguments are required: --input/-i')
+
+    inp = Path(args.input) if args.input else None
     outp = Path(args.output)
-    if not inp.exists():
+    if inp is not None and not inp.exists():
         print('Input missing:', inp)
         sys.exit(1)
+    if args.retry_failed and not outp.exists():
+        print('Output missing:', outp)
+        sys.exit(1)
+    try:
+        check_available(*(path for path in (inp, outp) if path is not None))
+    except IntermediateUnavailable as e:
+        print(e)
+        sys.exit(1)
 
-    if Translator is None:
-        print('googletrans not available in this interpreter')
+    try:
+        backend = get_backend(args.backend, glossary=args.glossary, fake_latency=args.fake_latency,
+                              fake_fail_rate=args.fake_fail_rate)
+    except (BackendUnavailable, OSError, ValueError) as e:
+        print(e)
         sys.exit(1)
 
-    translator = Translator()
+    metrics = Metrics()
+    with profiling(args.profile, metrics):
+        if args.retry_failed:
+            retry_failed(args, outp, backend, metrics)
+        else:
+            run(args, inp, outp, backend, metrics)
+
+
+def open_journal(args, inp, outp, fields):
+    """Return (journal, translations resumed from it); raises CheckpointMismatch for a foreign journal."""
+    journal_path = Path(args.journal) if args.journal else default_journal_path(outp)
+    # a journal is only reused with the backend, languages and segment mode it was written with
+    settings = {'backend': args.backend, 'src': args.src, 'dest': args.dest, 'segment': args.segment}
+    fingerprint = input_fingerprint(inp, fields, settings)
+    translations = {}
+    valid_size = None
+    if args.resume:
+        translations, valid_size = load_journal(journal_path, fingerprint)
+        print(f'Resumed {len(translations)} translated strings from {journal_path}')
+    return CheckpointJournal(journal_path, fingerprint, resume=args.resume, valid_size=valid_size), translations
 
-    with inp.open('r', encoding='utf-8-sig', newline='') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        fields = list(reader.fieldnames or [])
 
-    total = len(rows)
+def translate_plan(plan, backend, args, metrics, cache=None, journal=None, translations=None):
+    """Translate every string of `plan` ({text: cells}) that `translations` does not hold yet.
+
+    Cache first, then batched translator calls on up to args.workers threads; failed calls are
+    retried after the main pass (DeferredTranslator), progress is printed and every successful
+    result is journaled. Returns (translations, translated count in plan units, failed), where
+    `failed` maps each string left untranslated to the reason ('error' or 'unchanged').
+    """
+    translations = {} if translations is None else translations
+
+    # cache lookups stay on this thread (sqlite connections are not shared across workers);
+    # entries are namespaced per backend so offline/fake output never masks real translations
+    cache_src = f'{backend.name}:{args.src}'
+    pending = []
+    cached = []
+    with metrics.stage('cache'):
+        for text in plan:
+            if text in translations:
+                metrics.incr('journal_hits')
+                continue
+            hit = cache.get(text, cache_src, args.dest) if cache is not None else None
+            if hit is None:
+                pending.append(text)
+            else:
+                translations[text] = hit
+                cached.append((text, hit))
+        if journal is not None:
+            journal.record(cached)
+            journal.flush()
+    if cache is not None:
+        metrics.incr('cache_hits', len(cached))
+        metrics.incr('cache_misses', len(pending))
+
+    batches = list(iter_batches(pending, max_chars=args.batch_chars, max_items=args.batch_size))
+    print(f'Planned {len(plan)} unique strings for {sum(plan.values())} cells; '
+          f'{len(plan) - len(pending)} already translated, {len(batches)} batches')
+    metrics.incr('chars_to_translate', sum(len(t) for t in pending))
+
+    translator = DeferredTranslator(backend, args, metrics)
+    failed = {}
+    total = len(batches)
     start = time()
-    translated_count = 0
+    done = 0
+    translated_count = sum(plan.values()) - sum(plan[t] for t in pending)
+    progress = ProgressThrottle(args.progress_interval)
 
-    for idx, row in enumerate(rows, start=1):
-        changed = False
-        for col in fields:
-            val = row.get(col)
-            if val and has_chinese(val):
-                new = translate_value(translator, val, src=args.src, dest=args.dest, retries=args.retries, backoff=args.backoff)
-                if new != val:
-                    row[col] = new
-                translated_count += 1
-                changed = True
-        # progress
+    def apply(batch, results):
+        nonlocal translated_count
+        ok = []
+        for text, new in zip(batch, results):
+            if new == text:
+                # the backend answered with the source text: the cell is still Chinese
+                failed[text] = 'unchanged'
+                continue
+            if cache is not None:
+                cache.put(text, new, cache_src, args.dest)
+            translations[text] = new
+            translated_count += plan[text]
+            ok.append((text, new))
+        if journal is not None:
+            journal.record(ok)
+
+    shown = None
+
+    def report(idx):
+        nonlocal shown
+        shown = (done, translated_count)
         elapsed = time() - start
-        rate = idx / elapsed if elapsed>0 else 0
-        remaining = total - idx
+        rate = done / elapsed if elapsed>0 else 0
+        remaining = len(pending) - done
         eta = remaining / rate if rate>0 else float('inf')
-        print(f'Row {idx}/{total}  translated_items={translated_count}  rate={rate:.2f}/s  ETA={eta:.0f}s')
+        print(f'Batch {idx}/{total}  strings={done}/{len(pending)}  translated_items={translated_count}  rate={rate:.2f}/s  ETA={eta:.0f}s')
         sys.stdout.flush()
 
-        # interim write
-        if args.write_interval and idx % args.write_interval == 0:
-            with outp.open('w', encoding='utf-8-sig', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fields)
-                writer.writeheader()
-                writer.writerows(rows[:idx])
-            print(f'Wrote interim {idx} rows to {outp}')
-
-    # final write
-    with outp.open('w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f'Done. Wrote {outp}. Translated cell updates: {translated_count}')
+    results_iter = metrics.timed_iter('translate', translator.run(batches))
+    for idx, (batch, results) in enumerate(results_iter, start=1):
+        apply(batch, results)
+        done += len(batch)
+        # progress, throttled: console output must not become the bottleneck on large inputs
+        if progress.ready():
+            report(idx)
+
+        if journal is not None and idx % max(1, args.write_interval) == 0:
+            journal.flush()
+    for batch, results in metrics.timed_iter('translate', translator.drain()):
+        apply(batch, results)
+        done += len(batch)
+    if journal is not None:
+        journal.flush()
+    if total and shown != (done, translated_count):
+        # always end on the final state, also when the last batches went through the retry queue
+        report(total)
+    failed.update(dict.fromkeys(translator.failed, 'error'))
+    if failed:
+        metrics.incr('failed_texts', len(failed))
+        print(f'{len(failed)} strings left untranslated ({sum(plan[t] for t in failed)} cells)')
+    return translations, translated_count, failed
+
+
+def translate_cells(cell_plan, backend, args, metrics, cache=None, journal=None, translations=None):
+    """Like translate_plan() for a plan of cell values; returns ({cell: translated cell}, count, failed cells).
+
+    With args.segment only the Han runs of the cells are translated (and counted) and the cells
+    are reassembled from them; a cell counts as failed if any of its runs failed.
+    """
+    if not args.segment:
+        return translate_plan(cell_plan, backend, args, metrics, cache, journal, translations)
+    # translate only the Han runs of each cell; Latin text, SKU codes and numbers stay as they are
+    with metrics.stage('detect'):
+        plan = segment_plan(cell_plan)
+    print(f'Segment mode: {sum(len(t) for t in plan)} characters in Han runs '
+          f'instead of {sum(len(c) for c in cell_plan)} in whole cells')
+    translations, count, failed = translate_plan(plan, backend, args, metrics, cache, journal, translations)
+    with metrics.stage('detect'):
+        failed_cells = {}
+        if failed:
+            for cell in cell_plan:
+                reason = next((failed[seg] for seg in han_segments(cell) if seg in failed), None)
+                if reason is not None:
+                    failed_cells[cell] = reason
+        return {cell: join_cell(cell, translations) for cell in cell_plan}, count, failed_cells
+
+
+def failure_report_path(args, outp):
+    return Path(args.failure_report) if args.failure_report else outp.with_name(outp.name + '.failed.csv')
+
+
+def track_failures(rows, fields, failed, translations, report):
+    """Pass rows (dicts or lists, untranslated) through, adding a report entry for every failed cell.
+
+    Entries are (row, column, text, reason): the 1-based data row of the output, the column name,
+    the cell as it is written (Han runs that failed stay Chinese) and why it failed.
+    """
+    if not failed:
+        yield from rows
+        return
+    for n, row in enumerate(rows, start=1):
+        values = [row.get(c) for c in fields] if isinstance(row, dict) else row
+        for col, val in zip(fields, values):
+            reason = failed.get(val)
+            if reason is not None:
+                report.append((n, col, translations.get(val, val), reason))
+        yield row
+
+
+def write_failure_report(path, report):
+    """Write the failure report, or remove a stale one when nothing failed."""
+    if not report:
+        path.unlink(missing_ok=True)
+        return
+    fields = list(REPORT_FIELDS)
+    atomic_write_csv(path, fields, (dict(zip(fields, map(str, e))) for e in report))
+    print(f'{len(report)} cells left untranslated, listed in {path} (rerun with --retry-failed)')
+
+
+def read_failure_report(path):
+    rows = iter_csv_rows(str(path))
+    fields = next(rows, [])
+    return [dict(zip(fields, r)) for r in rows]
+
+
+def retry_failed(args, outp, backend, metrics):
+    """Translate again only the cells listed in the failure report and patch `outp` in place."""
+    report_path = failure_report_path(args, outp)
+    if not report_path.exists():
+        print(f'No failure report at {report_path}: nothing to retry')
+        return
+    entries = read_failure_report(report_path)
+    plan = {}
+    for e in entries:
+        plan[e['text']] = plan.get(e['text'], 0) + 1
+    print(f'Retrying {len(plan)} strings from {len(entries)} failed cells in {report_path}')
+
+    cache = TranslationCache(args.cache, max_entries=args.cache_size) if args.cache else None
+    try:
+        translations, translated_count, failed = translate_cells(plan, backend, args, metrics, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    fields = read_fields(outp)
+    report = []
+    with metrics.stage('write'):
+        rows = track_failures(iter_dict_rows(outp), fields, failed, translations, report)
+        atomic_write_csv(outp, fields, apply_translations(rows, fields, translations))
+    write_failure_report(report_path, report)
+    metrics.incr('segments_translated' if args.segment else 'cells_translated', translated_count)
+    print(f'Done. Patched {outp}: {len(entries) - len(report)} of {len(entries)} failed cells translated')
+
+
+def run(args, inp, outp, backend, metrics):
+    cache = TranslationCache(args.cache, max_entries=args.cache_size) if args.cache else None
+
+    fields = read_fields(inp)
+    try:
+        journal, translations = open_journal(args, inp, outp, fields)
+    except CheckpointMismatch as e:
+        print(e)
+        sys.exit(1)
+
+    # planning pass (streaming): every distinct Chinese string is translated once
+    with metrics.stage('detect'):
+        plan = plan_translations(metrics.timed_iter('read', iter_dict_rows(inp)), fields)
+    metrics.incr('bytes_read', inp.stat().st_size)
+
+    translations, translated_count, failed = translate_cells(plan, backend, args, metrics, cache, journal,
+                                                             translations)
+
+    # final write, once, streaming the input again; the journal is only discarded after the rename
+    report = []
+    with metrics.stage('write'):
+        rows = track_failures(metrics.timed_iter('read', iter_dict_rows(inp)), fields, failed, translations, report)
+        atomic_write_csv(outp, fields, apply_translations(rows, fields, translations))
+    journal.close(remove=True)
+    write_failure_report(failure_report_path(args, outp), report)
+    metrics.incr('bytes_read', inp.stat().st_size)
+    metrics.incr('bytes_written', outp.stat().st_size)
+    metrics.incr('segments_translated' if args.segment else 'cells_translated', translated_count)
+
+    unit = 'segment' if args.segment else 'cell'
+    print(f'Done. Wrote {outp}. Translated {unit} updates: {translated_count}')
+    if cache is not None:
+        print(cache.stats())
+        cache.close()
 
 
 if __name__ == '__main__':
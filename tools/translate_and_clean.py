@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+translate_and_clean.py
+
+Translate and finalize an export without intermediate files: the input is streamed twice,
+the final CSV is written once. This replaces the chain
+
+  translate_all_progress.py  (read export, write translated CSV)
+  finalize_translated_csv.py (read it again, write final CSV)
+  fix_final_output.py        (read it again, write the fixed layout)
+
+with the same library functions those tools use:
+
+  1. the export is streamed through CleanEngine (header mapping, junk-row filter, item
+     totals, shipping, canonical column order) and only the distinct Chinese cell values of
+     the finalized rows are kept,
+  2. those values are translated (cache, checkpoint journal, batching and workers exactly
+     like translate_all_progress.py),
+  3. the export is streamed through CleanEngine again and the translated rows are written
+     as they come (``--layout fixed`` writes fix_final_output.py's column layout instead of
+     CANONICAL_HEADERS); cells left untranslated are listed in ``<output>.failed.csv`` and
+     can be retried with ``--retry-failed``.
+
+Memory stays bounded by the translation plan, like the separate tools, at the price of
+cleaning the input twice (cheap next to translating it).
+
+Junk rows and columns that do not reach the final file are never sent to the translator.
+Cleaning only looks at prices, quantities and order ids, so cleaning before translating
+gives the same result as translating first.
+
+Usage:
+  python tools/translate_and_clean.py -i input_csv/export.csv -o final_output/orders_final.csv
+  python tools/translate_and_clean.py -i export.csv --cache translations.sqlite --workers 4 --rate 5
+  python tools/translate_and_clean.py -i export.csv -o fixed.csv --layout fixed
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+from checkpoint import CheckpointMismatch
+from finalize_translated_csv import CANONICAL_HEADERS, CleanEngine, iter_csv_rows, write_csv_rows
+from fix_final_output import FIXED_HEADER, fix_rows
+from han_text import has_chinese
+from intermediate import IntermediateUnavailable, check_available
+from metrics import Metrics, profiling
+from translate_all_progress import (add_translation_args, failure_report_path, open_journal, retry_failed,
+                                   track_failures, translate_cells, write_failure_report)
+from translation_cache import TranslationCache
+from translator_backends import BackendUnavailable, get_backend
+
+
+def plan_cells(rows: Iterable[Sequence[str]]) -> dict:
+    """Count, per distinct Chinese cell value, how many cells hold it."""
+    plan = {}
+    for row in rows:
+        for val in row:
+            if val and has_chinese(val):
+                plan[val] = plan.get(val, 0) + 1
+    return plan
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Translate and finalize an export in one run '
+                                            '(two streaming passes over the input, no intermediate files)')
+    p.add_argument('-i', '--input', required=True, help='Export CSV (untranslated)')
+    p.add_argument('-o', '--output', help='Final CSV path (defaults to input + _final.csv)')
+    p.add_argument('--no-collapse', dest='collapse', action='store_false',
+                   help='Do not collapse Sammelbestellungen (keep order_id/paid/shipping on every row)')
+    p.add_argument('--no-zero-shipping', dest='zero_shipping', action='store_false',
+                   help='Do not force shipping to 0 when sum(items)==paid')
+    p.add_argument('--layout', choices=('canonical', 'fixed'), default='canonical',
+                   help='canonical: CANONICAL_HEADERS (default); fixed: the fix_final_output.py layout')
+    add_translation_args(p)
+    return p.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    inp = args.input
+    out = args.output
+    if not out:
+        base, ext = os.path.splitext(inp)
+        out = base + '_final' + (ext or '.csv')
+    if not os.path.exists(inp):
+        print(f'Input file not found: {inp}', file=sys.stderr)
+        return 2
+    try:
+        check_available(inp, out)
+        backend = get_backend(args.backend, glossary=args.glossary, fake_latency=args.fake_latency,
+                              fake_fail_rate=args.fake_fail_rate)
+    except (IntermediateUnavailable, BackendUnavailable, OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    metrics = Metrics()
+    with profiling(args.profile, metrics):
+        if args.retry_failed:
+            retry_failed(args, Path(out), backend, metrics)
+            return 0
+        return run(args, inp, out, backend, metrics)
+
+
+def final_rows(args, inp: str, metrics, counted=None):
+    """(input header, stream of finalized rows) for one pass over the export."""
+    rows = metrics.timed_iter('read', iter_csv_rows(inp))
+    header = next(rows, None)
+    if header is None:
+        return None, iter(())
+    if counted is not None:
+        rows = counted(rows)
+    engine = CleanEngine(header, collapse_groups=args.collapse, zero_shipping_if_equal=args.zero_shipping)
+    kept = metrics.timed_iter('clean', engine.meaningful_rows(rows))
+    return header, metrics.timed_iter('group', engine.group_rows(kept))
+
+
+def run(args, inp: str, out: str, backend, metrics) -> int:
+    counts = {'in': 0, 'out': 0}
+
+    def counted_in(it):
+        for r in it:
+            counts['in'] += 1
+            yield r
+
+    def counted_out(it):
+        for r in it:
+            counts['out'] += 1
+            yield r
+
+    # first pass: clean and group while streaming, keep only the distinct Chinese cells
+    header, rows = final_rows(args, inp, metrics, counted_in)
+    if header is None:
+        print('No rows read from input', file=sys.stderr)
+        return 3
+    try:
+        journal, translations = open_journal(args, Path(inp), Path(out), header)
+    except CheckpointMismatch as e:
+        print(e, file=sys.stderr)
+        return 1
+    with metrics.stage('detect'):
+        plan = plan_cells(rows)
+    metrics.incr('bytes_read', os.path.getsize(inp))
+
+    cache = TranslationCache(args.cache, max_entries=args.cache_size) if args.cache else None
+    try:
+        translations, translated_count, failed = translate_cells(plan, backend, args, metrics, cache, journal,
+                                                                 translations)
+    finally:
+        if cache is not None:
+            print(cache.stats())
+            cache.close()
+
+    # second pass: the same rows again, translated on their way to the output
+    _, rows = final_rows(args, inp, metrics)
+    report = []
+    tracked = track_failures(counted_out(rows), list(CANONICAL_HEADERS), failed, translations, report)
+    translated = ([translations.get(v, v) for v in r] for r in tracked)
+    if args.layout == 'fixed':
+        out_header, out_rows = FIXED_HEADER, fix_rows(list(CANONICAL_HEADERS), translated)
+    else:
+        out_header, out_rows = list(CANONICAL_HEADERS), translated
+    with metrics.stage('write'):
+        write_csv_rows(out, out_header, out_rows, schema=out_header)
+    # the journal is only discarded once the output is complete
+    journal.close(remove=True)
+    # columns the fixed layout drops cannot be left untranslated in the output
+    report = [e for e in report if e[1] in out_header]
+    write_failure_report(failure_report_path(args, Path(out)), report)
+
+    metrics.incr('rows_read', counts['in'])
+    metrics.incr('rows_dropped', counts['in'] - counts['out'])
+    metrics.incr('rows_written', counts['out'])
+    metrics.incr('bytes_written', os.path.getsize(out))
+    metrics.incr('segments_translated' if args.segment else 'cells_translated', translated_count)
+    print(f'Wrote {counts["out"]} rows to {out} (from {counts["in"]} input rows)')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
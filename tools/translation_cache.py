@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+translation_cache.py
+
+Persistent on-disk cache for translated strings, used by translate_all_progress.py.
+
+Entries live in a small SQLite database keyed by (src, dest, normalized text). Every
+lookup refreshes the entry's last-used stamp so that, once the cache grows past
+``max_entries``, the least recently used translations are evicted first.
+
+Usage:
+  cache = TranslationCache('translations.sqlite')
+  hit = cache.get('交易成功', 'zh-cn', 'en')
+  if hit is None:
+      cache.put('交易成功', 'Transaction successful', 'zh-cn', 'en')
+  cache.close()
+"""
+from __future__ import annotations
+
+import sqlite3
+import unicodedata
+from typing import Optional
+
+
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Commit after this many writes so a crash loses at most a handful of entries
+COMMIT_EVERY = 200
+
+
+def normalize_text(text: str) -> str:
+    # NFKC folds full-width variants; collapsing whitespace makes "a  b" and "a b" share an entry
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+class TranslationCache:
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            ' src TEXT NOT NULL, dest TEXT NOT NULL, text TEXT NOT NULL,'
+            ' translated TEXT NOT NULL, last_used INTEGER NOT NULL,'
+            ' PRIMARY KEY (src, dest, text))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS translations_last_used ON translations(last_used)')
+        row = self._conn.execute('SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM translations').fetchone()
+        self._size = row[0]
+        # monotonically increasing use counter; cheaper and more stable than wall-clock time
+        self._clock = row[1]
+        if self._size > self.max_entries:
+            self._evict(self._size - self.max_entries)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __enter__(self) -> 'TranslationCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, text: str, src: str, dest: str) -> Optional[str]:
+        key = normalize_text(text)
+        row = self._conn.execute(
+            'SELECT translated FROM translations WHERE src=? AND dest=? AND text=?', (src, dest, key)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute(
+            'UPDATE translations SET last_used=? WHERE src=? AND dest=? AND text=?', (self._tick(), src, dest, key)
+        )
+        self._written()
+        return row[0]
+
+    def put(self, text: str, translated: str, src: str, dest: str) -> None:
+        key = normalize_text(text)
+        cur = self._conn.execute(
+            'UPDATE translations SET translated=?, last_used=? WHERE src=? AND dest=? AND text=?',
+            (translated, self._tick(), src, dest, key),
+        )
+        if cur.rowcount == 0:
+            self._conn.execute(
+                'INSERT INTO translations (src, dest, text, translated, last_used) VALUES (?, ?, ?, ?, ?)',
+                (src, dest, key, translated, self._clock),
+            )
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+        self._written()
+
+    def _evict(self, count: int) -> None:
+        self._conn.execute(
+            'DELETE FROM translations WHERE rowid IN '
+            '(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)', (count,)
+        )
+        self._size -= count
+        self.evictions += count
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        ratio = (self.hits / lookups * 100) if lookups else 0.0
+        return (f'cache hits={self.hits} misses={self.misses} hit_rate={ratio:.1f}% '
+                f'entries={self._size} evicted={self.evictions}')
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+translation_engine.py
+
+Concurrency helpers for translate_all_progress.py: a thread-safe token-bucket rate
+limiter, jittered exponential backoff, a circuit breaker that stops calling a backend
+which keeps failing, and an ordered thread-pool runner that keeps up to N translator
+calls in flight while handing results back in submission order.
+
+Any object with a ``translate_batch(texts, src, dest)`` method can be driven by the
+engine, so it can be exercised against a local mock translator:
+
+  class Mock:
+      def translate_batch(self, texts, src, dest):
+          return [t.upper() for t in texts]
+
+  limiter = TokenBucket(rate=20, burst=5)
+  work = lambda b: translate_batch(Mock(), b, limiter=limiter)
+  for batch, result in run_ordered(batches, work, workers=8):
+      ...
+"""
+from __future__ import annotations
+
+import random
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Upper bound for a single backoff wait, whatever the attempt number
+MAX_BACKOFF = 30.0
+
+
+class TokenBucket:
+    """Allow on average `rate` acquisitions per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.capacity = float(burst if burst else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._stamp = monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                need = (1 - self._tokens) / self.rate
+            # sleep outside the lock so other workers can refill/check concurrently
+            sleep(need)
+            waited += need
+
+
+class CircuitBreaker:
+    """Fail fast while a backend keeps failing.
+
+    After `threshold` consecutive failed calls the circuit opens: allow() returns False and
+    callers skip the backend instead of queueing up behind it. Once `cooldown` seconds have
+    passed, a single trial call is let through (half-open); its success closes the circuit,
+    its failure opens it again. A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened is None:
+                return True
+            if self._trial or monotonic() - self._opened < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._trial = False
+
+    def failure(self) -> bool:
+        """Record a failed call; returns True if this failure opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            if not (self._trial or (self.threshold and self._failures >= self.threshold)):
+                return False
+            opened = self._opened is None
+            self._opened = monotonic()
+            self._trial = False
+            return opened
+
+    def remaining(self) -> float:
+        """Seconds until the next trial call is allowed (0 while the circuit is closed)."""
+        with self._lock:
+            if self._opened is None:
+                return 0.0
+            return max(0.0, self.cooldown - (monotonic() - self._opened))
+
+
+def backoff_delay(attempt: int, base: float, cap: float = MAX_BACKOFF) -> float:
+    """'Full jitter' exponential backoff: uniform in [0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def run_ordered(items: Iterable[T], fn: Callable[[T], R], workers: int = 1,
+                window: Optional[int] = None, processes: bool = False) -> Iterator[Tuple[T, R]]:
+    """Apply fn to items on a thread pool, yielding (item, result) in input order.
+
+    At most `window` calls (default 2 * workers) are queued at once so that a large
+    plan does not create every future up front. With processes=True a process pool is
+    used instead (fn and the items must be picklable).
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+    window = window or workers * 2
+    pending: deque = deque()
+    pool_cls = ProcessPoolExecutor if processes else partial(ThreadPoolExecutor, thread_name_prefix='translate')
+    with pool_cls(max_workers=workers) as pool:
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            if len(pending) >= window:
+                head, fut = pending.popleft()
+                yield head, fut.result()
+        while pending:
+            head, fut = pending.popleft()
+            yield head, fut.result()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+translator_backends.py
+
+Translator backends for translate_all_progress.py. Every backend implements
+
+  translate_batch(texts, src, dest) -> list of translations (same order as texts)
+
+and is selected by name with ``get_backend()`` / ``--backend``:
+
+  googletrans  online, via the unofficial googletrans client (imported lazily)
+  glossary     offline phrase table loaded from TSV or JSON, seeded with HEADER_MAP
+  fake         deterministic local stand-in for tests and benchmarks
+
+Glossary files are either a JSON object ``{"交易成功": "Transaction successful"}`` or a
+TSV file with one ``chinese<TAB>english`` pair per line (``#`` starts a comment).
+"""
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+from pathlib import Path
+from time import sleep
+from typing import Callable, Dict, List, Optional, Protocol
+
+from finalize_translated_csv import HEADER_MAP
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised when a backend cannot be constructed in this interpreter (e.g. missing dependency)."""
+
+
+class TranslatorBackend(Protocol):
+    name: str
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        ...
+
+
+class GoogletransBackend:
+    name = 'googletrans'
+
+    def __init__(self) -> None:
+        try:
+            from googletrans import Translator
+        except Exception as e:
+            raise BackendUnavailable(f'googletrans not available in this interpreter: {e}')
+        self._factory = Translator
+        # googletrans clients wrap an httpx session; give every worker thread its own
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._factory()
+        return client
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        res = self._client().translate(list(texts), src=src, dest=dest)
+        return [r.text if hasattr(r, 'text') else str(r) for r in res]
+
+
+def load_glossary(path: str) -> Dict[str, str]:
+    p = Path(path)
+    text = p.read_text(encoding='utf-8-sig')
+    if p.suffix.lower() == '.json':
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError(f'Glossary JSON must be an object: {path}')
+        return {str(k): str(v) for k, v in data.items()}
+    table: Dict[str, str] = {}
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        parts = line.split('\t')
+        if len(parts) < 2:
+            raise ValueError(f'{path}:{lineno}: expected "source<TAB>translation"')
+        table[parts[0].strip()] = parts[1].strip()
+    return table
+
+
+class GlossaryBackend:
+    """Offline backend: exact matches first, otherwise longest-phrase substitution in one regex pass."""
+
+    name = 'glossary'
+
+    def __init__(self, path: Optional[str] = None, table: Optional[Dict[str, str]] = None) -> None:
+        self.table: Dict[str, str] = dict(HEADER_MAP)
+        if path:
+            self.table.update(load_glossary(path))
+        if table:
+            self.table.update(table)
+        phrases = sorted((k for k in self.table if k), key=len, reverse=True)
+        # alternation ordered longest-first, so the regex engine prefers the longest phrase at each position
+        self._phrase_re = re.compile('|'.join(map(re.escape, phrases))) if phrases else None
+
+    def _translate(self, text: str) -> str:
+        hit = self.table.get(text.strip())
+        if hit is not None:
+            return hit
+        if self._phrase_re is None:
+            return text
+        return self._phrase_re.sub(lambda m: self.table[m.group(0)], text)
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        return [self._translate(t) for t in texts]
+
+
+class FakeBackend:
+    """Deterministic stand-in: wraps each text as ``<dest:text>`` after an optional simulated latency."""
+
+    name = 'fake'
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0) -> None:
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts: List[str], src: str, dest: str) -> List[str]:
+        with self._lock:
+            self.calls += 1
+            fail = self.fail_rate > 0 and self._rng.random() < self.fail_rate
+        if self.latency:
+            sleep(self.latency)
+        if fail:
+            raise RuntimeError('fake backend: simulated failure')
+        return [f'<{dest}:{t}>' for t in texts]
+
+
+BACKENDS: Dict[str, Callable[..., TranslatorBackend]] = {
+    'googletrans': lambda **opts: GoogletransBackend(),
+    'glossary': lambda **opts: GlossaryBackend(path=opts.get('glossary')),
+    'fake': lambda **opts: FakeBackend(latency=opts.get('fake_latency', 0.0),
+                                       fail_rate=opts.get('fake_fail_rate', 0.0)),
+}
+
+
+def get_backend(name: str, **opts) -> TranslatorBackend:
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise BackendUnavailable(f'Unknown translator backend: {name} (choose from {", ".join(BACKENDS)})')
+    return factory(**opts)